@@ -2,12 +2,14 @@
 
 Defines all Nodes of the Brah Abstract Syntax Tree.
 """
-from typing import Optional, Any, Union, List, Dict, Type
-from brah.f_utils import DeclOffset
+from sys import intern
+from typing import Optional, Any, Union, List, Dict, Type, Tuple, Callable
+from brah.f_utils import DeclOffset, Location, LocationTable, SourceCode
 
 
 __all__ = [
     # functions
+    'defer_body',
     'print_tree',
 
     # classes
@@ -134,6 +136,29 @@ __all__ = [
 # region FUNCTIONS
 
 
+def _child_accessor(fields: Tuple[str, ...]) -> Callable[['ASTNode'], Tuple[Any, ...]]:
+    # a generated method reads all the child fields of a class with plain attribute loads
+    values: str = ''.join(f"self.{name}, " for name in fields)
+    namespace: Dict[str, Any] = {}
+    exec(f"def child_values(self):\n    return ({values})", namespace)
+    return namespace['child_values']
+
+
+def defer_body(declnode: Union['FunctionDeclNode', 'MethodDeclNode'], source: SourceCode, brace: int,
+               parser: Callable[[Union['FunctionDeclNode', 'MethodDeclNode']], 'BasicScopeNode']) -> int:
+    """Skips the body of a function or method whose '{' is at the given index of the source: the
+    body is parsed by ``parser`` from ``body_span`` when its scope is first read.
+
+    Returns the index following the body, where parsing goes on, or -1 if the body is never closed.
+    """
+    end: int = source.match_brace(brace)
+    if end == -1:
+        return -1
+    declnode.body_span = (brace, end + 1)
+    declnode.body_parser = parser
+    return end + 1
+
+
 def print_tree(top_node: 'ASTNode', meaning: Optional[str] = None, to_filepath: Optional[str] = None):
     full_tree_lines: List[str] = []
     top_node.print(None, '', "AST root" if not meaning else meaning, True, full_tree_lines)
@@ -153,6 +178,24 @@ def print_tree(top_node: 'ASTNode', meaning: Optional[str] = None, to_filepath:
 # region AstNode
 
 class ASTNode:
+    """Abstract Syntax Tree node base class.
+
+    :cvar child_fields: the attributes holding the nodes directly below the node,
+        in evaluation order; each holds a node, a list or dict of nodes, or None.
+        Links to enclosing nodes and to declarations named elsewhere are not children.
+    """
+
+    child_fields: Tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'child_fields' in cls.__dict__:
+            cls.child_values = _child_accessor(cls.child_fields)
+            cls.child_values.__qualname__ = f"{cls.__qualname__}.child_values"
+
+    def child_values(self) -> Tuple[Any, ...]:
+        """Returns the values of the child fields, as declared by ``child_fields``."""
+        return ()
 
     def __str__(self):
         return f": {self._node_name} :"
@@ -188,8 +231,8 @@ class ASTNode:
 
 class SourceNode(ASTNode):
 
-    def __init__(self, location: Any):
-        self.location: Any = location   # Todo: define and set actual attribute type
+    def __init__(self, location: Location):
+        self.location: Location = location
 
 
 # endregion (AstNode)
@@ -199,16 +242,20 @@ class SourceNode(ASTNode):
 
 class AsmbNode(ASTNode):
 
+    child_fields = ('modules',)
+
     def __init__(self):
         self.modules: Dict[str, ModuleNode] = {}
         self.src_dir: str = ''
         self.dst_dir: str = ''
+        self.locations: LocationTable = LocationTable()
 
     def __getitem__(self, key: str) -> 'ModuleNode':
         return self.modules.__getitem__(key)
 
     def __setitem__(self, key: str, value: 'ModuleNode') -> None:
         self.modules.__setitem__(key, value)
+        self.locations.update(value.locations)
 
     def __delitem__(self, key: str) -> None:
         self.modules.__delitem__(key)
@@ -216,11 +263,14 @@ class AsmbNode(ASTNode):
 
 class ModuleNode(ASTNode):
 
-    def __init__(self, fname: str, scope: Optional['ModuleScopeNode'] = None):
+    child_fields = ('scope',)
+
+    def __init__(self, fname: str, scope: Optional['ModuleScopeNode'] = None, source: Optional[SourceCode] = None):
         self.fname: str = fname
         self.resolved: bool = False
         self.resolving: bool = False
         self.scope: Optional['ModuleScopeNode'] = scope
+        self.locations: LocationTable = LocationTable(source) if source else LocationTable()
 
 # endregion (assembly nodes)
 
@@ -229,7 +279,9 @@ class ModuleNode(ASTNode):
 
 class TemplNode(SourceNode):
 
-    def __init__(self, location: Any, typenames: List[str], sizes: Dict[str, 'ExprNode']):
+    child_fields = ('sizes',)
+
+    def __init__(self, location: Location, typenames: List[str], sizes: Dict[str, 'ExprNode']):
         super().__init__(location)
         self.typenames: List[str] = typenames
         self.sizes: Dict[str, ExprNode] = sizes
@@ -240,12 +292,34 @@ class TemplNode(SourceNode):
 # region (Declaration Nodes)
 
 
+class _LazyScope:
+    """Body scope of FunctionDeclNode and MethodDeclNode.
+
+    When parsing lazily, the parser only matches the braces of a body (``defer_body``),
+    storing its span in ``body_span`` and the callable that parses it in
+    ``body_parser``. The scope is then built on first access, i.e. on the first call
+    or resolution.
+    """
+
+    def __get__(self, declnode: Optional['DeclNode'], owner: type) -> Any:
+        if declnode is None:
+            return self
+        scope: Optional[BasicScopeNode] = declnode._scope
+        if scope is None and declnode.body_parser is not None:
+            scope = declnode._scope = declnode.body_parser(declnode)
+            declnode.body_parser = None
+        return scope
+
+    def __set__(self, declnode: 'DeclNode', scope: Optional['BasicScopeNode']) -> None:
+        declnode._scope = scope
+
+
 class DeclNode(SourceNode):
 
-    def __init__(self, location: Any, declname: str, decltype: 'TypeNode', exports: bool = False):
+    def __init__(self, location: Location, declname: str, decltype: 'TypeNode', exports: bool = False):
         super().__init__(location)
         self.exports: bool = exports
-        self.name: str = declname
+        self.name: str = intern(declname)
         self.type: TypeNode = decltype
 
     def _node_title(self) -> str:
@@ -259,7 +333,9 @@ class VarDeclNode(DeclNode):
     :ivar offset: the frame offset in bytes
     """
 
-    def __init__(self, location: Any, offset: int, declname: str, decltype: 'TypeNode',
+    child_fields = ('value',)
+
+    def __init__(self, location: Location, offset: int, declname: str, decltype: 'TypeNode',
                  declvalue: Optional['ExprNode'] = None):
         super().__init__(location, declname, decltype)
         self.value: Optional['ExprNode'] = declvalue
@@ -278,7 +354,9 @@ class VarDeclNode(DeclNode):
 
 class ConstDeclNode(DeclNode):
 
-    def __init__(self, location: Any, declname: str, decltype: 'TypeNode', declvalue: 'ExprNode',
+    child_fields = ('value',)
+
+    def __init__(self, location: Location, declname: str, decltype: 'TypeNode', declvalue: 'ExprNode',
                  exports: bool = False):
         super().__init__(location, declname, decltype, exports)
         self.value: ExprNode = declvalue
@@ -290,7 +368,9 @@ class ConstDeclNode(DeclNode):
 
 class EnumDeclNode(DeclNode):
 
-    def __init__(self, location: Any, declname: str, decltype: 'TypeNode', declvalue: 'ExprNode'):
+    child_fields = ('value',)
+
+    def __init__(self, location: Location, declname: str, decltype: 'TypeNode', declvalue: 'ExprNode'):
         super().__init__(location, declname, decltype, decltype.exports)
         self.value: ExprNode = declvalue
 
@@ -301,15 +381,27 @@ class EnumDeclNode(DeclNode):
 
 class FunctionDeclNode(DeclNode):
 
-    def __init__(self, location: Any, offset: int, declname: str, decltype: 'TypeNode',
-                 params: Dict[str, 'ParamDeclNode'], scope: 'FunctionScopeNode', exports: bool = False):
+    child_fields = ('template', 'params', 'scope')
+
+    scope = _LazyScope()
+
+    def __init__(self, location: Location, offset: int, declname: str, decltype: 'TypeNode',
+                 params: Dict[str, 'ParamDeclNode'], scope: Optional['FunctionScopeNode'], exports: bool = False):
         super().__init__(location, declname, decltype, exports)
         self.template: Optional[TemplNode] = None
         self.defined: bool = False
         self.offset: DeclOffset = DeclOffset(offset, 1)
         self.params: Dict[str, ParamDeclNode] = params
         self.type: TypeNode = decltype
-        self.scope: FunctionScopeNode = scope
+        self.body_span: Optional[Tuple[int, int]] = None
+        self.body_parser: Optional[Callable[['FunctionDeclNode'], FunctionScopeNode]] = None
+        self.scope: Optional[FunctionScopeNode] = scope
+        # bumped by the passes that rewrite the body, so that what was derived from it is redone
+        self.revision: int = 0
+
+    @property
+    def body_parsed(self) -> bool:
+        return self.body_parser is None
 
     def _node_title(self) -> str:
         return (
@@ -321,13 +413,17 @@ class FunctionDeclNode(DeclNode):
         if self.template:
             self.template.print(self, depth, 'template', False, output)
         for i, param in enumerate(self.params):
-            self.params[param].print(self, depth, f'param {i}', False, output)
-        self.scope.print(self, depth, 'body', True, output)
+            self.params[param].print(self, depth, f'param {i}', not self.body_parsed and i == len(self.params) - 1,
+                                     output)
+        if self.body_parsed:
+            self.scope.print(self, depth, 'body', True, output)
 
 
 class ParamDeclNode(DeclNode):
 
-    def __init__(self, location: Any, offset: int, declname: str, decltype: 'TypeNode', has_default: bool = False,
+    child_fields = ('default_value',)
+
+    def __init__(self, location: Location, offset: int, declname: str, decltype: 'TypeNode', has_default: bool = False,
                  declvalue: Optional['ExprNode'] = None):
         super().__init__(location, declname, decltype)
         self.offset: DeclOffset = DeclOffset(offset, 1)
@@ -344,7 +440,9 @@ class ParamDeclNode(DeclNode):
 
 class FieldDeclNode(DeclNode):
 
-    def __init__(self, location: Any, offset: int, thisdecl: 'TyclNode', declname: str, decltype: 'TypeNode',
+    child_fields = ('default_value',)
+
+    def __init__(self, location: Location, offset: int, thisdecl: 'TyclNode', declname: str, decltype: 'TypeNode',
                  has_default: bool = False, declvalue: Optional['ExprNode'] = None):
         super().__init__(location, declname, decltype)
         self.thisdecl: TyclNode = thisdecl
@@ -362,7 +460,9 @@ class FieldDeclNode(DeclNode):
 
 class PropertyDeclNode(DeclNode):
 
-    def __init__(self, location: Any, thisdecl: 'TyclNode', declname: str, decltype: 'TypeNode'):
+    child_fields = ('getterstmt', 'setterstmt')
+
+    def __init__(self, location: Location, thisdecl: 'TyclNode', declname: str, decltype: 'TypeNode'):
         super().__init__(location, declname, decltype)
         self.thisdecl: TyclNode = thisdecl
         self.getterstmt: Optional[GetterStmtNode] = None
@@ -377,8 +477,12 @@ class PropertyDeclNode(DeclNode):
 
 class MethodDeclNode(DeclNode):
 
-    def __init__(self, location: Any, offset: int, thisdecl: 'TyclNode', declname: str, decltype: 'TypeNode',
-                 params: Dict[str, ParamDeclNode], scope: 'MethodScopeNode', operator: bool = False):
+    child_fields = ('params', 'scope')
+
+    scope = _LazyScope()
+
+    def __init__(self, location: Location, offset: int, thisdecl: 'TyclNode', declname: str, decltype: 'TypeNode',
+                 params: Dict[str, ParamDeclNode], scope: Optional['MethodScopeNode'], operator: bool = False):
         super().__init__(location, declname, decltype)
         self.thisdecl: TyclNode = thisdecl
         self.defined: bool = False
@@ -386,15 +490,24 @@ class MethodDeclNode(DeclNode):
         self.offset: DeclOffset = DeclOffset(offset, 1)
         self.params: Dict[str, ParamDeclNode] = params
         self.type: TypeNode = decltype
-        self.scope: MethodScopeNode = scope
+        self.body_span: Optional[Tuple[int, int]] = None
+        self.body_parser: Optional[Callable[['MethodDeclNode'], MethodScopeNode]] = None
+        self.scope: Optional[MethodScopeNode] = scope
+        self.revision: int = 0
+
+    @property
+    def body_parsed(self) -> bool:
+        return self.body_parser is None
 
     def _node_title(self) -> str:
         return f"{self._node_name} :: {self.name} : {self.type.name} (Params: {len(self.params)})"
 
     def _print_leves(self, depth: str, output: Optional[List[str]] = None):
         for i, param in enumerate(self.params):
-            self.params[param].print(self, depth, f'param {i}', False, output)
-        self.scope.print(self, depth, 'body', True, output)
+            self.params[param].print(self, depth, f'param {i}', not self.body_parsed and i == len(self.params) - 1,
+                                     output)
+        if self.body_parsed:
+            self.scope.print(self, depth, 'body', True, output)
 
 # endregion (declaration nodes)
 
@@ -403,10 +516,10 @@ class MethodDeclNode(DeclNode):
 
 class TypeNode(SourceNode):
 
-    def __init__(self, location: Any, typename: Optional[str], exports: bool = False):
+    def __init__(self, location: Location, typename: Optional[str], exports: bool = False):
         super().__init__(location)
         self.exports: bool = exports
-        self.name: Optional[str] = typename
+        self.name: Optional[str] = intern(typename) if typename is not None else None
 
     def _node_title(self) -> str:
         return f"{'[exp]' if self.exports else ''} {self._node_name} :: {self.name}"
@@ -414,7 +527,7 @@ class TypeNode(SourceNode):
 
 class PrimitiveTypeNode(TypeNode):
 
-    def __init__(self, location: Any, typename: str):
+    def __init__(self, location: Location, typename: str):
         super().__init__(location, typename)
 
 
@@ -423,7 +536,7 @@ class PrimitiveTypeNode(TypeNode):
 
 class IntegerTypeNode(PrimitiveTypeNode):
 
-    def __init__(self, location: Any, typename: str, bytesize: int, signed: bool):
+    def __init__(self, location: Location, typename: str, bytesize: int, signed: bool):
         super().__init__(location, typename)
         self.bytesize: int = bytesize
         self.signed: bool = signed
@@ -431,25 +544,125 @@ class IntegerTypeNode(PrimitiveTypeNode):
 
 class FloatTypeNode(PrimitiveTypeNode):
 
-    def __init__(self, location: Any, typename: str, bytesize: int):
+    def __init__(self, location: Location, typename: str, bytesize: int):
         super().__init__(location, typename)
         self.bytesize: int = bytesize
 
 
 class StringTypeNode(PrimitiveTypeNode):
 
-    def __init__(self, location: Any, typename: str):
+    def __init__(self, location: Location, typename: str):
         super().__init__(location, typename)
 
 # endregion (primitive types)
 
 
 class EnumTypeNode(TypeNode):
+    """Enumeration type node.
+
+    At run time the members of a plain enumeration are their index in declaration
+    order, whatever value they were declared with, so switches over them see dense
+    small ints. The members of a flag-set are bit masks: the declared value or, by
+    default, the bit above the previous member. A value used as a number (in
+    arithmetic, stored as an integer, returned to the host) is its declared value.
+
+    :ivar members: the EnumDeclNode of each member, in declaration order. They are declared
+        in the module scope and only linked here, so they are not child fields.
+    :ivar codes: the run time value of each member, once laid out
+    :ivar values: the declared value of each member, by run time value (plain enumerations only)
+    :ivar names: the member name of each run time value; for flag-sets, of each bit position
+    """
 
-    def __init__(self, location: Any, typename: str, basetype: TypeNode, is_flagset: bool, exports: bool = False):
+    def __init__(self, location: Location, typename: str, basetype: TypeNode, is_flagset: bool, exports: bool = False):
         super().__init__(location, typename, exports)
         self.basetype: TypeNode = basetype
         self.is_flagset: bool = is_flagset
+        self.members: Dict[str, 'EnumDeclNode'] = {}
+        self.codes: Dict[str, int] = {}
+        self.values: List[int] = []
+        self.names: List[Optional[str]] = []
+
+    def declare(self, declnode: 'EnumDeclNode') -> bool:
+        if declnode.name in self.members:
+            return False
+        self.members[declnode.name] = declnode
+        self.codes.clear()
+        return True
+
+    @staticmethod
+    def _literal_value(expr: 'ExprNode') -> int:
+        if isinstance(expr, LiteralExprNode) and isinstance(expr.value, int):
+            return expr.value
+        elif isinstance(expr, NegateUnaryExprNode):
+            return -EnumTypeNode._literal_value(expr.operand)
+        raise ValueError(f"Not a constant integer: {expr._node_name}")
+
+    def layout(self, evaluate: Optional[Callable[['ExprNode'], int]] = None) -> None:
+        """Assigns the run time value of each member. Declared values are computed by ``evaluate``,
+        which by default only accepts integer literals."""
+        evaluate = evaluate or self._literal_value
+        self.codes = {}
+        self.values = []
+        self.names = []
+        value: int = 1 if self.is_flagset else 0
+        for index, (name, declnode) in enumerate(self.members.items()):
+            if declnode.value is not None:
+                value = evaluate(declnode.value)
+            if not self.is_flagset:
+                self.codes[name] = index
+                self.values.append(value)
+                self.names.append(name)
+                value += 1
+                continue
+            self.codes[name] = value
+            if value > 0 and not value & (value - 1):
+                position: int = value.bit_length() - 1
+                self.names.extend([None] * (position + 1 - len(self.names)))
+                if self.names[position] is None:
+                    self.names[position] = name
+            value = 1 << value.bit_length()
+
+    def _ensure_layout(self) -> None:
+        """Lays out the members with literal values if some were declared since the last layout."""
+        if len(self.codes) != len(self.members):
+            self.layout()
+
+    def code_of(self, name: str) -> int:
+        """Returns the run time value of a member."""
+        self._ensure_layout()
+        return self.codes[name]
+
+    def name_of(self, code: int) -> str:
+        """Returns the member name of a run time value; for flag-sets, the names of its bits joined by '|'."""
+        self._ensure_layout()
+        if not self.is_flagset:
+            return self.names[code]
+        if code < 0:
+            raise ValueError(f"Negative flag-set value: {code}")
+        names: List[str] = []
+        while code:
+            bit: int = code & -code
+            position: int = bit.bit_length() - 1
+            name: Optional[str] = self.names[position] if position < len(self.names) else None
+            names.append(name or hex(bit))
+            code ^= bit
+        return '|'.join(names)
+
+    def renumbers(self) -> bool:
+        """Returns whether the run time values differ from the declared ones, as for a plain
+        enumeration declaring values other than 0, 1, 2..."""
+        self._ensure_layout()
+        return not self.is_flagset and self.values != list(range(len(self.values)))
+
+    def value_of(self, code: int) -> int:
+        """Returns the declared value of a run time value."""
+        self._ensure_layout()
+        return code if self.is_flagset else self.values[code]
+
+    def code_of_value(self, value: int) -> int:
+        """Returns the run time value of a declared value."""
+        self._ensure_layout()
+        return value if self.is_flagset else self.values.index(value)
 
     def _node_title(self) -> str:
         return (f"{'[exp]' if self.exports else ''} {self._node_name} :: {self.name} "
@@ -458,7 +671,7 @@ class EnumTypeNode(TypeNode):
 
 class SignatureTypeNode(TypeNode):
 
-    def __init__(self, location: Any, typename: str, paramtypes: List[Union[TypeNode, 'TyclNode']],
+    def __init__(self, location: Location, typename: str, paramtypes: List[Union[TypeNode, 'TyclNode']],
                  restype: Union[TypeNode, 'TyclNode'], exports: bool = False):
         super().__init__(location, typename, exports)
         self.paramtypes: List[Union[TypeNode, 'TyclNode']] = paramtypes
@@ -471,7 +684,7 @@ class SignatureTypeNode(TypeNode):
 
 class PointerTypeNode(TypeNode):
 
-    def __init__(self, location: Any, basetype: Union[TypeNode, 'TyclNode']):
+    def __init__(self, location: Location, basetype: Union[TypeNode, 'TyclNode']):
         super().__init__(location, None)
         self.basetype: Union[TypeNode, TyclNode] = basetype
 
@@ -481,7 +694,10 @@ class PointerTypeNode(TypeNode):
 
 class ArrayTypeNode(TypeNode):
 
-    def __init__(self, location: Any, basetype: Union[TypeNode, 'TyclNode'], sizeexpr: Optional['ExprNode'] = None):
+    child_fields = ('sizeexpr',)
+
+    def __init__(self, location: Location, basetype: Union[TypeNode, 'TyclNode'],
+                 sizeexpr: Optional['ExprNode'] = None):
         super().__init__(location, None)
         self.basetype: Union[TypeNode, TyclNode] = basetype
         self.sizeexpr: Optional[ExprNode] = sizeexpr
@@ -496,7 +712,7 @@ class ArrayTypeNode(TypeNode):
 
 class AliasTypeNode(TypeNode):
 
-    def __init__(self, location: Any, typename: str, basetype: Union[TypeNode, 'TyclNode'], exports: bool = False):
+    def __init__(self, location: Location, typename: str, basetype: Union[TypeNode, 'TyclNode'], exports: bool = False):
         super().__init__(location, typename, exports)
         self.basetype: Union[TypeNode, TyclNode] = basetype
 
@@ -506,7 +722,8 @@ class AliasTypeNode(TypeNode):
 
 class ExceptionTypeNode(TypeNode):
 
-    def __init__(self, location: Any, typename: str, basetype: Optional['ExceptionTypeNode'], exports: bool = False):
+    def __init__(self, location: Location, typename: str, basetype: Optional['ExceptionTypeNode'],
+                 exports: bool = False):
         super().__init__(location, typename, exports)
         self.basetype: Optional[ExceptionTypeNode] = basetype
 
@@ -520,27 +737,29 @@ class ExceptionTypeNode(TypeNode):
 
 
 class TyclNode(SourceNode):
+    """A class declaration.
+
+    :ivar members: every field, property, method and operator, keyed by name in
+        declaration order; the per-kind dicts, which are the child fields, hold the same nodes
+    """
+
+    child_fields = ('fields', 'properties', 'methods', 'operators')
 
-    def __init__(self, location: Any, tyclname: str, exports: bool = False):
+    def __init__(self, location: Location, tyclname: str, exports: bool = False):
         super().__init__(location)
         self.exports: bool = exports
-        self.name: str = tyclname
+        self.name: str = intern(tyclname)
         self.fields: Dict[str, FieldDeclNode] = {}
         self.properties: Dict[str, PropertyDeclNode] = {}
         self.methods: Dict[str, MethodDeclNode] = {}
         self.operators: Dict[str, MethodDeclNode] = {}
-        self.members: List[str] = []
+        self.members: Dict[str, Union[FieldDeclNode, PropertyDeclNode, MethodDeclNode]] = {}
 
     def __getitem__(self, key: str) -> Union[FieldDeclNode, PropertyDeclNode, MethodDeclNode]:
-        if key in self.members:
-            if key in self.fields:
-                return self.fields.get(key)
-            elif key in self.properties:
-                return self.properties.get(key)
-            else:
-                return self.methods.get(key)
-        else:
+        member: Optional[Union[FieldDeclNode, PropertyDeclNode, MethodDeclNode]] = self.members.get(key)
+        if member is None:
             raise KeyError(f"Not found: '{key}'")
+        return member
 
     def __contains__(self, item: str) -> bool:
         return self.members.__contains__(item)
@@ -561,7 +780,7 @@ class TyclNode(SourceNode):
         else:
             return False
 
-        self.members.append(declnode.name)
+        self.members[declnode.name] = declnode
         return True
 
     def _node_title(self) -> str:
@@ -593,7 +812,7 @@ class InterfaceTyclNode(TyclNode):
 
 class ClassTyclNode(TyclNode):
 
-    def __init__(self, location: Any, tyclname: str, exports: bool = False, baseclass: Optional[TyclNode] = None):
+    def __init__(self, location: Location, tyclname: str, exports: bool = False, baseclass: Optional[TyclNode] = None):
         super().__init__(location, tyclname, exports)
         self.baseclass: Optional[TyclNode] = baseclass
 
@@ -614,7 +833,7 @@ class SingletonTyclNode(TyclNode):
 class ScopeNode(SourceNode):
     """Scope Node base class."""
 
-    def __init__(self, location: Any, basescope: Optional['ScopeNode'] = None):
+    def __init__(self, location: Location, basescope: Optional['ScopeNode'] = None):
         super().__init__(location)
         self.labels: Dict[str, 'StmtNode'] = {}
         self.basescope: Optional[ScopeNode] = basescope
@@ -686,7 +905,9 @@ class ScopeNode(SourceNode):
 
 class BasicScopeNode(ScopeNode):
 
-    def __init__(self, location: Any, basescope: Optional['ScopeNode'] = None):
+    child_fields = ('declarations', 'statements')
+
+    def __init__(self, location: Location, basescope: Optional['ScopeNode'] = None):
         super().__init__(location, basescope)
         self.statements: List[StmtNode] = []
 
@@ -700,7 +921,8 @@ class BasicScopeNode(ScopeNode):
 
 
 class ModuleScopeNode(ScopeNode):
-    pass
+
+    child_fields = ('declarations',)
 
 
 class FunctionScopeNode(BasicScopeNode):
@@ -733,7 +955,7 @@ class TryScopeNode(BasicScopeNode):
 
 class StmtNode(SourceNode):
 
-    def __init__(self, location: Any):
+    def __init__(self, location: Location):
         super().__init__(location)
 
     def _node_title(self) -> str:
@@ -742,7 +964,9 @@ class StmtNode(SourceNode):
 
 class AssignmentStmtNode(StmtNode):
 
-    def __init__(self, location: Any, exprlvalue: 'LValueExprNode', exprvalue: 'ExprNode'):
+    child_fields = ('exprlvalue', 'exprvalue')
+
+    def __init__(self, location: Location, exprlvalue: 'LValueExprNode', exprvalue: 'ExprNode'):
         super().__init__(location)
         self.exprlvalue: LValueExprNode = exprlvalue
         self.exprvalue: ExprNode = exprvalue
@@ -757,14 +981,30 @@ class AssignmentStmtNode(StmtNode):
 
 class UnpackStmtNode(StmtNode):
 
-    def __init__(self, location: Any):
+    child_fields = ('exprlvalues', 'exprvalue')
+
+    def __init__(self, location: Location, exprlvalues: List[Optional['LValueExprNode']], exprvalue: 'ExprNode'):
         super().__init__(location)
-        # TODO: take a look the syntax for this node and check what it needs
+        # None stands for '...', which skips the elements between the targets around it
+        self.exprlvalues: List[Optional[LValueExprNode]] = exprlvalues
+        self.exprvalue: ExprNode = exprvalue
+
+    def _node_title(self) -> str:
+        targets: str = ', '.join('...' if target is None else '(target)' for target in self.exprlvalues)
+        return f"{self._node_name} :: {{{targets}}} = (expr)"
+
+    def _print_leves(self, depth: str, output: Optional[List[str]] = None):
+        for target in self.exprlvalues:
+            if target is not None:
+                target.print(self, depth, 'target', False, output)
+        self.exprvalue.print(self, depth, 'value', True, output)
 
 
 class ExpressionStmtNode(StmtNode):
 
-    def __init__(self, location: Any, expr: Union['UnaryExprNode', 'DirectCallExprNode', 'IndirectCallExprNode']):
+    child_fields = ('expr',)
+
+    def __init__(self, location: Location, expr: Union['UnaryExprNode', 'DirectCallExprNode', 'IndirectCallExprNode']):
         super().__init__(location)
         self.expr: Union['UnaryExprNode', 'DirectCallExprNode', 'IndirectCallExprNode'] = expr
 
@@ -774,7 +1014,9 @@ class ExpressionStmtNode(StmtNode):
 
 class GetterStmtNode(StmtNode):
 
-    def __init__(self, location: Any, getterscope: PropertyScopeNode):
+    child_fields = ('scope',)
+
+    def __init__(self, location: Location, getterscope: PropertyScopeNode):
         super().__init__(location)
         self.scope: PropertyScopeNode = getterscope
 
@@ -787,7 +1029,9 @@ class GetterStmtNode(StmtNode):
 
 class SetterStmtNode(StmtNode):
 
-    def __init__(self, location: Any, setterscope: PropertyScopeNode):
+    child_fields = ('scope',)
+
+    def __init__(self, location: Location, setterscope: PropertyScopeNode):
         super().__init__(location)
         self.scope: PropertyScopeNode = setterscope
 
@@ -800,7 +1044,9 @@ class SetterStmtNode(StmtNode):
 
 class IfThenStmtNode(StmtNode):
 
-    def __init__(self, location: Any, condexpr: 'ExprNode', thenscope: BasicScopeNode):
+    child_fields = ('condexpr', 'thenscope')
+
+    def __init__(self, location: Location, condexpr: 'ExprNode', thenscope: BasicScopeNode):
         super().__init__(location)
         self.condexpr: ExprNode = condexpr
         self.thenscope: BasicScopeNode = thenscope
@@ -812,7 +1058,9 @@ class IfThenStmtNode(StmtNode):
 
 class IfElseStmtNode(StmtNode):
 
-    def __init__(self, location: Any, condexpr: 'ExprNode', thenscope: BasicScopeNode, elsescope: BasicScopeNode):
+    child_fields = ('condexpr', 'thenscope', 'elsescope')
+
+    def __init__(self, location: Location, condexpr: 'ExprNode', thenscope: BasicScopeNode, elsescope: BasicScopeNode):
         super().__init__(location)
         self.condexpr: ExprNode = condexpr
         self.thenscope: BasicScopeNode = thenscope
@@ -826,7 +1074,9 @@ class IfElseStmtNode(StmtNode):
 
 class WhileStmtNode(StmtNode):
 
-    def __init__(self, location: Any, condexpr: 'ExprNode', loopscope: LoopScopeNode, label: Optional[str] = None):
+    child_fields = ('condexpr', 'scope')
+
+    def __init__(self, location: Location, condexpr: 'ExprNode', loopscope: LoopScopeNode, label: Optional[str] = None):
         super().__init__(location)
         self.condexpr: ExprNode = condexpr
         self.scope: LoopScopeNode = loopscope
@@ -842,7 +1092,9 @@ class WhileStmtNode(StmtNode):
 
 class DoWhileStmtNode(StmtNode):
 
-    def __init__(self, location: Any, condexpr: 'ExprNode', loopscope: LoopScopeNode, label: Optional[str] = None):
+    child_fields = ('condexpr', 'scope')
+
+    def __init__(self, location: Location, condexpr: 'ExprNode', loopscope: LoopScopeNode, label: Optional[str] = None):
         super().__init__(location)
         self.condexpr: ExprNode = condexpr
         self.scope: LoopScopeNode = loopscope
@@ -858,7 +1110,9 @@ class DoWhileStmtNode(StmtNode):
 
 class DoUntilStmtNode(StmtNode):
 
-    def __init__(self, location: Any, condexpr: 'ExprNode', loopscope: LoopScopeNode, label: Optional[str] = None):
+    child_fields = ('condexpr', 'scope')
+
+    def __init__(self, location: Location, condexpr: 'ExprNode', loopscope: LoopScopeNode, label: Optional[str] = None):
         super().__init__(location)
         self.condexpr: ExprNode = condexpr
         self.scope: LoopScopeNode = loopscope
@@ -874,8 +1128,10 @@ class DoUntilStmtNode(StmtNode):
 
 class RepeatStmtNode(StmtNode):
 
-    def __init__(self, location: Any, startdecls: 'VarDeclNode', stopexprs: 'ExprNode', stepstmts: 'AssignmentStmtNode',
-                 loopscope: LoopScopeNode, label: Optional[str] = None):
+    child_fields = ('startdecl', 'stopexpr', 'stepstmt', 'scope')
+
+    def __init__(self, location: Location, startdecls: 'VarDeclNode', stopexprs: 'ExprNode',
+                 stepstmts: 'AssignmentStmtNode', loopscope: LoopScopeNode, label: Optional[str] = None):
         super().__init__(location)
         self.startdecl: VarDeclNode = startdecls
         self.stopexpr: ExprNode = stopexprs
@@ -893,7 +1149,9 @@ class RepeatStmtNode(StmtNode):
 
 class ForStmtNode(StmtNode):
 
-    def __init__(self, location: Any, startdecls: List['VarDeclNode'], stopexprs: List['ExprNode'],
+    child_fields = ('startdecls', 'stopexprs', 'stepstmts', 'scope')
+
+    def __init__(self, location: Location, startdecls: List['VarDeclNode'], stopexprs: List['ExprNode'],
                  stepstmts: List['ExpressionStmtNode'], loopscope: LoopScopeNode, label: Optional[str] = None):
         super().__init__(location)
         self.startdecls: List[VarDeclNode] = startdecls
@@ -916,17 +1174,26 @@ class ForStmtNode(StmtNode):
 
 
 class ForEachStmtNode(StmtNode):
+    """For each statement node.
 
-    def __init__(self, location: Any, elmtdecl: VarDeclNode, setexpr: 'ExprNode', loopscope: LoopScopeNode,
-                 label: Optional[str] = None):
+    :ivar parallel: whether the iterations may run in parallel (see brah.m_parallel)
+    :ivar reductions: the reduction operator of each outer variable a parallel body accumulates into
+    """
+
+    child_fields = ('element', 'container', 'scope')
+
+    def __init__(self, location: Location, elmtdecl: VarDeclNode, setexpr: 'ExprNode', loopscope: LoopScopeNode,
+                 label: Optional[str] = None, parallel: bool = False, reductions: Optional[Dict[str, str]] = None):
         super().__init__(location)
         self.element: VarDeclNode = elmtdecl
         self.container: ExprNode = setexpr
         self.scope: LoopScopeNode = loopscope
         self.label: Optional[str] = label
+        self.parallel: bool = parallel
+        self.reductions: Dict[str, str] = reductions or {}
 
     def _node_title(self) -> str:
-        return f"{self._node_name} :: (Label: {self.label})"
+        return f"{self._node_name} :: (Label: {self.label}{', Parallel' if self.parallel else ''})"
 
     def _print_leves(self, depth: str, output: Optional[List[str]] = None):
         self.element.print(self, depth, 'loop item', False, output)
@@ -936,7 +1203,9 @@ class ForEachStmtNode(StmtNode):
 
 class SwitchStmtNode(StmtNode):
 
-    def __init__(self, location: Any, targetexpr: 'NameExprNode', stmtcases: List['CaseStmtNode'],
+    child_fields = ('targetexpr', 'cases')
+
+    def __init__(self, location: Location, targetexpr: 'NameExprNode', stmtcases: List['CaseStmtNode'],
                  label: Optional[str] = None):
         super().__init__(location)
         self.cases: List[CaseStmtNode] = stmtcases
@@ -955,7 +1224,10 @@ class SwitchStmtNode(StmtNode):
 
 class CaseStmtNode(StmtNode):
 
-    def __init__(self, location: Any, caseexpr: List['ExprNode'], casescope: CaseScopeNode, is_default: bool = False):
+    child_fields = ('cases', 'scope')
+
+    def __init__(self, location: Location, caseexpr: List['ExprNode'], casescope: CaseScopeNode,
+                 is_default: bool = False):
         super().__init__(location)
         self.cases: List[ExprNode] = caseexpr
         self.scope: CaseScopeNode = casescope
@@ -972,7 +1244,9 @@ class CaseStmtNode(StmtNode):
 
 class TryStmtNode(StmtNode):
 
-    def __init__(self, location: Any, stmtclauses: List['ExceptClauseStmtNode'], tryscope: TryScopeNode):
+    child_fields = ('scope', 'clauses')
+
+    def __init__(self, location: Location, stmtclauses: List['ExceptClauseStmtNode'], tryscope: TryScopeNode):
         super().__init__(location)
         self.clauses: List[ExceptClauseStmtNode] = stmtclauses
         self.scope: TryScopeNode = tryscope
@@ -988,7 +1262,9 @@ class TryStmtNode(StmtNode):
 
 class ExceptClauseStmtNode(StmtNode):
 
-    def __init__(self, location: Any, catches: List['ExceptionNameExprNode'], xcptscope: ScopeNode):
+    child_fields = ('catches', 'scope')
+
+    def __init__(self, location: Location, catches: List['ExceptionNameExprNode'], xcptscope: ScopeNode):
         super().__init__(location)
         self.catches: List[ExceptionNameExprNode] = catches
         self.scope: ScopeNode = xcptscope
@@ -1004,7 +1280,9 @@ class ExceptClauseStmtNode(StmtNode):
 
 class RaiseStmtNode(StmtNode):
 
-    def __init__(self, location: Any, xcptexpr: 'ExceptionNameExprNode'):
+    child_fields = ('xcptexpr',)
+
+    def __init__(self, location: Location, xcptexpr: 'ExceptionNameExprNode'):
         super().__init__(location)
         self.xcptexpr: ExceptionNameExprNode = xcptexpr
 
@@ -1015,7 +1293,7 @@ class ImportStmtNode(StmtNode):
 
 class BreakStmtNode(StmtNode):
 
-    def __init__(self, location: Any, stmtlabel: Optional[str] = None):
+    def __init__(self, location: Location, stmtlabel: Optional[str] = None):
         super().__init__(location)
         self.stmtlabel: Optional[str] = stmtlabel
 
@@ -1026,7 +1304,7 @@ class BreakStmtNode(StmtNode):
 
 class ContinueStmtNode(StmtNode):
 
-    def __init__(self, location: Any, stmtlabel: Optional[str] = None):
+    def __init__(self, location: Location, stmtlabel: Optional[str] = None):
         super().__init__(location)
         self.stmtlabel: Optional[str] = stmtlabel
 
@@ -1037,7 +1315,9 @@ class ContinueStmtNode(StmtNode):
 
 class ReturnStmtNode(StmtNode):
 
-    def __init__(self, location: Any, exprvalue: Optional['ExprNode'] = None):
+    child_fields = ('valueexpr',)
+
+    def __init__(self, location: Location, exprvalue: Optional['ExprNode'] = None):
         super().__init__(location)
         self.valueexpr: Optional[ExprNode] = exprvalue
 
@@ -1053,9 +1333,14 @@ class ReturnStmtNode(StmtNode):
 
 
 class ExprNode(SourceNode):
+    """Expression node base class.
 
-    def __init__(self, location: Any):
+    :ivar type: the type of the value, set by type inference (see brah.p_types)
+    """
+
+    def __init__(self, location: Location):
         super().__init__(location)
+        self.type: Optional[Union[TypeNode, TyclNode]] = None
 
     def _node_title(self) -> str:
         return f"{self._node_name}"
@@ -1063,9 +1348,9 @@ class ExprNode(SourceNode):
 
 class LiteralExprNode(ExprNode):
 
-    def __init__(self, location: Any, value: Union[str, int, float], valuetype: TypeNode):
+    def __init__(self, location: Location, value: Union[str, int, float], valuetype: TypeNode):
         super().__init__(location)
-        self.value: Union[str, int, float] = value
+        self.value: Union[str, int, float] = intern(value) if isinstance(value, str) else value
         self.type: TypeNode = valuetype
 
     def _node_title(self) -> str:
@@ -1074,9 +1359,9 @@ class LiteralExprNode(ExprNode):
 
 class NameExprNode(ExprNode):
 
-    def __init__(self, location: Any, name: str):
+    def __init__(self, location: Location, name: str):
         super().__init__(location)
-        self.name: str = name
+        self.name: str = intern(name)
 
     def _node_title(self) -> str:
         return f"{self._node_name} :: {self.name}"
@@ -1129,7 +1414,9 @@ class ExceptionNameExprNode(NameExprNode):
 
 class UnaryExprNode(ExprNode):
 
-    def __init__(self, location: Any, operand: ExprNode):
+    child_fields = ('operand',)
+
+    def __init__(self, location: Location, operand: ExprNode):
         super().__init__(location)
         self.operand: ExprNode = operand
 
@@ -1142,7 +1429,7 @@ class UnaryExprNode(ExprNode):
 
 class IncrUnaryExprNode(UnaryExprNode):
 
-    def __init__(self, location: Any, operand: ExprNode, is_post: bool):
+    def __init__(self, location: Location, operand: ExprNode, is_post: bool):
         super().__init__(location, operand)
         self.is_post: bool = is_post
 
@@ -1152,7 +1439,7 @@ class IncrUnaryExprNode(UnaryExprNode):
 
 class DecrUnaryExprNode(UnaryExprNode):
 
-    def __init__(self, location: Any, operand: ExprNode, is_post: bool):
+    def __init__(self, location: Location, operand: ExprNode, is_post: bool):
         super().__init__(location, operand)
         self.is_post: bool = is_post
 
@@ -1186,7 +1473,10 @@ class UnpackUnaryExprNode(UnaryExprNode):
 
 class BinaryExprNode(ExprNode):
 
-    def __init__(self, location: Any, leftexpr: ExprNode, rightexpr: ExprNode, operator: str, is_inplace: bool = False):
+    child_fields = ('left', 'right')
+
+    def __init__(self, location: Location, leftexpr: ExprNode, rightexpr: ExprNode, operator: str,
+                 is_inplace: bool = False):
         super().__init__(location)
         self.left: ExprNode = leftexpr
         self.right: ExprNode = rightexpr
@@ -1228,7 +1518,9 @@ class OrBinaryExprNode(BinaryExprNode):
 
 class TernaryExprNode(ExprNode):
 
-    def __init__(self, location: Any, condition: ExprNode, thenexpr: ExprNode, elseexpr: ExprNode):
+    child_fields = ('condition', 'thenexpr', 'elseexpr')
+
+    def __init__(self, location: Location, condition: ExprNode, thenexpr: ExprNode, elseexpr: ExprNode):
         super().__init__(location)
         self.condition: ExprNode = condition
         self.thenexpr: ExprNode = thenexpr
@@ -1245,7 +1537,9 @@ class TernaryExprNode(ExprNode):
 
 class DirectCallExprNode(ExprNode):
 
-    def __init__(self, location: Any, funcnameexpr: FunctionNameExprNode, arglist: List[ExprNode]):
+    child_fields = ('funcnameexpr', 'arglist')
+
+    def __init__(self, location: Location, funcnameexpr: FunctionNameExprNode, arglist: List[ExprNode]):
         super().__init__(location)
         self.funcnameexpr: FunctionNameExprNode = funcnameexpr
         self.arglist: List[ExprNode] = arglist
@@ -1261,7 +1555,9 @@ class DirectCallExprNode(ExprNode):
 
 class IndirectCallExprNode(ExprNode):
 
-    def __init__(self, location: Any, callableexpr: ExprNode, arglist: List[ExprNode]):
+    child_fields = ('callableexpr', 'arglist')
+
+    def __init__(self, location: Location, callableexpr: ExprNode, arglist: List[ExprNode]):
         super().__init__(location)
         self.callableexpr: ExprNode = callableexpr
         self.arglist: List[ExprNode] = arglist
@@ -1278,7 +1574,9 @@ class IndirectCallExprNode(ExprNode):
 
 class IndexExprNode(ExprNode):
 
-    def __init__(self, location: Any, baseexpr: ExprNode, indexexpr: ExprNode):
+    child_fields = ('baseexpr', 'indexexpr')
+
+    def __init__(self, location: Location, baseexpr: ExprNode, indexexpr: ExprNode):
         super().__init__(location)
         self.baseexpr: ExprNode = baseexpr
         self.indexexpr: ExprNode = indexexpr
@@ -1293,7 +1591,9 @@ class IndexExprNode(ExprNode):
 
 class MemberExprNode(ExprNode):
 
-    def __init__(self, location: Any, baseexpr: ExprNode, memberexpr: NameExprNode):
+    child_fields = ('baseexpr', 'memberexpr')
+
+    def __init__(self, location: Location, baseexpr: ExprNode, memberexpr: NameExprNode):
         super().__init__(location)
         self.baseexpr: ExprNode = baseexpr
         self.memberexpr: NameExprNode = memberexpr
@@ -1307,7 +1607,9 @@ class MemberExprNode(ExprNode):
 
 class AggregateExprNode(ExprNode):
 
-    def __init__(self, location: Any, exprlist: List[ExprNode]):
+    child_fields = ('exprlist',)
+
+    def __init__(self, location: Location, exprlist: List[ExprNode]):
         super().__init__(location)
         self.exprlist: List[ExprNode] = exprlist
 
@@ -1322,7 +1624,9 @@ class AggregateExprNode(ExprNode):
 
 class LValueExprNode(ExprNode):
 
-    def __init__(self, location: Any, exprtarget: ExprNode):
+    child_fields = ('exprtarget',)
+
+    def __init__(self, location: Location, exprtarget: ExprNode):
         super().__init__(location)
         self.exprtarget: ExprNode = exprtarget
 
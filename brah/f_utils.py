@@ -1,17 +1,56 @@
-from typing import List
+import re
+from bisect import bisect_left
+from itertools import count
+from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
 
 __all__ = [
+    # constants
+    'Location',
+    'NO_LOCATION',
+
+    # functions
+    'pack_location',
+    'unpack_location',
+
+    # classes
     'DeclOffset',
+    'LocationTable',
+    'SourceCode',
 ]
 
 # ---------------------------------------------------------
 # region CONSTANTS & ENUMS
 
+Location = int
+"""Source location of a node: the file id in the high bits and the zero-based character offset in the low
+OFFSET_BITS bits. Lines and columns are only computed when needed, from the newline index of the file."""
+
+OFFSET_BITS: int = 32
+OFFSET_MASK: int = (1 << OFFSET_BITS) - 1
+
+NO_LOCATION: Location = -1
+"""Location of nodes that do not come from the source (e.g. built by compiler passes)."""
+
+_BRACE_OR_SKIPPED = re.compile(r'[{}"]|//|/\*')
+_STRING_TAIL = re.compile(r'(?:[^"\\\n]|\\.)*"')
+_COMMENT_TAILS = {'//': re.compile(r'[^\n]*'), '/*': re.compile(r'(?s:.)*?\*/')}
+
+_file_ids = count()
+
 # endregion (constants)
 # ---------------------------------------------------------
 # region FUNCTIONS
 
+
+def pack_location(file_id: int, offset: int) -> Location:
+    return (file_id << OFFSET_BITS) | offset
+
+
+def unpack_location(location: Location) -> Tuple[int, int]:
+    """Returns the file id and the character offset of a location."""
+    return location >> OFFSET_BITS, location & OFFSET_MASK
+
 # endregion (functions)
 # ---------------------------------------------------------
 # region CLASSES
@@ -41,12 +80,100 @@ class SourceCode:
     def __init__(self, source: str, filepath: str):
         self.source: str = source
         self.filepath: str = filepath
+        self.file_id: int = next(_file_ids)
 
         # scanner markers
         self.index: int = 0
         self.line_index: int = 0
         self.newlines: List[int] = []
 
+    def location(self, index: int) -> Location:
+        """Returns the packed location of a zero-based source index."""
+        return pack_location(self.file_id, index)
+
+    def index_newlines(self) -> List[int]:
+        """Fills the newline index from the source, if the scanner has not done it yet."""
+        if not self.newlines:
+            find = self.source.find
+            index = find('\n')
+            while index != -1:
+                self.newlines.append(index)
+                index = find('\n', index + 1)
+        return self.newlines
+
+    def position(self, index: int) -> Tuple[int, int]:
+        """Returns the one-based (line, column) of a zero-based source index."""
+        newlines = self.index_newlines()
+        line = bisect_left(newlines, index)
+        start = newlines[line - 1] + 1 if line else 0
+        return line + 1, index - start + 1
+
+    def match_brace(self, index: int) -> int:
+        """Returns the index of the '}' closing the '{' at the given index, or -1 if it is never closed.
+
+        String literals and comments (``//`` to the end of the line, ``/* */``) are
+        skipped, so braces inside them are not counted.
+        """
+        source: str = self.source
+        search = _BRACE_OR_SKIPPED.search
+        depth: int = 0
+        while True:
+            match = search(source, index)
+            if match is None:
+                return -1
+            index = match.end()
+            token: str = match.group()
+            if token == '{':
+                depth += 1
+            elif token == '}':
+                depth -= 1
+                if not depth:
+                    return match.start()
+            else:
+                tail = (_STRING_TAIL if token == '"' else _COMMENT_TAILS[token]).match(source, index)
+                if tail is None:
+                    return -1
+                index = tail.end()
+
+    def line_of(self, index: int) -> int:
+        """Returns the one-based line number of a zero-based source index."""
+        return bisect_left(self.index_newlines(), index) + 1
+
+
+class LocationTable:
+    """Resolves packed locations to file, line and column through the sources they come from."""
+
+    def __init__(self, *sources: SourceCode):
+        self.sources: Dict[int, SourceCode] = {source.file_id: source for source in sources}
+
+    def add(self, source: SourceCode) -> None:
+        self.sources[source.file_id] = source
+
+    def update(self, other: 'LocationTable') -> None:
+        self.sources.update(other.sources)
+
+    def source_of(self, location: Location) -> Optional[SourceCode]:
+        if location < 0:
+            return None
+        return self.sources.get(location >> OFFSET_BITS)
+
+    def line_of(self, location: Location) -> Optional[int]:
+        source: Optional[SourceCode] = self.source_of(location)
+        return source.line_of(location & OFFSET_MASK) if source else None
+
+    def resolve(self, location: Location) -> Optional[Tuple[str, int, int]]:
+        """Returns the file path and the one-based line and column of the location."""
+        source: Optional[SourceCode] = self.source_of(location)
+        if source is None:
+            return None
+        return (source.filepath, *source.position(location & OFFSET_MASK))
+
+    def format(self, location: Location) -> str:
+        resolved: Optional[Tuple[str, int, int]] = self.resolve(location)
+        if resolved is None:
+            return '?'
+        return f"{resolved[0]}:{resolved[1]}:{resolved[2]}"
+
 
 # endregion (classes)
 # ---------------------------------------------------------
@@ -0,0 +1,384 @@
+"""Profiler
+
+Collects execution counts and timings of Brah functions, methods and loops.
+
+Code compiled with ``trace=True`` brackets each profiled node with
+``enter``/``leave`` and calls ``tick`` once per loop iteration of the
+``Profiler`` it is given; untraced code does not pay for any of it.
+
+Object pools report to ``AllocStats`` counters owned by the profiler, so
+allocations are counted by class whether or not calls are being timed.
+
+For production use, the ``SamplingProfiler`` instead reads at a fixed interval
+the ``ExecStack`` compiled code keeps when given one. Keeping it costs a list
+append and pop per call and a store per statement, far less than timing every call;
+``python -m brah.h_benchmark -s`` measures what it costs on the benchmark programs.
+"""
+import signal
+import threading
+from time import perf_counter, thread_time, sleep
+from typing import Optional, List, Dict, Tuple, Union
+from dataclasses import dataclass
+
+from brah.c_astnodes import (
+    SourceNode, FunctionDeclNode, MethodDeclNode, WhileStmtNode, ForStmtNode, ForEachStmtNode, TyclNode
+)
+from brah.f_utils import Location, LocationTable, NO_LOCATION
+
+
+__all__ = [
+    # constants
+    'PROFILED_NODES',
+    'SAMPLING_MODES',
+
+    # functions
+    'node_label',
+
+    # classes
+    'AllocStats',
+    'ExecStack',
+    'NodeStats',
+    'Profiler',
+    'SamplingProfiler',
+]
+
+# ---------------------------------------------------------
+# region CONSTANTS & ENUMS
+
+
+PROFILED_NODES = (FunctionDeclNode, MethodDeclNode, WhileStmtNode, ForStmtNode, ForEachStmtNode)
+"""Node classes the execution engine reports to the profiler."""
+
+SAMPLING_MODES = ('thread', 'signal')
+"""Ways the SamplingProfiler can be woken up: a timer thread or a SIGPROF interval timer."""
+
+_LINE: str = 'line '
+
+# endregion (constants)
+# ---------------------------------------------------------
+# region FUNCTIONS
+
+
+def node_label(node: SourceNode, line: Optional[int] = None) -> str:
+    """Returns the name used for the node in reports and flame graphs."""
+    if isinstance(node, MethodDeclNode):
+        return f"{node.thisdecl.name}.{node.name}"
+    elif isinstance(node, FunctionDeclNode):
+        return node.name
+    label: Optional[str] = getattr(node, 'label', None)
+    name: str = node._node_name
+    if label:
+        name = f"{name}:{label}"
+    return f"{name}@{line}" if line else name
+
+# endregion (functions)
+# ---------------------------------------------------------
+# region CLASSES
+
+
+@dataclass
+class NodeStats:
+    """Accumulated measures of a single profiled node."""
+
+    node: SourceNode
+    """The FunctionDeclNode, MethodDeclNode or loop statement measured."""
+
+    label: str
+    """The name of the node in reports and flame graphs."""
+
+    count: int = 0
+    """Number of times the node was entered."""
+
+    iterations: int = 0
+    """Number of loop iterations (loops only)."""
+
+    wall: float = 0.0
+    """Inclusive wall time in seconds. Recursive re-entries are not counted twice."""
+
+    cpu: float = 0.0
+    """Inclusive CPU time of the executing thread in seconds."""
+
+    self_wall: float = 0.0
+    """Wall time in seconds spent in the node itself, excluding profiled children."""
+
+
+@dataclass
+class AllocStats:
+    """Instance allocation counters of a single class or structure."""
+
+    tycl: TyclNode
+    """The class or structure whose instances are counted."""
+
+    allocated: int = 0
+    """Number of host objects created."""
+
+    reused: int = 0
+    """Number of instances taken from the free-list instead of being created."""
+
+    released: int = 0
+    """Number of instances given back to the free-list."""
+
+    scoped: int = 0
+    """Number of instances allocated in a per-call arena, proven not to escape the call."""
+
+    def reset(self) -> None:
+        self.allocated = self.reused = self.released = self.scoped = 0
+
+
+class Profiler:
+    """Deterministic profiler driven by the execution engine.
+
+    :ivar locations: the table used to map node locations to files and lines
+    :ivar stats: the accumulated measures, by node
+    :ivar stacks: self wall time in seconds, by collapsed call stack
+    :ivar allocations: the instance allocation counters, by class
+    """
+
+    def __init__(self, locations: Optional[LocationTable] = None):
+        self.locations: Optional[LocationTable] = locations
+        self.stats: Dict[SourceNode, NodeStats] = {}
+        self.stacks: Dict[Tuple[str, ...], float] = {}
+        self.allocations: Dict[TyclNode, AllocStats] = {}
+
+        # [node, wall start, cpu start, children wall time]
+        self._frames: List[list] = []
+        self._labels: List[str] = []
+        self._active: Dict[SourceNode, int] = {}
+
+    def line_of(self, node: SourceNode) -> Optional[int]:
+        """Returns the source line of the node, if it can be known."""
+        if self.locations is None:
+            return None
+        return self.locations.line_of(node.location)
+
+    def enter(self, node: SourceNode) -> None:
+        """Marks the beginning of the execution of a profiled node."""
+        stats: Optional[NodeStats] = self.stats.get(node)
+        if stats is None:
+            stats = self.stats[node] = NodeStats(node, node_label(node, self.line_of(node)))
+        stats.count += 1
+        self._active[node] = self._active.get(node, 0) + 1
+        self._labels.append(stats.label)
+        self._frames.append([node, perf_counter(), thread_time(), 0.0])
+
+    def tick(self, node: SourceNode) -> None:
+        """Counts one iteration of a profiled loop."""
+        self.stats[node].iterations += 1
+
+    def leave(self) -> None:
+        """Marks the end of the execution of the innermost profiled node."""
+        wall_end: float = perf_counter()
+        cpu_end: float = thread_time()
+        node, wall_start, cpu_start, children = self._frames.pop()
+        wall: float = wall_end - wall_start
+        stats: NodeStats = self.stats[node]
+        stats.self_wall += wall - children
+
+        key: Tuple[str, ...] = tuple(self._labels)
+        self.stacks[key] = self.stacks.get(key, 0.0) + wall - children
+        self._labels.pop()
+
+        self._active[node] -= 1
+        if not self._active[node]:
+            stats.wall += wall
+            stats.cpu += cpu_end - cpu_start
+        if self._frames:
+            self._frames[-1][3] += wall
+
+    def unwind(self, depth: int = 0) -> None:
+        """Leaves every open node above the given stack depth (e.g. when an exception propagates)."""
+        while len(self._frames) > depth:
+            self.leave()
+
+    @property
+    def depth(self) -> int:
+        return len(self._frames)
+
+    def allocation(self, tycl: TyclNode) -> AllocStats:
+        """Returns the allocation counters of a class, for its pool to update."""
+        stats: Optional[AllocStats] = self.allocations.get(tycl)
+        if stats is None:
+            stats = self.allocations[tycl] = AllocStats(tycl)
+        return stats
+
+    def reset(self) -> None:
+        # pools keep their counters, so they are zeroed instead of dropped
+        for stats in self.allocations.values():
+            stats.reset()
+        self.stats.clear()
+        self.stacks.clear()
+        self._frames.clear()
+        self._labels.clear()
+        self._active.clear()
+
+    def report(self, limit: Optional[int] = None) -> str:
+        """Returns a flat report, sorted by self time, of every profiled node."""
+        lines: List[str] = [
+            f"{'count':>10} {'iters':>10} {'wall (s)':>12} {'self (s)':>12} {'cpu (s)':>12}  location"
+        ]
+        ordered: List[NodeStats] = sorted(self.stats.values(), key=lambda st: st.self_wall, reverse=True)
+        for stats in ordered[:limit]:
+            where: str = self.locations.format(stats.node.location) if self.locations else '?'
+            lines.append(
+                f"{stats.count:>10} {stats.iterations:>10} {stats.wall:>12.6f} {stats.self_wall:>12.6f}"
+                f" {stats.cpu:>12.6f}  {where} {stats.label}"
+            )
+        return '\n'.join(lines)
+
+    def allocation_report(self, limit: Optional[int] = None) -> str:
+        """Returns the allocation counters of every class, sorted by instances requested."""
+        lines: List[str] = [f"{'allocated':>10} {'reused':>10} {'released':>10} {'scoped':>10}  class"]
+        ordered: List[AllocStats] = sorted(self.allocations.values(), key=lambda st: st.allocated + st.reused,
+                                           reverse=True)
+        for stats in ordered[:limit]:
+            lines.append(
+                f"{stats.allocated:>10} {stats.reused:>10} {stats.released:>10} {stats.scoped:>10}  {stats.tycl.name}"
+            )
+        return '\n'.join(lines)
+
+    def collapsed(self) -> List[str]:
+        """Returns the stacks in the collapsed format read by flame graph tools (values in microseconds)."""
+        return [f"{';'.join(stack)} {round(seconds * 1e6)}" for stack, seconds in self.stacks.items()]
+
+    def write_collapsed(self, filepath: str) -> None:
+        with open(filepath, 'w', encoding='utf-8') as output:
+            print('\n'.join(self.collapsed()), file=output)
+
+
+class ExecStack:
+    """The Brah call stack of one thread of execution.
+
+    A frame is a ``[decl, location]`` list: the FunctionDeclNode or MethodDeclNode
+    being executed and the location of the statement being executed, the cheapest
+    object to build and update. Compiled code appends a frame to ``frames`` on every
+    call, pops it on return and stores the location of each statement in it before
+    executing it.
+
+    :ivar frames: the frames of the calls in progress, innermost last
+    """
+
+    def __init__(self):
+        self.frames: List[list] = []
+
+    @property
+    def top(self) -> Optional[list]:
+        return self.frames[-1] if self.frames else None
+
+    def push(self, decl: Union[FunctionDeclNode, MethodDeclNode]) -> list:
+        frame: list = [decl, NO_LOCATION]
+        self.frames.append(frame)
+        return frame
+
+    def pop(self) -> None:
+        self.frames.pop()
+
+
+class SamplingProfiler:
+    """Statistical profiler reading an ExecStack at a fixed interval.
+
+    :ivar stack: the call stack being sampled
+    :ivar interval: the sampling period in seconds
+    :ivar mode: one of SAMPLING_MODES
+    :ivar samples: number of samples taken, by collapsed stack
+    """
+
+    def __init__(self, stack: ExecStack, locations: Optional[LocationTable] = None, interval: float = 0.005,
+                 mode: str = 'thread'):
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode: '{mode}'")
+        self.stack: ExecStack = stack
+        self.locations: Optional[LocationTable] = locations
+        self.interval: float = interval
+        self.mode: str = mode
+        self.samples: Dict[Tuple[str, ...], int] = {}
+
+        self._labels: Dict[SourceNode, str] = {}
+        self._running: bool = False
+        self._thread: Optional[threading.Thread] = None
+        self._previous_handler = None
+
+    def __enter__(self) -> 'SamplingProfiler':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    @property
+    def total(self) -> int:
+        return sum(self.samples.values())
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        if self.mode == 'signal':
+            # the handler runs in the main thread between two bytecodes, so the stack is never half updated
+            self._previous_handler = signal.signal(signal.SIGPROF, self._on_signal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self._thread = threading.Thread(target=self._run, name='brah-sampler', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if not self._running:
+            return
+        self._running = False
+        if self.mode == 'signal':
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+        else:
+            self._thread.join()
+            self._thread = None
+
+    def sample(self) -> None:
+        """Records the current stack once."""
+        frames: List[list] = self.stack.frames.copy()
+        if not frames:
+            return
+        labels: Dict[SourceNode, str] = self._labels
+        key: List[str] = []
+        for decl, _ in frames:
+            label: Optional[str] = labels.get(decl)
+            if label is None:
+                label = labels[decl] = node_label(decl)
+            key.append(label)
+        location: Location = frames[-1][1]
+        if location != NO_LOCATION and self.locations is not None:
+            key.append(f"{_LINE}{self.locations.line_of(location)}")
+        stack: Tuple[str, ...] = tuple(key)
+        self.samples[stack] = self.samples.get(stack, 0) + 1
+
+    def _run(self) -> None:
+        interval: float = self.interval
+        while self._running:
+            sleep(interval)
+            self.sample()
+
+    def _on_signal(self, signum, frame) -> None:
+        self.sample()
+
+    def report(self, limit: Optional[int] = None) -> str:
+        """Returns the share of samples of each function, counting only the innermost frames."""
+        total: int = self.total or 1
+        own: Dict[str, int] = {}
+        for stack, count in self.samples.items():
+            # the line of the innermost frame follows it, unless its location was not known
+            leaf: str = ' '.join(stack[-2:]) if stack[-1].startswith(_LINE) else stack[-1]
+            own[leaf] = own.get(leaf, 0) + count
+        lines: List[str] = [f"{'samples':>10} {'share':>8}  location"]
+        for leaf, count in sorted(own.items(), key=lambda item: item[1], reverse=True)[:limit]:
+            lines.append(f"{count:>10} {count / total:>8.2%}  {leaf}")
+        return '\n'.join(lines)
+
+    def collapsed(self) -> List[str]:
+        """Returns the stacks in the collapsed format read by flame graph tools (values are sample counts)."""
+        return [f"{';'.join(stack)} {count}" for stack, count in self.samples.items()]
+
+    def write_collapsed(self, filepath: str) -> None:
+        with open(filepath, 'w', encoding='utf-8') as output:
+            print('\n'.join(self.collapsed()), file=output)
+
+
+# endregion (classes)
+# ---------------------------------------------------------
@@ -0,0 +1,423 @@
+"""Benchmark Runner
+
+Times each stage of the toolchain over a directory of ``.brah`` programs,
+stores the results as JSON and compares them against a stored baseline.
+
+Stages run in the order of ``STAGES``; each receives the result of the previous
+one. A ``.brah`` file enters at ``load`` and a program built as an AST (see
+``register_program``) at ``compile``; a benchmark then stops at the first stage
+without a registered implementation, since the stages after it could not take its
+input. ``compile`` builds an embedding ``Program``, translating every function
+(``brah.j_hostjit``), and ``execute`` calls its ``principal`` function.
+
+This tree has no front end yet, so ``lex``, ``parse`` and ``resolve`` have no
+implementation and source files are only loaded. They are timed as soon as the
+scanner, parser and resolver register theirs, and ``.brah`` files then run through
+to ``execute``.
+
+With ``-m``, the output of each stage is also measured once (``brah.s_memory``)
+and memory growth over the baseline is reported like a slowdown.
+
+With ``-s``, the entry point of each benchmark program built as an AST (see
+``register_program``) is timed as it is and then while a ``SamplingProfiler``
+reads its call stack, in each sampling mode, and the overhead of sampling is
+reported against ``SAMPLING_OVERHEAD_LIMIT``.
+
+With ``-g``, programs of each given size are generated (``brah.i_srcgen``) and
+run through the stages, to see how each stage scales with the size of its input.
+
+Usage::
+
+    python -m brah.h_benchmark examples/benchmarks -m -o results.json -b baseline.json
+    python -m brah.h_benchmark examples/benchmarks -s
+    python -m brah.h_benchmark -g 64KB,1MB,10MB --seed 7
+"""
+import os
+import sys
+import json
+import signal
+import platform
+import statistics
+import tempfile
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import Optional, Any, List, Dict, Callable, Tuple, Union
+
+from brah.c_astnodes import *
+from brah.f_utils import SourceCode
+from brah.g_profiler import SAMPLING_MODES, ExecStack, SamplingProfiler
+from brah.i_srcgen import SourceShape, generate, parse_size
+from brah.k_optimizer import ENTRY_POINT
+from brah.n_embed import Program
+from brah.s_memory import MemorySnapshot, take_snapshot, format_diff
+
+
+__all__ = [
+    # constants
+    'SAMPLING_OVERHEAD_LIMIT',
+    'STAGES',
+
+    # functions
+    'compare',
+    'compare_memory',
+    'main',
+    'register_program',
+    'register_stage',
+    'measure_benchmark',
+    'measure_sampling',
+    'run_benchmark',
+    'run_suite',
+    'run_sweep',
+]
+
+# ---------------------------------------------------------
+# region CONSTANTS & ENUMS
+
+
+STAGES: Tuple[str, ...] = ('load', 'lex', 'parse', 'resolve', 'compile', 'execute')
+"""Names of the toolchain stages, in execution order."""
+
+DEFAULT_REPEAT: int = 5
+DEFAULT_TOLERANCE: float = 0.10
+
+SAMPLING_OVERHEAD_LIMIT: float = 0.05
+"""Largest slowdown of a program whose call stack is kept and sampled, over the same program run as it is."""
+
+_stage_funcs: Dict[str, Callable[[Any], Any]] = {}
+_programs: Dict[str, Callable[[], AsmbNode]] = {}
+
+# endregion (constants)
+# ---------------------------------------------------------
+# region FUNCTIONS
+
+
+def _load(filepath: str) -> SourceCode:
+    source: SourceCode = SourceCode.load(filepath, encoding='utf-8')
+    source.index_newlines()
+    return source
+
+
+def _declare_function(scope: ModuleScopeNode, name: str, restype: TypeNode, params: Dict[str, TypeNode],
+                      body: FunctionScopeNode, exports: bool = False) -> None:
+    scope.declarations[name] = FunctionDeclNode(0, 0, name, restype, {
+        paramname: ParamDeclNode(0, index, paramname, paramtype)
+        for index, (paramname, paramtype) in enumerate(params.items())
+    }, body, exports=exports)
+
+
+def _calls_program() -> AsmbNode:
+    """``principal()`` returns ``fibonacci(22)``, computed by naive recursion: a call per handful of
+    operations, where keeping the call stack costs the most."""
+    i32 = IntegerTypeNode(0, 'i32', 4, True)
+    i64 = IntegerTypeNode(0, 'i64', 8, True)
+    scope = ModuleScopeNode(0)
+    n = ParamNameExprNode(0, 'n')
+
+    body = FunctionScopeNode(0, scope)
+    then = BasicScopeNode(0, body)
+    then.statements.append(ReturnStmtNode(0, n))
+    body.statements.append(IfThenStmtNode(0, CompareBinaryExprNode(0, n, LiteralExprNode(0, 2, i32), '<'), then))
+    calls: List[ExprNode] = [
+        DirectCallExprNode(0, FunctionNameExprNode(0, 'fibonacci'), [
+            AddBinaryExprNode(0, n, LiteralExprNode(0, step, i32), '-'),
+        ])
+        for step in (1, 2)
+    ]
+    body.statements.append(ReturnStmtNode(0, AddBinaryExprNode(0, calls[0], calls[1], '+')))
+    _declare_function(scope, 'fibonacci', i64, {'n': i32}, body)
+
+    body = FunctionScopeNode(0, scope)
+    body.statements.append(ReturnStmtNode(0, DirectCallExprNode(0, FunctionNameExprNode(0, 'fibonacci'), [
+        LiteralExprNode(0, 22, i32),
+    ])))
+    _declare_function(scope, ENTRY_POINT, i64, {}, body, exports=True)
+
+    asmb = AsmbNode()
+    asmb['calls'] = ModuleNode('calls', scope)
+    return asmb
+
+
+def _loops_program() -> AsmbNode:
+    """``principal()`` adds up the multiples of 3 below 200000 and takes one for every other
+    number, in a loop with a branch."""
+    i32 = IntegerTypeNode(0, 'i32', 4, True)
+    i64 = IntegerTypeNode(0, 'i64', 8, True)
+    scope = ModuleScopeNode(0)
+    i, total = VarNameExprNode(0, 'i'), VarNameExprNode(0, 'total')
+
+    body = FunctionScopeNode(0, scope)
+    body.declarations['total'] = VarDeclNode(0, 0, 'total', i64, LiteralExprNode(0, 0, i64))
+    loop = LoopScopeNode(0, body)
+    then, otherwise = BasicScopeNode(0, loop), BasicScopeNode(0, loop)
+    then.statements.append(ExpressionStmtNode(0, AddBinaryExprNode(0, total, i, '+=', True)))
+    otherwise.statements.append(ExpressionStmtNode(0, AddBinaryExprNode(
+        0, total, LiteralExprNode(0, 1, i64), '-=', True
+    )))
+    loop.statements.append(IfElseStmtNode(0, CompareBinaryExprNode(
+        0, MultBinaryExprNode(0, i, LiteralExprNode(0, 3, i32), '%'), LiteralExprNode(0, 0, i32), '=='
+    ), then, otherwise))
+    body.statements.append(ForStmtNode(
+        0, [VarDeclNode(0, 1, 'i', i32, LiteralExprNode(0, 0, i32))],
+        [CompareBinaryExprNode(0, i, LiteralExprNode(0, 200_000, i32), '<')],
+        [ExpressionStmtNode(0, IncrUnaryExprNode(0, i, True))], loop
+    ))
+    body.statements.append(ReturnStmtNode(0, total))
+    _declare_function(scope, ENTRY_POINT, i64, {}, body, exports=True)
+
+    asmb = AsmbNode()
+    asmb['loops'] = ModuleNode('loops', scope)
+    return asmb
+
+
+def _compile(asmb: AsmbNode) -> Program:
+    return Program(asmb, contexts=1)
+
+
+def _execute(program: Program) -> Any:
+    return program.call(ENTRY_POINT)
+
+
+def register_stage(name: str, func: Callable[[Any], Any]) -> None:
+    """Sets the implementation of a stage. It receives the output of the previous stage."""
+    if name not in STAGES:
+        raise ValueError(f"Unknown stage: '{name}'")
+    _stage_funcs[name] = func
+
+
+def _pipeline(source: Union[str, Callable[[], AsmbNode]]) -> List[str]:
+    """Returns the stages a benchmark runs through: the registered ones from the stage it enters
+    at, up to the first without an implementation."""
+    first: str = 'load' if isinstance(source, str) else 'compile'
+    stages: List[str] = []
+    for name in STAGES[STAGES.index(first):]:
+        if name not in _stage_funcs:
+            break
+        stages.append(name)
+    return stages
+
+
+def register_program(name: str, build: Callable[[], AsmbNode]) -> None:
+    """Adds a benchmark program built as an AST. ``build`` returns a new assembly whose
+    ``principal`` function runs the benchmark."""
+    _programs[name] = build
+
+
+def _best_call(program: Program, repeat: int) -> float:
+    times: List[float] = []
+    for _ in range(repeat):
+        start: float = perf_counter()
+        program.call(ENTRY_POINT)
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def measure_sampling(build: Callable[[], AsmbNode], mode: str = 'thread',
+                     repeat: int = DEFAULT_REPEAT) -> Dict[str, float]:
+    """Returns the minimum time in seconds of the entry point of a program run as it is and
+    run keeping its call stack while a SamplingProfiler reads it, their ratio less one and
+    the number of samples taken."""
+    plain = Program(build(), contexts=1)
+    stack = ExecStack()
+    sampled = Program(build(), contexts=1, stack=stack)
+    before: float = _best_call(plain, repeat)
+    with SamplingProfiler(stack, mode=mode) as sampler:
+        after: float = _best_call(sampled, repeat)
+    return {'plain': before, 'sampled': after, 'overhead': after / before - 1.0, 'samples': sampler.total}
+
+
+def _sampling_modes() -> List[str]:
+    # the signal mode needs an interval timer, which not every platform has
+    return [mode for mode in SAMPLING_MODES if mode != 'signal' or hasattr(signal, 'setitimer')]
+
+
+def run_benchmark(source: Union[str, Callable[[], AsmbNode]],
+                  repeat: int = DEFAULT_REPEAT) -> Dict[str, Dict[str, float]]:
+    """Runs the stages over a source file, or a program built as an AST by the given function,
+    returning timings in seconds by stage. Programs are built anew, untimed, for every run."""
+    samples: Dict[str, List[float]] = {name: [] for name in _pipeline(source)}
+    for _ in range(repeat):
+        value: Any = source if isinstance(source, str) else source()
+        for name in samples:
+            func: Callable[[Any], Any] = _stage_funcs[name]
+            start: float = perf_counter()
+            value = func(value)
+            samples[name].append(perf_counter() - start)
+
+    return {
+        name: {
+            'min': min(times),
+            'median': statistics.median(times),
+            'mean': statistics.fmean(times),
+        }
+        for name, times in samples.items()
+    }
+
+
+def measure_benchmark(source: Union[str, Callable[[], AsmbNode]]) -> Dict[str, Dict[str, Any]]:
+    """Runs the stages over a source file or a program built as an AST once, returning a memory
+    snapshot of the output of each stage."""
+    snapshots: Dict[str, Dict[str, Any]] = {}
+    value: Any = source if isinstance(source, str) else source()
+    for name in _pipeline(source):
+        value = _stage_funcs[name](value)
+        snapshots[name] = take_snapshot(value, name).to_dict()
+    return snapshots
+
+
+def run_suite(directory: str, repeat: int = DEFAULT_REPEAT, names: Optional[List[str]] = None,
+              memory: bool = False) -> Dict[str, Any]:
+    """Runs every ``.brah`` file of a directory and every registered program (or only the given
+    names), measuring the memory held by the output of each stage if asked to."""
+    results: Dict[str, Any] = {
+        'meta': {
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'stages': [name for name in STAGES if name in _stage_funcs],
+        },
+        'benchmarks': {},
+    }
+    if memory:
+        results['memory'] = {}
+    for fname in sorted(os.listdir(directory)):
+        name, ext = os.path.splitext(fname)
+        if ext != '.brah' or (names and name not in names):
+            continue
+        results['benchmarks'][name] = run_benchmark(os.path.join(directory, fname), repeat)
+        if memory:
+            results['memory'][name] = measure_benchmark(os.path.join(directory, fname))
+    for name, build in _programs.items():
+        if names and name not in names:
+            continue
+        results['benchmarks'][name] = run_benchmark(build, repeat)
+        if memory:
+            results['memory'][name] = measure_benchmark(build)
+    return results
+
+
+def run_sweep(sizes: List[int], shape: Optional[SourceShape] = None, seed: int = 0,
+              repeat: int = DEFAULT_REPEAT) -> Dict[int, Dict[str, float]]:
+    """Generates a program of each size and runs the stages over its modules, returning by size
+    the sum over the modules of the minimum time in seconds of each stage."""
+    sweep: Dict[int, Dict[str, float]] = {}
+    for size in sizes:
+        totals: Dict[str, float] = {}
+        with tempfile.TemporaryDirectory(prefix='brah-sweep-') as directory:
+            for filepath in generate(directory, size, shape, seed):
+                for stage, timings in run_benchmark(filepath, repeat).items():
+                    totals[stage] = totals.get(stage, 0.0) + timings['min']
+        sweep[size] = totals
+    return sweep
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any],
+            tolerance: float = DEFAULT_TOLERANCE) -> List[Tuple[str, str, float, float]]:
+    """Returns (benchmark, stage, baseline, current) for every stage whose minimum time
+    grew more than the tolerance over the baseline."""
+    regressions: List[Tuple[str, str, float, float]] = []
+    for name, stages in results['benchmarks'].items():
+        base_stages: Dict[str, Dict[str, float]] = baseline['benchmarks'].get(name, {})
+        for stage, timings in stages.items():
+            if stage not in base_stages:
+                continue
+            before: float = base_stages[stage]['min']
+            after: float = timings['min']
+            if after > before * (1.0 + tolerance):
+                regressions.append((name, stage, before, after))
+    return regressions
+
+
+def compare_memory(results: Dict[str, Any], baseline: Dict[str, Any],
+                   tolerance: float = DEFAULT_TOLERANCE) -> List[Tuple[str, str, MemorySnapshot, MemorySnapshot]]:
+    """Returns (benchmark, stage, baseline, current) snapshots for every stage whose output
+    grew more than the tolerance over the baseline. Results without memory are skipped."""
+    regressions: List[Tuple[str, str, MemorySnapshot, MemorySnapshot]] = []
+    for name, stages in results.get('memory', {}).items():
+        base_stages: Dict[str, Dict[str, Any]] = baseline.get('memory', {}).get(name, {})
+        for stage, snapshot in stages.items():
+            if stage in base_stages and snapshot['total'] > base_stages[stage]['total'] * (1.0 + tolerance):
+                regressions.append((name, stage, MemorySnapshot.from_dict(base_stages[stage]),
+                                    MemorySnapshot.from_dict(snapshot)))
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = ArgumentParser(prog='brah.h_benchmark', description="Times the Brah toolchain stages.")
+    parser.add_argument('directory', nargs='?', help="directory holding the .brah benchmarks")
+    parser.add_argument('names', nargs='*', help="benchmarks to run (all by default)")
+    parser.add_argument('-r', '--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('-o', '--output', help="file to store the results as JSON")
+    parser.add_argument('-b', '--baseline', help="JSON results to compare against")
+    parser.add_argument('-t', '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown over the baseline (default: %(default)s)")
+    parser.add_argument('-m', '--memory', action='store_true', help="also measure the memory held by each stage")
+    parser.add_argument('-s', '--sampling', action='store_true',
+                        help="also measure the overhead of sampling the programs built as ASTs")
+    parser.add_argument('-g', '--generate', type=lambda text: [parse_size(size) for size in text.split(',')],
+                        help="comma separated sizes of generated programs to run, e.g. 64KB,1MB")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the generated programs")
+    args = parser.parse_args(argv)
+
+    if args.directory is None and not args.generate and not args.sampling:
+        parser.error("a benchmark directory, generated sizes (-g) or sampling (-s) is required")
+    results: Dict[str, Any] = {'benchmarks': {}}
+    if args.directory is not None:
+        results = run_suite(args.directory, args.repeat, args.names, args.memory)
+    if args.generate:
+        results['sweep'] = run_sweep(args.generate, seed=args.seed, repeat=args.repeat)
+        for size, totals in results['sweep'].items():
+            stages: str = '  '.join(f"{stage}: {seconds * 1e3:.3f} ms" for stage, seconds in totals.items())
+            print(f"{size:>12,} B  {stages}")
+
+    for name, stages in results['benchmarks'].items():
+        timings: str = '  '.join(f"{stage}: {t['min'] * 1e3:.3f} ms" for stage, t in stages.items())
+        print(f"{name:<20} {timings}")
+        if args.memory:
+            sizes: str = '  '.join(f"{stage}: {snapshot['total'] / 1024:,.1f} KiB"
+                                   for stage, snapshot in results['memory'][name].items())
+            print(f"{'':<20} {sizes}")
+
+    if args.sampling:
+        results['sampling'] = {}
+        for name, build in _programs.items():
+            if args.names and name not in args.names:
+                continue
+            results['sampling'][name] = {mode: measure_sampling(build, mode, args.repeat) for mode in _sampling_modes()}
+            for mode, timing in results['sampling'][name].items():
+                over: str = " OVER LIMIT" if timing['overhead'] > SAMPLING_OVERHEAD_LIMIT else ''
+                print(f"sampling {name}.{mode}: {timing['plain'] * 1e3:.3f} ms -> {timing['sampled'] * 1e3:.3f} ms"
+                      f" ({timing['overhead']:+.1%}, {timing['samples']} samples){over}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as src:
+            baseline: Dict[str, Any] = json.load(src)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, stage, before, after in regressions:
+            print(f"REGRESSION {name}.{stage}: {before * 1e3:.3f} ms -> {after * 1e3:.3f} ms "
+                  f"({after / before - 1.0:+.1%})")
+        growths = compare_memory(results, baseline, args.tolerance)
+        for name, stage, base_snapshot, snapshot in growths:
+            print(f"MEMORY REGRESSION {name}.{stage}: {format_diff(base_snapshot, snapshot, top=5)}")
+        if regressions or growths:
+            return 1
+    return 0
+
+
+register_stage('load', _load)
+register_stage('compile', _compile)
+register_stage('execute', _execute)
+register_program('calls', _calls_program)
+register_program('loops', _loops_program)
+
+# endregion (functions)
+# ---------------------------------------------------------
+
+
+if __name__ == '__main__':
+    sys.exit(main())
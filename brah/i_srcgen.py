@@ -0,0 +1,343 @@
+"""Synthetic Source Generator
+
+Emits grammatically valid Brah programs (see EBNF.md) of a requested size and
+shape, used to measure how each stage of the toolchain scales. The output only
+depends on the size, the shape and the seed.
+
+Usage::
+
+    python -m brah.i_srcgen scrap/gen 10MB --modules 16 --depth 6 --seed 7
+"""
+import os
+import sys
+from random import Random
+from argparse import ArgumentParser
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Iterator, Tuple
+
+
+__all__ = [
+    # functions
+    'generate',
+    'generate_sources',
+    'main',
+    'parse_size',
+
+    # classes
+    'SourceGenerator',
+    'SourceShape',
+]
+
+# ---------------------------------------------------------
+# region CONSTANTS & ENUMS
+
+
+PACKAGE: str = 'gerado'
+"""First name of the qualified name of every generated module."""
+
+INDENT: str = '    '
+
+ARITH_OPERATORS: Tuple[str, ...] = ('+', '-', '*', '+', '-', '&', '|', '^', '<<', '>>')
+COMPARE_OPERATORS: Tuple[str, ...] = ('<', '<=', '==', '!=', '>=', '>')
+INPLACE_OPERATORS: Tuple[str, ...] = ('+=', '-=', '*=', '&=', '|=', '^=')
+
+_SIZE_UNITS: Dict[str, int] = {'': 1, 'B': 1, 'KB': 1 << 10, 'MB': 1 << 20, 'GB': 1 << 30}
+
+# endregion (constants)
+# ---------------------------------------------------------
+# region FUNCTIONS
+
+
+def parse_size(text: str) -> int:
+    """Converts sizes like '512', '1KB' or '100MB' to a number of bytes."""
+    text = text.strip().upper()
+    digits: str = text.rstrip('KMGB')
+    return int(float(digits) * _SIZE_UNITS[text[len(digits):]])
+
+
+def module_name(index: int) -> str:
+    return f"modulo_{index:04d}"
+
+
+def generate_sources(size: int, shape: Optional['SourceShape'] = None, seed: int = 0) -> Dict[str, str]:
+    """Returns the generated modules, by file name. Meant for sizes that fit in memory."""
+    generator = SourceGenerator(size, shape, seed)
+    return {f"{module_name(i)}.brah": ''.join(generator.module(i)) for i in range(generator.shape.modules)}
+
+
+def generate(directory: str, size: int, shape: Optional['SourceShape'] = None, seed: int = 0) -> List[str]:
+    """Writes the generated modules in the directory, returning their file paths."""
+    generator = SourceGenerator(size, shape, seed)
+    os.makedirs(directory, exist_ok=True)
+    filepaths: List[str] = []
+    for i in range(generator.shape.modules):
+        filepath: str = os.path.join(directory, f"{module_name(i)}.brah")
+        with open(filepath, 'w', encoding='utf-8') as output:
+            output.writelines(generator.module(i))
+        filepaths.append(filepath)
+    return filepaths
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    defaults = SourceShape()
+    parser = ArgumentParser(prog='brah.i_srcgen', description="Generates synthetic Brah programs.")
+    parser.add_argument('directory', help="directory to write the modules to")
+    parser.add_argument('size', type=parse_size, help="approximate total size, e.g. 1KB, 10MB")
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    for name in ('modules', 'imports', 'depth', 'statements', 'chain', 'params', 'locals'):
+        parser.add_argument(f"--{name}", type=int, default=getattr(defaults, name))
+    parser.add_argument('--classes', type=float, default=defaults.classes)
+    args = parser.parse_args(argv)
+
+    shape = SourceShape(args.modules, args.imports, args.classes, args.depth, args.statements, args.chain,
+                        args.params, args.locals)
+    total: int = 0
+    for filepath in generate(args.directory, args.size, shape, args.seed):
+        total += os.path.getsize(filepath)
+    print(f"{shape.modules} modules, {total} bytes written to {args.directory}")
+    return 0
+
+# endregion (functions)
+# ---------------------------------------------------------
+# region CLASSES
+
+
+@dataclass
+class SourceShape:
+    """Proportions of the generated programs."""
+
+    modules: int = 4
+    """Number of modules. Module N imports only from modules before it, so the import graph is acyclic."""
+
+    imports: int = 3
+    """Maximum number of modules imported by each module."""
+
+    classes: float = 0.25
+    """Share of the declarations that are classes (the rest are functions)."""
+
+    depth: int = 4
+    """Maximum nesting depth of blocks inside functions and methods."""
+
+    statements: int = 5
+    """Maximum number of statements per block."""
+
+    chain: int = 8
+    """Maximum number of operands in an expression chain."""
+
+    params: int = 3
+    """Maximum number of parameters of functions and methods."""
+
+    locals: int = 4
+    """Number of local variables assigned at the top of each function body."""
+
+    types: List[str] = field(default_factory=lambda: ['i32', 'i64', 'u32'])
+    """Integer type names used for parameters, fields and results."""
+
+
+class SourceGenerator:
+    """Generates the modules of one synthetic program.
+
+    :ivar size: the approximate total size in bytes of all modules
+    :ivar shape: the proportions of the program
+    :ivar seed: the seed all modules are derived from
+    """
+
+    def __init__(self, size: int, shape: Optional[SourceShape] = None, seed: int = 0):
+        self.size: int = size
+        self.shape: SourceShape = shape or SourceShape()
+        self.seed: int = seed
+
+        # exported functions of each generated module: (name, parameter count)
+        self.exports: Dict[int, List[Tuple[str, int]]] = {}
+
+        self._rand: Random = Random()
+        self._label: int = 0
+        self._depth: int = self.shape.depth
+
+    def module(self, index: int) -> Iterator[str]:
+        """Yields the source of a module, one declaration at a time.
+
+        Modules must be generated in order, since each one imports from the previous.
+        """
+        shape: SourceShape = self.shape
+        rand: Random = self._rand
+        rand.seed(f"{self.seed}:{index}")
+        budget: int = max(1, self.size // shape.modules)
+        emitted: int = 0
+
+        # a single declaration grows exponentially with the nesting depth; keep it within the module budget
+        self._depth = shape.depth
+        while self._depth and 80 * shape.statements ** self._depth > budget:
+            self._depth -= 1
+        exported: List[Tuple[str, int]] = []
+        callables: List[Tuple[str, int]] = []
+
+        if index:
+            sources: List[int] = rand.sample(range(index), min(index, rand.randint(1, shape.imports)))
+            for src in sorted(sources):
+                names: List[Tuple[str, int]] = rand.sample(self.exports[src], min(3, len(self.exports[src])))
+                if not names:
+                    continue
+                callables.extend(names)
+                chunk: str = (f"importe {{ {', '.join(name for name, _ in names)} }} "
+                              f"de {PACKAGE}.{module_name(src)};\n")
+                emitted += len(chunk.encode())
+                yield chunk
+            yield '\n'
+
+        chunk = f"exporte constante LIMITE_{index} = {rand.randint(16, 4096)};\n\n"
+        emitted += len(chunk.encode())
+        yield chunk
+
+        ndecl: int = 0
+        while emitted < budget or not exported:
+            if exported and rand.random() < shape.classes:
+                chunk = self._classdecl(f"Classe_{index}_{ndecl}", callables)
+            else:
+                name: str = f"funcao_{index}_{ndecl}"
+                nparams: int = rand.randint(1, shape.params)
+                chunk = self._functiondecl(name, nparams, callables, index)
+                callables.append((name, nparams))
+                exported.append((name, nparams))
+            emitted += len(chunk.encode())
+            ndecl += 1
+            yield chunk
+
+        self.exports[index] = exported
+
+    # region declarations
+
+    def _params(self, nparams: int) -> Tuple[str, List[str]]:
+        names: List[str] = [f"p{i}" for i in range(nparams)]
+        return ', '.join(f"{name}: {self._rand.choice(self.shape.types)}" for name in names), names
+
+    def _body(self, names: List[str], callables: List[Tuple[str, int]], indent: str) -> List[str]:
+        lines: List[str] = []
+        nlocals: int = self.shape.locals
+        local_names: List[str] = [f"v{i}" for i in range(nlocals)]
+        for name in local_names:
+            lines.append(f"{indent}{name} = {self._chain(names, callables)};")
+        names = names + local_names
+        lines.extend(self._block(names, local_names, callables, indent, self._depth))
+        lines.append(f"{indent}retorne {self._chain(names, callables)};")
+        return lines
+
+    def _functiondecl(self, name: str, nparams: int, callables: List[Tuple[str, int]], index: int) -> str:
+        params, names = self._params(nparams)
+        restype: str = self._rand.choice(self.shape.types)
+        lines: List[str] = [f"exporte função {name}({params}): {restype} {{"]
+        lines.extend(self._body(names + [f"LIMITE_{index}"], callables, INDENT))
+        lines.append('}\n\n')
+        return '\n'.join(lines)
+
+    def _classdecl(self, name: str, callables: List[Tuple[str, int]]) -> str:
+        rand: Random = self._rand
+        fields: List[str] = [f"campo{i}" for i in range(rand.randint(1, 4))]
+        lines: List[str] = [f"exporte classe {name} {{"]
+        for fieldname in fields:
+            lines.append(f"{INDENT}{fieldname}: {rand.choice(self.shape.types)};")
+        for i in range(rand.randint(1, 4)):
+            params, names = self._params(rand.randint(0, self.shape.params))
+            lines.append('')
+            lines.append(f"{INDENT}metodo{i}({params}): {rand.choice(self.shape.types)} {{")
+            lines.extend(self._body(names + fields, callables, INDENT * 2))
+            lines.append(f"{INDENT}}}")
+        lines.append('}\n\n')
+        return '\n'.join(lines)
+
+    # endregion (declarations)
+
+    # region statements
+
+    def _block(self, names: List[str], targets: List[str], callables: List[Tuple[str, int]], indent: str,
+               depth: int) -> List[str]:
+        rand: Random = self._rand
+        lines: List[str] = []
+        for _ in range(rand.randint(1, self.shape.statements)):
+            kind: int = rand.randrange(8) if depth > 0 else 0
+            inner: str = indent + INDENT
+            if kind <= 2:
+                lines.append(self._assignment(names, targets, callables, indent))
+            elif kind == 3:
+                lines.append(f"{indent}se ({self._test(names, callables)}) {{")
+                lines.extend(self._block(names, targets, callables, inner, depth - 1))
+                if rand.random() < 0.5:
+                    lines.append(f"{indent}}} senão {{")
+                    lines.extend(self._block(names, targets, callables, inner, depth - 1))
+                lines.append(f"{indent}}}")
+            elif kind == 4:
+                counter: str = f"i{depth}"
+                lines.append(f"{indent}para ({counter} = 0; {counter} < {rand.randint(2, 64)}; {counter}++) {{")
+                lines.extend(self._block(names + [counter], targets, callables, inner, depth - 1))
+                lines.append(f"{indent}}}")
+            elif kind == 5:
+                self._label += 1
+                lines.append(f"{indent}enquanto ({self._test(names, callables)}) :laço{self._label} {{")
+                lines.extend(self._block(names, targets, callables, inner, depth - 1))
+                lines.append(f"{inner}pare laço{self._label};")
+                lines.append(f"{indent}}}")
+            elif kind == 6:
+                lines.append(f"{indent}faça {{")
+                lines.extend(self._block(names, targets, callables, inner, depth - 1))
+                lines.append(f"{indent}}} até ({self._test(names, callables)})")
+            else:
+                lines.append(f"{indent}alterne ({rand.choice(names)}) {{")
+                for value in sorted(rand.sample(range(32), rand.randint(1, 6))):
+                    lines.append(f"{inner}caso {value}: {{")
+                    lines.extend(self._block(names, targets, callables, inner + INDENT, depth - 1))
+                    lines.append(f"{inner}}}")
+                lines.append(f"{inner}senão: {{")
+                lines.append(self._assignment(names, targets, callables, inner + INDENT))
+                lines.append(f"{inner}}}")
+                lines.append(f"{indent}}}")
+        return lines
+
+    def _assignment(self, names: List[str], targets: List[str], callables: List[Tuple[str, int]],
+                    indent: str) -> str:
+        rand: Random = self._rand
+        target: str = rand.choice(targets)
+        roll: float = rand.random()
+        if roll < 0.15:
+            return f"{indent}{target}{rand.choice(('++', '--'))};"
+        elif roll < 0.45:
+            return f"{indent}{target} {rand.choice(INPLACE_OPERATORS)} {self._chain(names, callables)};"
+        return f"{indent}{target} = {self._chain(names, callables)};"
+
+    # endregion (statements)
+
+    # region expressions
+
+    def _operand(self, names: List[str], callables: List[Tuple[str, int]]) -> str:
+        rand: Random = self._rand
+        roll: float = rand.random()
+        if roll < 0.35:
+            return str(rand.randint(0, 1000))
+        elif roll < 0.4 and callables:
+            name, nparams = rand.choice(callables)
+            args: str = ', '.join(rand.choice(names) for _ in range(nparams))
+            return f"{name}({args})"
+        return rand.choice(names)
+
+    def _chain(self, names: List[str], callables: List[Tuple[str, int]]) -> str:
+        rand: Random = self._rand
+        parts: List[str] = [self._operand(names, callables)]
+        for _ in range(rand.randint(0, self.shape.chain - 1)):
+            parts.append(rand.choice(ARITH_OPERATORS))
+            parts.append(self._operand(names, callables))
+        return ' '.join(parts)
+
+    def _test(self, names: List[str], callables: List[Tuple[str, int]]) -> str:
+        rand: Random = self._rand
+        test: str = f"{self._chain(names, callables)} {rand.choice(COMPARE_OPERATORS)} {self._operand(names, [])}"
+        if rand.random() < 0.3:
+            test += f" {rand.choice(('e', 'ou'))} {rand.choice(names)} {rand.choice(COMPARE_OPERATORS)} 0"
+        return test
+
+    # endregion (expressions)
+
+
+# endregion (classes)
+# ---------------------------------------------------------
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1636 @@
+"""Host JIT
+
+Translates Brah functions and methods to Python source which is compiled with
+``compile()``, so their loops and arithmetic run on CPython's own bytecode
+instead of the interpreter loop.
+
+Functions start in the interpreter, wrapped by a ``TieredFunction`` that counts
+calls (and loop back-edges reported by the interpreter). Once the count crosses
+the threshold, the function is translated and the compiled version replaces the
+wrapper in the module namespace, so later calls from compiled code go straight
+to it. Translation happens once per declaration: the code objects are cached by
+node, and made again only when a pass has rewritten the body (bumping its
+``revision``) or a translator option has changed.
+
+Values stored in integer variables, parameters and results are wrapped to the
+width of their ``IntegerTypeNode``, as the interpreter does. Expressions carry
+the types found by ``infer_types``, which pick the operation at translation
+time: integer division and remainder without type checks, float division,
+string concatenation. Integer addition, subtraction, multiplication, shifts to
+the left and bitwise operations are wrapped lazily, where something depends on
+the exact value: a store, a comparison, a division, a condition or an index.
+Values already known to fit their destination (locals, parameters and call
+results of the same type) are stored as they are.
+
+A function whose returns call itself (``retorne fatorial(n - 1, n * acc)``)
+runs its body in a loop: such a tail call assigns the parameters and starts the
+body over, in constant stack space. Functions tail calling each other share a
+single loop function, dispatching on the function to run, entered through one
+small function per declaration.
+
+Unpacking an aggregate (``{a, b} = {b, a + b}``) moves each element straight
+into its target, through temporaries only when a target written first is read
+by a later element. Functions return several values as a tuple, which the
+caller unpacks into its variables; ``...`` between targets becomes indexing
+from both ends, so no list of the skipped elements is built.
+
+A local string that a loop only ever appends to (``s += parte``) is collected
+in a list while the loop runs and joined once it ends, so building a string in
+a loop takes linear rather than quadratic time.
+
+Classes and structures are bound to the ``InstancePool`` of their instances.
+Allocations that cannot escape the call go through a per-call ``Arena`` closed
+when the function returns. An operator the class of the left operand overloads
+is a lookup in the ``OperatorTable`` of the namespace, by operator and operand
+classes, and a call of the method found.
+
+Given a budget, ``build_namespace`` translates every function to a coroutine
+instead. Function entries and loop back-edges count down a budget shared by the
+module; when it runs out the code awaits ``asyncio.sleep(0)``, letting other
+tasks of the event loop run.
+
+Translated stackless, functions that make calls become generators: a call
+yields the function and its arguments to ``run_stackless``, which keeps the
+generators of the Brah calls in progress on a list and resumes the caller with
+the result. Brah recursion then takes no Python stack, and its depth is bounded
+by memory rather than by ``sys.getrecursionlimit()``. Each generator's frame is
+sized by CPython from the function's locals, that is its variables and
+parameters. Functions that make no calls stay plain functions, called directly.
+
+Traced, functions and their while, for and foreach loops report to the
+``Profiler`` of the namespace: ``enter`` and ``leave`` around each call and
+loop, in a ``try`` so exceptions leave too, and ``tick`` once per iteration.
+Untraced code has none of these calls. Given an ``ExecStack`` instead, functions
+push their frame on entry, pop it on exit and store the location of each
+statement in it before running it, for a ``SamplingProfiler`` to read.
+
+Parallel foreach loops over numeric arrays are split: their body becomes a
+separate chunk function, with the pure functions it calls, which
+``run_parallel`` runs in worker processes.
+"""
+import math
+import asyncio
+import itertools
+from types import GeneratorType
+from contextlib import contextmanager
+from types import CodeType
+from weakref import WeakKeyDictionary
+from typing import Optional, Any, Union, List, Dict, Tuple, Callable, Iterator, Set
+
+from brah.c_astnodes import *
+from brah.f_utils import NO_LOCATION
+from brah.g_profiler import PROFILED_NODES, ExecStack, Profiler
+from brah.k_optimizer import DefUse, find_scoped_allocations, find_tail_calls, find_tail_group
+from brah.l_objects import Arena, InstancePool, OperatorTable
+from brah.m_parallel import ParallelCheck, REDUCTIONS, array_typecode, is_parallel, run_parallel
+from brah.o_traversal import walk
+from brah.p_types import find_operator, infer_types, same_integer, unalias
+
+
+__all__ = [
+    # constants
+    'DEFAULT_BUDGET',
+    'DEFAULT_THRESHOLD',
+    'SWITCH_TABLE_DENSITY',
+    'SWITCH_TABLE_MIN_CASES',
+
+    # functions
+    'brah_div',
+    'brah_mod',
+    'build_namespace',
+    'instantiate',
+    'int_div',
+    'int_mod',
+    'run_stackless',
+    'translate',
+    'wrap_int',
+
+    # classes
+    'CompiledMethod',
+    'FunctionTranslator',
+    'TieredFunction',
+    'TranslationError',
+]
+
+# ---------------------------------------------------------
+# region CONSTANTS & ENUMS
+
+
+DEFAULT_THRESHOLD: int = 1000
+"""Calls plus loop back-edges a function runs in the interpreter before being translated."""
+
+DEFAULT_BUDGET: int = 10_000
+"""Function entries plus loop iterations asynchronous code runs before yielding to the event loop."""
+
+SWITCH_TABLE_MIN_CASES: int = 4
+"""Switches with fewer constant cases are translated to an if/elif chain."""
+
+SWITCH_TABLE_DENSITY: int = 4
+"""Largest ratio between the range of the case values and their count for a switch to use a table."""
+
+LOCAL_PREFIX: str = 'v_'
+GLOBAL_PREFIX: str = 'g_'
+TEMP_PREFIX: str = '_t'
+THIS: str = 'this'
+ARENA: str = '_arena'
+CHUNK_PREFIX: str = 'p_'
+BUDGET: str = '_budget'
+TAIL_PREFIX: str = 't_'
+ENTRY: str = '_entry'
+ARGS: str = '_args'
+STACKLESS: str = '_stackless'
+OPERATORS: str = '_operators'
+PROFILER: str = '_profiler'
+PUSH_FRAME: str = '_push_frame'
+POP_FRAME: str = '_pop_frame'
+FRAME: str = '_frame'
+NODES_PREFIX: str = '_nodes_'
+INDENT: str = '    '
+
+_OPERATORS: Dict[str, str] = {
+    '+': '+', '-': '-', '*': '*', '&': '&', '|': '|', '^': '^', '<<': '<<', '>>': '>>',
+    '<': '<', '<=': '<=', '==': '==', '!=': '!=', '>=': '>=', '>': '>',
+    'e': 'and', 'ou': 'or',
+    '~': '& ~',  # clears the bits of the right operand, mostly on flag-sets
+}
+_HELPER_OPERATORS: Dict[str, str] = {'/': '_div', '%': '_mod'}
+
+# names of the Python functions translated from operator overloads
+_OPERATOR_NAMES: Dict[str, str] = {
+    '+': 'add', '-': 'sub', '*': 'mul', '/': 'div', '%': 'mod', '&': 'and', '|': 'or', '^': 'xor',
+    '<<': 'lshift', '>>': 'rshift', '<': 'lt', '<=': 'le', '==': 'eq', '!=': 'ne', '>=': 'ge', '>': 'gt',
+    'e': 'e', 'ou': 'ou', '~': 'clear',
+}
+
+# host classes of operands of the primitive types
+_OPERAND_CLASSES: Dict[type, Tuple[type, ...]] = {
+    IntegerTypeNode: (int,), FloatTypeNode: (float, int), StringTypeNode: (str,), EnumTypeNode: (int,),
+}
+
+# operations the Python operator computes modulo 2 ** bits, so wrapping their result can wait
+_MODULAR: Tuple[str, ...] = ('+', '-', '*', '&', '|', '^', '<<', '~')
+_COMPARISONS: Tuple[str, ...] = ('<', '<=', '==', '!=', '>=', '>')
+
+# division and remainder by operand types: both signed integers, both unsigned, either a float
+_INT_OPERATORS: Dict[str, str] = {'/': '_idiv({0}, {1})', '%': '_imod({0}, {1})'}
+_UINT_OPERATORS: Dict[str, str] = {'/': '({0} // {1})', '%': '({0} % {1})'}
+_FLOAT_OPERATORS: Dict[str, str] = {'/': '({0} / {1})', '%': '_fmod({0}, {1})'}
+
+_HELPERS: Dict[str, Callable] = {}
+
+_LOOP_STMTS = (WhileStmtNode, DoWhileStmtNode, DoUntilStmtNode, RepeatStmtNode, ForStmtNode, ForEachStmtNode)
+
+# code objects and the nodes they report to the profiler by declaration, with the revision of the body
+# and the translator options they were made with
+_code_cache: 'WeakKeyDictionary[DeclNode, Tuple[tuple, CodeType, tuple]]' = WeakKeyDictionary()
+_async_code_cache: 'WeakKeyDictionary[DeclNode, Tuple[tuple, CodeType, tuple]]' = WeakKeyDictionary()
+_stackless_code_cache: 'WeakKeyDictionary[DeclNode, Tuple[tuple, CodeType, tuple]]' = WeakKeyDictionary()
+
+# endregion (constants)
+# ---------------------------------------------------------
+# region FUNCTIONS
+
+
+def brah_div(left: Union[int, float], right: Union[int, float]) -> Union[int, float]:
+    """Division as in Brah: integers truncate toward zero."""
+    if isinstance(left, int) and isinstance(right, int):
+        quotient: int = abs(left) // abs(right)
+        return quotient if (left < 0) == (right < 0) else -quotient
+    return left / right
+
+
+def brah_mod(left: Union[int, float], right: Union[int, float]) -> Union[int, float]:
+    """Remainder as in Brah: it takes the sign of the dividend."""
+    if isinstance(left, int) and isinstance(right, int):
+        return left - right * brah_div(left, right)
+    return math.fmod(left, right)
+
+
+def int_div(left: int, right: int) -> int:
+    """Integer division truncating toward zero, for operands known to be integers."""
+    quotient: int = abs(left) // abs(right)
+    return quotient if (left < 0) == (right < 0) else -quotient
+
+
+def int_mod(left: int, right: int) -> int:
+    """Integer remainder taking the sign of the dividend, for operands known to be integers."""
+    return left - right * int_div(left, right)
+
+
+_HELPERS.update({'_div': brah_div, '_mod': brah_mod, '_idiv': int_div, '_imod': int_mod, '_fmod': math.fmod})
+
+
+def wrap_int(expr: str, typenode: Optional[TypeNode]) -> str:
+    """Returns the Python expression wrapping ``expr`` to the width of an integer type.
+
+    Other types are returned unchanged.
+    """
+    if not isinstance(typenode, IntegerTypeNode):
+        return expr
+    bits: int = typenode.bytesize * 8
+    if typenode.signed:
+        half: int = 1 << (bits - 1)
+        return f"((({expr}) + {half:#x}) & {(1 << bits) - 1:#x}) - {half:#x}"
+    return f"(({expr}) & {(1 << bits) - 1:#x})"
+
+
+def _holds(typenode: Optional[TypeNode], source: IntegerTypeNode) -> bool:
+    """Returns whether every value of an integer type is also a value of the given type."""
+    if not isinstance(typenode, IntegerTypeNode):
+        return True
+    if typenode.signed == source.signed:
+        return typenode.bytesize >= source.bytesize
+    return typenode.signed and typenode.bytesize > source.bytesize
+
+
+def translate(decl: Union[FunctionDeclNode, MethodDeclNode], asynchronous: bool = False,
+              stackless: bool = False, profiled: bool = False, sampled: bool = False) -> CodeType:
+    """Returns the code object defining the Python version of the declaration, translating it again
+    only after a pass rewrote the body or a translator option changed."""
+    return _translated(decl, asynchronous, stackless, profiled, sampled)[0]
+
+
+def _translated(decl: Union[FunctionDeclNode, MethodDeclNode], asynchronous: bool, stackless: bool,
+                profiled: bool, sampled: bool) -> Tuple[CodeType, Tuple[SourceNode, ...]]:
+    cache: WeakKeyDictionary = (_async_code_cache if asynchronous else
+                                _stackless_code_cache if stackless else _code_cache)
+    key: tuple = (decl.revision, FunctionTranslator.tail_calls, FunctionTranslator.string_builders, profiled, sampled)
+    cached: Optional[Tuple[tuple, CodeType, tuple]] = cache.get(decl)
+    if cached is not None and cached[0] == key:
+        return cached[1], cached[2]
+    translator = FunctionTranslator(decl, asynchronous, stackless, profiled, sampled)
+    code: CodeType = compile(translator.translate(), f"<brah {translator.pyname}>", 'exec')
+    nodes: Tuple[SourceNode, ...] = tuple(translator.nodes)
+    cache[decl] = (key, code, nodes)
+    return code, nodes
+
+
+def instantiate(decl: Union[FunctionDeclNode, MethodDeclNode], namespace: Dict[str, Any],
+                asynchronous: bool = False, stackless: bool = False) -> Callable:
+    """Returns the compiled version of the declaration, bound to the module namespace. A namespace
+    with a profiler or a stack gets a version reporting to them."""
+    code, nodes = _translated(decl, asynchronous, stackless, PROFILER in namespace, PUSH_FRAME in namespace)
+    if nodes:
+        namespace[NODES_PREFIX + FunctionTranslator.python_name(decl)] = nodes
+    defined: Dict[str, Any] = {}
+    exec(code, namespace, defined)
+    function: Callable = defined.popitem()[1]
+    # what the source defines before the function, such as the loop shared by tail calling functions
+    namespace.update(defined)
+    return function
+
+
+def build_namespace(module: ModuleNode, interpret: Optional[Callable[[DeclNode, tuple], Any]] = None,
+                    threshold: int = DEFAULT_THRESHOLD, profiler: Optional[Profiler] = None,
+                    budget: Optional[int] = None, stackless: bool = False, trace: bool = False,
+                    stack: Optional[ExecStack] = None) -> Dict[str, Any]:
+    """Returns the globals of the compiled functions of a module.
+
+    Functions are wrapped in TieredFunction objects, compiled right away when
+    there is no interpreter to start them in. With a budget, they are compiled
+    right away to coroutine functions that yield to the event loop once per
+    ``budget`` entries and iterations. Stackless, they are compiled right away too,
+    to be called through ``run_stackless``. Classes and structures are bound to
+    their instance pools, counting allocations in the profiler when given. Traced,
+    functions and loops also report their entries, exits and iterations to it. Given
+    a stack, functions keep their frames on it for a ``SamplingProfiler`` to read.
+    """
+    if budget is not None and (stackless or trace or stack is not None):
+        raise ValueError("Asynchronous code cannot be stackless, traced or sampled")
+    if trace and profiler is None:
+        raise ValueError("Tracing needs a profiler")
+    namespace: Dict[str, Any] = dict(_HELPERS, _Arena=Arena, _parallel=run_parallel)
+    namespace[OPERATORS] = OperatorTable()
+    if budget is not None:
+        namespace.update({BUDGET: budget, '_slice': budget, '_pause': asyncio.sleep})
+    if stackless:
+        namespace[STACKLESS] = True
+    if trace:
+        namespace[PROFILER] = profiler
+    if stack is not None:
+        # bound to the list of frames, so pushing and popping a frame costs a single C call
+        namespace[PUSH_FRAME] = stack.frames.append
+        namespace[POP_FRAME] = stack.frames.pop
+    for decl in module.scope.declarations.values():
+        if isinstance(decl, EnumDeclNode) and isinstance(decl.type, EnumTypeNode):
+            # the members of an enumeration are the declarations of its type, in order
+            decl.type.declare(decl)
+    for name, decl in module.scope.declarations.items():
+        key: str = GLOBAL_PREFIX + name
+        if isinstance(decl, FunctionDeclNode) and (budget is not None or stackless):
+            namespace[key] = instantiate(decl, namespace, budget is not None, stackless)
+        elif isinstance(decl, FunctionDeclNode):
+            namespace[key] = TieredFunction(decl, namespace, interpret, threshold)
+        elif isinstance(decl, EnumDeclNode) and isinstance(decl.type, EnumTypeNode):
+            namespace[key] = decl.type.code_of(decl.name)
+        elif isinstance(decl, (ConstDeclNode, EnumDeclNode)):
+            namespace[key] = eval(FunctionTranslator(decl).expression(decl.value), namespace)
+        elif isinstance(decl, ExceptionTypeNode):
+            base: type = namespace[GLOBAL_PREFIX + decl.basetype.name] if decl.basetype else Exception
+            namespace[key] = type(decl.name, (base,), {})
+        elif isinstance(decl, (ClassTyclNode, StructureTyclNode)):
+            _build_pool(decl, namespace, profiler)
+    return namespace
+
+
+def _build_pool(tycl: TyclNode, namespace: Dict[str, Any], profiler: Optional[Profiler]) -> InstancePool:
+    key: str = GLOBAL_PREFIX + tycl.name
+    pool: Optional[InstancePool] = namespace.get(key)
+    if isinstance(pool, InstancePool):
+        return pool
+    baseclass: Optional[TyclNode] = getattr(tycl, 'baseclass', None)
+    base: Optional[InstancePool] = _build_pool(baseclass, namespace, profiler) if baseclass is not None else None
+    defaults: Dict[str, Any] = {
+        name: eval(FunctionTranslator(fielddecl).expression(fielddecl.default_value), namespace)
+        for name, fielddecl in tycl.fields.items() if fielddecl.has_default
+    }
+    stats = profiler.allocation(tycl) if profiler is not None else None
+    pool = namespace[key] = InstancePool(tycl, defaults, base, stats)
+    for name, method in tycl.methods.items():
+        setattr(pool.cls, name, CompiledMethod(method, namespace, pool.cls, BUDGET in namespace,
+                                               STACKLESS in namespace))
+    operators: Dict[str, Tuple[type, ...]] = {}
+    for name, method in tycl.operators.items():
+        setattr(pool.cls, name, CompiledMethod(method, namespace, pool.cls, BUDGET in namespace,
+                                               STACKLESS in namespace))
+        right: Optional[ParamDeclNode] = next(iter(method.params.values()), None)
+        operators[name] = _operand_classes(right.type if right is not None else None, namespace, profiler)
+    namespace[OPERATORS].register(pool.cls, operators)
+    return pool
+
+
+def _operand_classes(typenode: Optional[Union[TypeNode, TyclNode]], namespace: Dict[str, Any],
+                     profiler: Optional[Profiler]) -> Tuple[type, ...]:
+    """Returns the host classes of the values of a type, for the right operand of an overload."""
+    typenode = unalias(typenode)
+    if isinstance(typenode, (ClassTyclNode, StructureTyclNode)):
+        return _build_pool(typenode, namespace, profiler).cls,
+    return _OPERAND_CLASSES.get(typenode.__class__, (object,))
+
+
+def run_stackless(function: Callable, *args: Any) -> Any:
+    """Calls a function translated stackless, running the Brah calls it makes without nesting
+    Python calls.
+
+    A function making calls returns a generator, which yields a (function, arguments)
+    pair for each call. The generators waiting for a result are kept on a list, so
+    Brah recursion is bounded by memory rather than the Python stack. An exception
+    raised by a call is thrown into its caller, where a Brah try may catch it.
+    """
+    current: Any = function(*args)
+    if current.__class__ is not GeneratorType:
+        return current
+    frames: List[Any] = []
+    value: Any = None
+    error: Optional[BaseException] = None
+    while True:
+        try:
+            if error is None:
+                callee, args = current.send(value)
+            else:
+                callee, args = current.throw(error)
+                error = None
+        except StopIteration as stop:
+            if not frames:
+                return stop.value
+            current = frames.pop()
+            value = stop.value
+            continue
+        except Exception as raised:
+            if not frames:
+                raise
+            current = frames.pop()
+            error = raised
+            continue
+        try:
+            value = callee(*args)
+        except Exception as raised:
+            error = raised
+            continue
+        if value.__class__ is GeneratorType:
+            frames.append(current)
+            current = value
+            value = None
+
+# endregion (functions)
+# ---------------------------------------------------------
+# region CLASSES
+
+
+class TranslationError(Exception):
+    """Raised for constructs the translator does not support; such functions stay in the interpreter."""
+
+
+class _Breakable:
+    """A loop or switch the translator is inside of."""
+
+    def __init__(self, label: Optional[str], is_loop: bool, prelude: Optional[Callable[[], None]] = None):
+        self.label: Optional[str] = label
+        self.is_loop: bool = is_loop
+        self.prelude: Optional[Callable[[], None]] = prelude
+        self.broken: bool = False
+        self.flag: Optional[str] = None
+
+
+class FunctionTranslator:
+    """Translates one function or method to Python source.
+
+    :ivar decl: the FunctionDeclNode or MethodDeclNode translated
+    :ivar asynchronous: whether to generate a coroutine function that spends the shared budget
+    :ivar stackless: whether to generate a generator function yielding its calls to ``run_stackless``
+    :ivar profiled: whether the function and its loops report to the profiler of the namespace
+    :ivar sampled: whether the function keeps its frame, and the statement it runs, on the stack of the namespace
+    :ivar pyname: the name of the generated Python function
+    :ivar lines: the generated source lines
+    :ivar nodes: the nodes reported to the profiler or the stack, bound to the namespace as ``_nodes_<pyname>``
+    :cvar string_builders: whether strings appended to in loops are built in lists
+    :cvar tail_calls: whether tail calls between functions are translated to jumps
+    """
+
+    _handlers: Dict[Tuple[str, type], Callable] = {}
+    string_builders: bool = True
+    tail_calls: bool = True
+
+    def __init__(self, decl: DeclNode, asynchronous: bool = False, stackless: bool = False, profiled: bool = False,
+                 sampled: bool = False):
+        self.decl: DeclNode = decl
+        self.asynchronous: bool = asynchronous
+        self.stackless: bool = stackless
+        self.profiled: bool = profiled
+        self.sampled: bool = sampled
+        self.pyname: str = self.python_name(decl)
+        self.lines: List[str] = []
+        self.nodes: List[SourceNode] = []
+
+        self._depth: int = 0
+        self._scopes: List[Dict[str, Tuple[str, Optional[TypeNode]]]] = []
+        self._pynames: Set[str] = set()
+        self._breakables: List[_Breakable] = []
+        self._temps: Iterator[int] = itertools.count()
+        self._scoped: Set[ExprNode] = set()
+        self._uses_arena: bool = False
+        self._builders: Dict[str, str] = {}
+        self._has_try: bool = False
+        self._group: Dict[FunctionDeclNode, int] = {}
+        self._params: Dict[DeclNode, List[str]] = {}
+        self._tail_targets: Dict[ReturnStmtNode, FunctionDeclNode] = {}
+        self._tick: Optional[str] = None
+
+    @staticmethod
+    def python_name(decl: DeclNode) -> str:
+        """Returns the name of the Python function generated for a function or method."""
+        if isinstance(decl, MethodDeclNode) and decl.is_operator:
+            return f"m_{decl.thisdecl.name}_{_OPERATOR_NAMES[decl.name]}"
+        elif isinstance(decl, MethodDeclNode):
+            return f"m_{decl.thisdecl.name}_{decl.name}"
+        return f"f_{decl.name}"
+
+    # region helpers
+
+    def emit(self, line: str) -> None:
+        self.lines.append(f"{INDENT * self._depth}{line}")
+
+    @contextmanager
+    def indented(self) -> Iterator[None]:
+        self._depth += 1
+        start: int = len(self.lines)
+        yield
+        if len(self.lines) == start:
+            self.emit('pass')
+        self._depth -= 1
+
+    def temp(self) -> str:
+        return f"{TEMP_PREFIX}{next(self._temps)}"
+
+    def declare(self, name: str, typenode: Optional[TypeNode]) -> str:
+        """Binds a Brah name in the innermost scope to a fresh Python local name."""
+        pyname: str = LOCAL_PREFIX + name
+        count: int = 0
+        while pyname in self._pynames:
+            count += 1
+            pyname = f"{LOCAL_PREFIX}{name}_{count}"
+        self._pynames.add(pyname)
+        self._scopes[-1][name] = (pyname, typenode)
+        return pyname
+
+    def is_local(self, expr: ExprNode) -> bool:
+        """Returns whether an expression is the name of a local variable or parameter."""
+        if isinstance(expr, LValueExprNode):
+            expr = expr.exprtarget
+        return (isinstance(expr, NameExprNode) and not isinstance(expr, (FieldNameExprNode, PropertyNameExprNode))
+                and self.lookup(expr.name)[2])
+
+    def lookup(self, name: str) -> Tuple[str, Optional[TypeNode], bool]:
+        """Returns the Python name, the type and whether the Brah name is a local."""
+        for scope in reversed(self._scopes):
+            if name in scope:
+                pyname, typenode = scope[name]
+                return pyname, typenode, True
+        return GLOBAL_PREFIX + name, None, False
+
+    def node(self, node: SourceNode) -> str:
+        """Returns the Python expression of a node reported to the profiler."""
+        if node not in self.nodes:
+            self.nodes.append(node)
+        return f"{NODES_PREFIX}{self.pyname}[{self.nodes.index(node)}]"
+
+    def _handler(self, kind: str, node: ASTNode) -> Callable:
+        cls: type = node.__class__
+        handler: Optional[Callable] = self._handlers.get((kind, cls))
+        if handler is None:
+            for base in cls.__mro__:
+                handler = getattr(FunctionTranslator, f"_{kind}_{base.__name__}", None)
+                if handler is not None:
+                    break
+            else:
+                raise TranslationError(f"Unsupported node: {cls.__name__}")
+            self._handlers[(kind, cls)] = handler
+        return handler
+
+    # endregion (helpers)
+
+    def translate(self) -> str:
+        """Returns the source of a Python function definition equivalent to the declaration."""
+        decl: Union[FunctionDeclNode, MethodDeclNode] = self.decl
+        infer_types(decl)
+        group: List[FunctionDeclNode] = []
+        if self.tail_calls and isinstance(decl, FunctionDeclNode):
+            group = find_tail_group(decl)
+        if len(group) > 1:
+            return self.translate_group(group)
+
+        self._scopes.append({})
+        params, wraps = self.parameters(decl)
+        if isinstance(decl, MethodDeclNode):
+            params.insert(0, THIS)
+        if group:
+            self._group = {decl: 0}
+            self._tail_targets = find_tail_calls(decl)
+        self._scoped = find_scoped_allocations(decl, self.is_allocation)
+        if self.profiled or self.sampled:
+            self.node(decl)
+        self.emit(f"{'async ' if self.asynchronous else ''}def {self.pyname}({', '.join(params)}):")
+        with self.indented():
+            if self.asynchronous:
+                self.emit(f"global {BUDGET}")
+            start: int = len(self.lines)
+            if group:
+                self.emit('while True:')
+                with self.indented():
+                    self.body(decl, wraps)
+                    self.end_of_body(decl)
+            else:
+                self.body(decl, wraps)
+            self.close_arena(start)
+            if self.profiled or self.sampled:
+                self.enter_call(start, self.node(decl))
+        self._scopes.pop()
+        return '\n'.join(self.lines) + '\n'
+
+    def translate_group(self, group: List[FunctionDeclNode]) -> str:
+        """Returns the source of the loop function shared by functions tail calling each other,
+        followed by the function entering it for the declaration translated.
+
+        The loop function takes the index of the function to run and its arguments;
+        a tail call sets both and starts the loop over.
+        """
+        decl: FunctionDeclNode = self.decl
+        self._group = {member: index for index, member in enumerate(group)}
+        members: List[Tuple[FunctionDeclNode, Dict[str, Tuple[str, Optional[TypeNode]]], List[str],
+                            List[Tuple[str, TypeNode]]]] = []
+        for member in group:
+            self.decl = member
+            infer_types(member)
+            self._scopes.append({})
+            params, wraps = self.parameters(member)
+            members.append((member, self._scopes.pop(), params, wraps))
+            self._tail_targets.update(find_tail_calls(member))
+            self._scoped |= find_scoped_allocations(member, self.is_allocation)
+
+        if self.profiled or self.sampled:
+            # the entry index of a member is also the index of its node
+            for member in group:
+                self.node(member)
+        prefix: str = 'async ' if self.asynchronous else ''
+        loop: str = f"{TAIL_PREFIX}{group[0].name}"
+        self.emit(f"{prefix}def {loop}({ENTRY}, {ARGS}):")
+        with self.indented():
+            if self.asynchronous:
+                self.emit(f"global {BUDGET}")
+            start: int = len(self.lines)
+            self.emit('while True:')
+            with self.indented():
+                for index, (member, scope, _, wraps) in enumerate(members):
+                    self.decl = member
+                    if index == len(members) - 1:
+                        self.emit('else:')
+                    else:
+                        self.emit(f"{'if' if not index else 'elif'} {ENTRY} == {index}:")
+                    with self.indented():
+                        self._scopes.append(scope)
+                        if self._params[member]:
+                            self.emit(f"{''.join(pyname + ', ' for pyname in self._params[member])}= {ARGS}")
+                        self.body(member, wraps)
+                        self.end_of_body(member)
+                        self._scopes.pop()
+            self.close_arena(start)
+            if self.profiled or self.sampled:
+                self.enter_call(start, f"{NODES_PREFIX}{self.pyname}[{ENTRY}]")
+
+        self.decl = decl
+        index: int = self._group[decl]
+        self.emit(f"{prefix}def {self.pyname}({', '.join(members[index][2])}):")
+        args: str = ''.join(pyname + ', ' for pyname in self._params[decl])
+        self.emit(f"{INDENT}return {'await ' if self.asynchronous else ''}{loop}({index}, ({args}))")
+        return '\n'.join(self.lines) + '\n'
+
+    def parameters(self, decl: Union[FunctionDeclNode, MethodDeclNode]) -> Tuple[List[str], List[Tuple[str, TypeNode]]]:
+        """Declares the parameters of a function in the innermost scope. Returns them as Python
+        parameters, with their defaults, and the integer ones to wrap on entry."""
+        params: List[str] = []
+        wraps: List[Tuple[str, TypeNode]] = []
+        pynames: List[str] = []
+        self._params[decl] = pynames
+        for name, param in decl.params.items():
+            pyname: str = self.declare(name, param.type)
+            pynames.append(pyname)
+            if param.has_default:
+                params.append(f"{pyname}={self.expression(param.default_value)}")
+            else:
+                params.append(pyname)
+            if isinstance(param.type, IntegerTypeNode):
+                wraps.append((pyname, param.type))
+        return params, wraps
+
+    def body(self, decl: Union[FunctionDeclNode, MethodDeclNode], wraps: List[Tuple[str, TypeNode]]) -> None:
+        """Emits the entry of a function (budget, parameter wrapping) and its statements."""
+        if self.asynchronous:
+            self.spend()
+        for pyname, typenode in wraps:
+            self.emit(f"{pyname} = {wrap_int(pyname, typenode)}")
+        self._has_try = decl.scope is not None and any(isinstance(node, TryStmtNode) for node in walk(decl.scope))
+        self.scope(decl.scope)
+
+    def end_of_body(self, decl: FunctionDeclNode) -> None:
+        """Emits the return ending a body run in a loop, unless its last statement leaves already."""
+        statements: List[StmtNode] = getattr(decl.scope, 'statements', [])
+        if not statements or not isinstance(statements[-1], (ReturnStmtNode, RaiseStmtNode)):
+            self.emit('return')
+
+    def enclose(self, start: int, entry: str, exit: str) -> None:
+        """Puts the lines from the given one after an entry line, in a try running the exit line
+        however they are left."""
+        self.lines[start:] = [INDENT + line for line in self.lines[start:]]
+        self.lines[start:start] = [f"{INDENT * self._depth}{entry}", f"{INDENT * self._depth}try:"]
+        self.emit('finally:')
+        self.emit(f"{INDENT}{exit}")
+
+    def close_arena(self, start: int) -> None:
+        """Puts the lines from the given one in a try closing the arena, if the function uses one."""
+        if self._uses_arena:
+            # the instances of the arena go back to their pools however the function exits
+            self.enclose(start, f"{ARENA} = _Arena()", f"{ARENA}.close()")
+
+    def enter_call(self, start: int, node: str) -> None:
+        """Puts the lines from the given one in the frame of a call, in the profiler and on the
+        Brah call stack.
+
+        A tail call runs in the frame of the call that started the loop, as it
+        takes no frame of its own.
+        """
+        if self.profiled:
+            self.enclose(start, f"{PROFILER}.enter({node})", f"{PROFILER}.leave()")
+        if self.sampled:
+            self.enclose(start, f"{PUSH_FRAME}({FRAME} := [{node}, {NO_LOCATION}])", f"{POP_FRAME}()")
+
+    def scope(self, scope: ScopeNode) -> None:
+        """Emits the initialization of the scope declarations followed by its statements."""
+        self._scopes.append({})
+        for name, decl in scope.declarations.items():
+            if not isinstance(decl, VarDeclNode):
+                continue
+            self.emit(f"{self.declare(name, decl.type)} = {self.initial(decl)}")
+        for stmt in getattr(scope, 'statements', ()):
+            self.statement(stmt)
+        self._scopes.pop()
+
+    def initial(self, decl: VarDeclNode) -> str:
+        """Returns the Python expression of the initial value of a variable."""
+        if decl.value is None:
+            return self.zero(decl.type)
+        return self.converted(decl.value, decl.type)
+
+    @staticmethod
+    def zero(typenode: Optional[TypeNode]) -> str:
+        if isinstance(typenode, (IntegerTypeNode, EnumTypeNode)):
+            return '0'
+        elif isinstance(typenode, FloatTypeNode):
+            return '0.0'
+        elif isinstance(typenode, StringTypeNode):
+            return "''"
+        return 'None'
+
+    # region statements
+
+    def statement(self, stmt: StmtNode) -> None:
+        handler: Callable = self._handler('stmt', stmt)
+        if self.sampled and stmt.location != NO_LOCATION:
+            self.emit(f"{FRAME}[1] = {stmt.location}")
+        if self.profiled and isinstance(stmt, PROFILED_NODES):
+            start: int = len(self.lines)
+            self._tick = self.node(stmt)
+            self.loop_statement(stmt, handler)
+            # a parallel foreach has no loop of its own to count iterations in
+            self._tick = None
+            self.enclose(start, f"{PROFILER}.enter({self.node(stmt)})", f"{PROFILER}.leave()")
+        elif isinstance(stmt, _LOOP_STMTS):
+            self.loop_statement(stmt, handler)
+        else:
+            handler(self, stmt)
+
+    def loop_statement(self, stmt: StmtNode, handler: Callable) -> None:
+        if self.string_builders:
+            names: List[str] = self.appended_strings(stmt)
+            if names:
+                self.build_strings(stmt, handler, names)
+                return
+        handler(self, stmt)
+
+    def appended_strings(self, loop: StmtNode) -> List[str]:
+        """Returns the local strings a loop uses only to append strings to, with ``+=``.
+
+        Functions with try statements are left alone: a handler could read a
+        string whose parts are still in the list.
+        """
+        if self._has_try or (isinstance(loop, ForEachStmtNode) and is_parallel(loop)):
+            return []
+        appends: Set[int] = set()
+        appended: Set[str] = set()
+        used: Set[str] = set()
+        for node in walk(loop):
+            if (isinstance(node, ExpressionStmtNode) and isinstance(node.expr, AddBinaryExprNode)
+                    and node.expr.is_inplace and node.expr.operator == '+='
+                    and isinstance(node.expr.right.type, StringTypeNode)):
+                target: ExprNode = node.expr.left
+                if isinstance(target, LValueExprNode):
+                    target = target.exprtarget
+                if isinstance(target, (VarNameExprNode, ParamNameExprNode)):
+                    appends.add(id(target))
+                    appended.add(target.name)
+            elif isinstance(node, NameExprNode) and id(node) not in appends:
+                used.add(node.name)
+            elif isinstance(node, VarDeclNode):
+                used.add(node.name)
+
+        names: List[str] = []
+        for name in sorted(appended - used):
+            _, typenode, is_local = self.lookup(name)
+            if is_local and isinstance(typenode, StringTypeNode) and name not in self._builders:
+                names.append(name)
+        return names
+
+    def build_strings(self, loop: StmtNode, handler: Callable, names: List[str]) -> None:
+        """Emits a loop appending the parts of the given strings to lists, joined after the loop."""
+        parts: List[Tuple[str, str]] = []
+        for name in names:
+            pyname: str = self.lookup(name)[0]
+            items: str = self.temp()
+            append: str = self.temp()
+            self.emit(f"{items} = [{pyname}]")
+            self.emit(f"{append} = {items}.append")
+            self._builders[name] = append
+            parts.append((pyname, items))
+        handler(self, loop)
+        for name in names:
+            del self._builders[name]
+        for pyname, items in parts:
+            self.emit(f"{pyname} = ''.join({items})")
+
+    def store(self, target: ExprNode, value: str, source: Optional[ExprNode] = None) -> None:
+        """Emits the assignment of a Python expression to an l-value. Given the expression
+        the value comes from, the wrapping of integers that already fit is left out."""
+        if isinstance(target, LValueExprNode):
+            target = target.exprtarget
+        if isinstance(target, NameExprNode) and not isinstance(target, (FieldNameExprNode, PropertyNameExprNode)):
+            pyname, typenode, is_local = self.lookup(target.name)
+            if not is_local:
+                raise TranslationError(f"Assignment to non-local name: '{target.name}'")
+        elif isinstance(target, (NameExprNode, IndexExprNode, MemberExprNode)):
+            pyname, typenode = self.expression(target), target.type
+        else:
+            raise TranslationError(f"Unsupported assignment target: {target.__class__.__name__}")
+        self.emit(f"{pyname} = {self.narrowed(value, source, typenode)}")
+
+    def _stmt_AssignmentStmtNode(self, stmt: AssignmentStmtNode) -> None:
+        self.store(stmt.exprlvalue, self.expression(stmt.exprvalue), stmt.exprvalue)
+
+    def _stmt_UnpackStmtNode(self, stmt: UnpackStmtNode) -> None:
+        value: ExprNode = stmt.exprvalue
+        if isinstance(value, AggregateExprNode) and not any(
+                isinstance(item, UnpackUnaryExprNode) for item in value.exprlist):
+            self.unpack_aggregate(stmt.exprlvalues, value.exprlist)
+        else:
+            self.unpack(stmt.exprlvalues, value)
+
+    @staticmethod
+    def slots(targets: List[Optional[ExprNode]], count: Optional[int]) -> List[Tuple[int, ExprNode]]:
+        """Returns the index of the element each target of an unpacking takes, counted from the end
+        after '...' when the number of elements is not known."""
+        if targets.count(None) > 1:
+            raise TranslationError("Unpacking with more than one '...'")
+        elif None not in targets:
+            if count is not None and count != len(targets):
+                raise TranslationError(f"Unpacking {count} values into {len(targets)} targets")
+            return list(enumerate(targets))
+        skip: int = targets.index(None)
+        after: List[ExprNode] = targets[skip + 1:]
+        if count is not None and count < len(targets) - 1:
+            raise TranslationError(f"Unpacking {count} values into {len(targets) - 1} targets")
+        end: int = count if count is not None else 0
+        return list(enumerate(targets[:skip])) + [(end - len(after) + i, target) for i, target in enumerate(after)]
+
+    def unpack_aggregate(self, targets: List[Optional[ExprNode]], items: List[ExprNode]) -> None:
+        """Emits ``{a, b} = {x, y}`` as one move per element. The elements go through temporaries
+        first only when a target written earlier may be read by an element after it."""
+        moves: Dict[int, ExprNode] = dict(self.slots(targets, len(items)))
+        written: Set[str] = set()
+        memory: bool = False
+        overlap: bool = False
+        for index, item in enumerate(items):
+            for node in walk(item):
+                if (isinstance(node, NameExprNode) and node.name in written) or (memory and isinstance(
+                        node, (FieldNameExprNode, PropertyNameExprNode, MemberExprNode, IndexExprNode,
+                               DirectCallExprNode, IndirectCallExprNode))):
+                    overlap = True
+            target: Optional[ExprNode] = moves.get(index)
+            if target is not None and self.is_local(target):
+                written.add((target.exprtarget if isinstance(target, LValueExprNode) else target).name)
+            elif target is not None:
+                memory = True
+        sources: List[str] = []
+        for index, item in enumerate(items):
+            source: str = self.expression(item)
+            if index not in moves:
+                # skipped by '...', evaluated for what it does
+                if not isinstance(item, (LiteralExprNode, NameExprNode)):
+                    self.emit(source)
+            elif overlap:
+                sources.append(self.temp())
+                self.emit(f"{sources[-1]} = {source}")
+            else:
+                self.store(moves[index], source, item)
+        if overlap:
+            for (index, target), source in zip(sorted(moves.items()), sources):
+                self.store(target, source, items[index])
+
+    def unpack(self, targets: List[Optional[ExprNode]], value: ExprNode) -> None:
+        """Emits ``{a, b} = valor`` as an unpacking straight into the targets, or as indexing
+        from both ends around '...', so that no list is built for the elements skipped."""
+        source: str = self.expression(value)
+        slots: List[Tuple[int, ExprNode]] = self.slots(targets, None)
+        if None in targets:
+            holder: str = self.temp()
+            self.emit(f"{holder} = {source}")
+            for index, target in slots:
+                self.store(target, f"{holder}[{index}]")
+        elif all(self.is_local(target) and not isinstance(self.lookup(
+                (target.exprtarget if isinstance(target, LValueExprNode) else target).name)[1], IntegerTypeNode)
+                 for target in targets):
+            names: List[str] = [self.expression(target) for target in targets]
+            self.emit(f"{', '.join(names)}{',' if len(names) == 1 else ''} = {source}")
+        else:
+            # integers are wrapped to the type of their target on the way
+            temps: List[str] = [self.temp() for _ in targets]
+            self.emit(f"{', '.join(temps)}{',' if len(temps) == 1 else ''} = {source}")
+            for target, temp in zip(targets, temps):
+                self.store(target, temp)
+
+    def _stmt_ExpressionStmtNode(self, stmt: ExpressionStmtNode) -> None:
+        expr: ExprNode = stmt.expr
+        if isinstance(expr, (IncrUnaryExprNode, DecrUnaryExprNode)):
+            step: str = '+' if isinstance(expr, IncrUnaryExprNode) else '-'
+            self.store(expr.operand, f"{self.expression(expr.operand)} {step} 1")
+        elif isinstance(expr, BinaryExprNode) and expr.is_inplace:
+            target: ExprNode = expr.left.exprtarget if isinstance(expr.left, LValueExprNode) else expr.left
+            if isinstance(target, NameExprNode) and target.name in self._builders and expr.operator == '+=':
+                self.emit(f"{self._builders[target.name]}({self.expression(expr.right)})")
+            else:
+                self.store(expr.left, self.binary(expr))
+        else:
+            self.emit(self.expression(expr))
+
+    def _stmt_IfThenStmtNode(self, stmt: IfThenStmtNode) -> None:
+        self.emit(f"if {self.value(stmt.condexpr)}:")
+        with self.indented():
+            self.scope(stmt.thenscope)
+
+    def _stmt_IfElseStmtNode(self, stmt: IfElseStmtNode) -> None:
+        self._stmt_IfThenStmtNode(stmt)
+        self.emit('else:')
+        with self.indented():
+            self.scope(stmt.elsescope)
+
+    def spend(self) -> None:
+        """Emits the countdown of the budget asynchronous code runs before yielding to the event loop."""
+        self.emit(f"{BUDGET} -= 1")
+        self.emit(f"if not {BUDGET}:")
+        self.emit(f"{INDENT}{BUDGET} = _slice")
+        self.emit(f"{INDENT}await _pause(0)")
+
+    def loop(self, label: Optional[str], body: ScopeNode, prelude: Optional[Callable[[], None]] = None) -> None:
+        """Emits a loop body; the prelude is emitted at its end and before each ``continue``. The
+        body of a profiled loop starts by counting the iteration."""
+        if self.asynchronous:
+            step: Optional[Callable[[], None]] = prelude
+
+            def prelude() -> None:
+                self.spend()
+                if step:
+                    step()
+
+        tick, self._tick = self._tick, None
+        self._breakables.append(_Breakable(label, True, prelude))
+        with self.indented():
+            if tick is not None:
+                self.emit(f"{PROFILER}.tick({tick})")
+            self.scope(body)
+            if prelude:
+                prelude()
+        self._breakables.pop()
+
+    def _stmt_WhileStmtNode(self, stmt: WhileStmtNode) -> None:
+        self.emit(f"while {self.value(stmt.condexpr)}:")
+        self.loop(stmt.label, stmt.scope)
+
+    def _stmt_DoWhileStmtNode(self, stmt: DoWhileStmtNode) -> None:
+        def test() -> None:
+            self.emit(f"if not {self.value(stmt.condexpr)}:")
+            self.emit(f"{INDENT}break")
+
+        self.emit('while True:')
+        self.loop(stmt.label, stmt.scope, test)
+
+    def _stmt_DoUntilStmtNode(self, stmt: DoUntilStmtNode) -> None:
+        def test() -> None:
+            self.emit(f"if {self.value(stmt.condexpr)}:")
+            self.emit(f"{INDENT}break")
+
+        self.emit('while True:')
+        self.loop(stmt.label, stmt.scope, test)
+
+    def _stmt_RepeatStmtNode(self, stmt: RepeatStmtNode) -> None:
+        self._scopes.append({})
+        if stmt.startdecl is not None:
+            decl: VarDeclNode = stmt.startdecl
+            self.emit(f"{self.declare(decl.name, decl.type)} = {self.initial(decl)}")
+        self.emit(f"for {self.temp()} in range({self.value(stmt.stopexpr)}):")
+        self.loop(stmt.label, stmt.scope, (lambda: self.statement(stmt.stepstmt)) if stmt.stepstmt else None)
+        self._scopes.pop()
+
+    def _stmt_ForStmtNode(self, stmt: ForStmtNode) -> None:
+        def step() -> None:
+            for stepstmt in stmt.stepstmts:
+                self.statement(stepstmt)
+
+        self._scopes.append({})
+        for decl in stmt.startdecls:
+            self.emit(f"{self.declare(decl.name, decl.type)} = {self.initial(decl)}")
+        test: str = ' and '.join(self.value(expr) for expr in stmt.stopexprs) or 'True'
+        self.emit(f"while {test}:")
+        self.loop(stmt.label, stmt.scope, step)
+        self._scopes.pop()
+
+    def _stmt_ForEachStmtNode(self, stmt: ForEachStmtNode) -> None:
+        check: Optional[ParallelCheck] = None
+        if is_parallel(stmt):
+            check = ParallelCheck(stmt, self.resolve)
+            if check and self.parallel_foreach(stmt, check):
+                return
+
+        container: str = self.expression(stmt.container)
+        self._scopes.append({})
+        if self.stores_element(stmt):
+            # assigning the element stores into its slot of the array, in parallel or not
+            items: str = self.temp()
+            index: str = self.temp()
+            self.emit(f"{items} = {container}")
+            element: str = self.declare(stmt.element.name, stmt.element.type)
+            self.emit(f"for {index}, {element} in enumerate({items}):")
+            self.loop(stmt.label, stmt.scope, lambda: self.emit(f"{items}[{index}] = {element}"))
+        else:
+            self.emit(f"for {self.declare(stmt.element.name, stmt.element.type)} in {container}:")
+            self.loop(stmt.label, stmt.scope)
+        self._scopes.pop()
+
+    @staticmethod
+    def stores_element(stmt: ForEachStmtNode) -> bool:
+        """Returns whether the body of a foreach over an array assigns its element."""
+        return (not isinstance(unalias(stmt.container.type), StringTypeNode)
+                and stmt.element.name in DefUse(stmt.scope).defs)
+
+    def parallel_foreach(self, stmt: ForEachStmtNode, check: ParallelCheck) -> bool:
+        """Emits a parallel foreach as a call to run_parallel, returning False if it cannot be split."""
+        typecode: Optional[str] = array_typecode(stmt.element.type)
+        if typecode is None:
+            return False
+        outer: List[Tuple[str, str, Optional[TypeNode]]] = []
+        constants: List[str] = list(check.constants)
+        container: Optional[str] = stmt.container.name if self.is_local(stmt.container) else None
+        for name in check.reads:
+            pyname, typenode, is_local = self.lookup(name)
+            if name == container:
+                # read from the block the chunks run over, not passed along as a copy
+                continue
+            elif is_local:
+                outer.append((name, pyname, typenode))
+            elif isinstance(self.resolve(name), (ConstDeclNode, EnumDeclNode)):
+                constants.append(name)
+            else:
+                return False
+        reductions: List[Tuple[str, str, Optional[TypeNode]]] = []
+        for name in stmt.reductions:
+            pyname, typenode, is_local = self.lookup(name)
+            if not is_local:
+                return False
+            reductions.append((name, pyname, typenode))
+
+        chunk = FunctionTranslator(self.decl)
+        chunk.pyname = f"{CHUNK_PREFIX}{self.pyname}_{next(self._temps)}"
+        source: List[str] = ["from math import fmod as _fmod",
+                             "from brah.j_hostjit import brah_div as _div, brah_mod as _mod,"
+                             " int_div as _idiv, int_mod as _imod"]
+        for name, decl in check.functions.items():
+            source.append(FunctionTranslator(decl).translate())
+            source.append(f"{GLOBAL_PREFIX}{name} = f_{name}")
+        source.append(chunk.chunk_function(stmt, check, outer, reductions, container))
+        code: str = '\n'.join(source)
+
+        names: str = ', '.join(f"{GLOBAL_PREFIX + name!r}: {GLOBAL_PREFIX}{name}" for name in constants)
+        values: str = ''.join(f"{pyname}, " for _, pyname, _ in outer)
+        operators: str = ''.join(f"{stmt.reductions[name]!r}, " for name, _, _ in reductions)
+        initial: str = ''.join(f"{pyname}, " for _, pyname, _ in reductions)
+        result: str = self.temp()
+        self.emit(f"{result} = _parallel({code!r}, {chunk.pyname!r}, {{{names}}}, {typecode!r},"
+                  f" {self.expression(stmt.container)}, ({values}), ({operators}), ({initial}),"
+                  f" {check.writes_element})")
+        for index, (_, pyname, typenode) in enumerate(reductions):
+            self.emit(f"{pyname} = {wrap_int(f'{result}[{index}]', typenode)}")
+        return True
+
+    def chunk_function(self, stmt: ForEachStmtNode, check: ParallelCheck,
+                       outer: List[Tuple[str, str, Optional[TypeNode]]],
+                       reductions: List[Tuple[str, str, Optional[TypeNode]]], container: Optional[str] = None) -> str:
+        """Returns the source of the function running a parallel foreach body over one chunk. The
+        container, when the body reads it, is the element buffer."""
+        self._scopes.append({container: ('_view', stmt.container.type)} if container in check.reads else {})
+        params: str = ''.join(f", {self.declare(name, typenode)}" for name, _, typenode in outer)
+        self.emit(f"def {self.pyname}(_view, _start, _stop{params}):")
+        with self.indented():
+            results: List[str] = []
+            for name, _, typenode in reductions:
+                pyname: str = self.declare(name, typenode)
+                self.emit(f"{pyname} = {REDUCTIONS[stmt.reductions[name]][1]!r}")
+                results.append(pyname)
+            index: str = self.temp()
+            element: str = self.declare(stmt.element.name, stmt.element.type)
+            self.emit(f"for {index} in range(_start, _stop):")
+            self.emit(f"{INDENT}{element} = _view[{index}]")
+            store = (lambda: self.emit(f"_view[{index}] = {element}")) if check.writes_element else None
+            self.loop(stmt.label, stmt.scope, store)
+            self.emit(f"return ({''.join(result + ', ' for result in results)})")
+        self._scopes.pop()
+        return '\n'.join(self.lines) + '\n'
+
+    def _stmt_SwitchStmtNode(self, stmt: SwitchStmtNode) -> None:
+        start: int = len(self.lines)
+        subject: str = self.temp()
+        self.emit(f"{subject} = {self.value(stmt.targetexpr)}")
+        switch = _Breakable(stmt.label, False)
+        self._breakables.append(switch)
+        cases: List[CaseStmtNode] = [case for case in stmt.cases if not case.is_default]
+        default: Optional[CaseStmtNode] = next((case for case in stmt.cases if case.is_default), None)
+        values: List[List[Optional[int]]] = [[self.constant(expr) for expr in case.cases] for case in cases]
+        flat: List[Optional[int]] = [value for case_values in values for value in case_values]
+        if (len(flat) >= SWITCH_TABLE_MIN_CASES and None not in flat
+                and max(flat) - min(flat) < SWITCH_TABLE_DENSITY * len(flat)):
+            self.case_table(subject, cases, values, default)
+        else:
+            self.case_chain(subject, cases, default)
+        self._breakables.pop()
+
+        if switch.broken or switch.flag:
+            # 'pare' leaves the switch: run it inside a loop of a single iteration
+            self.lines[start:] = [INDENT + line for line in self.lines[start:]]
+            self.lines.insert(start, f"{INDENT * self._depth}while True:")
+            self.emit(f"{INDENT}break")
+        if switch.flag:
+            # a 'continue' left the switch through that loop, setting the flag
+            self.lines.insert(start, f"{INDENT * self._depth}{switch.flag} = False")
+            self.emit(f"if {switch.flag}:")
+            with self.indented():
+                self.jump_continue(self._breakables[-1], self._breakables[-1:])
+
+    def case_chain(self, subject: str, cases: List[CaseStmtNode], default: Optional[CaseStmtNode]) -> None:
+        """Emits the cases of a switch as an if/elif chain."""
+        keyword: str = 'if'
+        for case in cases:
+            test: str = ' or '.join(f"{subject} == {self.expression(expr)}" for expr in case.cases)
+            self.emit(f"{keyword} {test}:")
+            with self.indented():
+                self.scope(case.scope)
+            keyword = 'elif'
+        if default is not None:
+            if keyword == 'if':
+                self.scope(default.scope)
+            else:
+                self.emit('else:')
+                with self.indented():
+                    self.scope(default.scope)
+
+    def case_table(self, subject: str, cases: List[CaseStmtNode], values: List[List[int]],
+                   default: Optional[CaseStmtNode]) -> None:
+        """Emits the cases of a switch over dense integers: a constant tuple maps the value to
+        the case index, which a binary search of ifs dispatches on."""
+        low: int = min(value for case_values in values for value in case_values)
+        high: int = max(value for case_values in values for value in case_values)
+        table: List[Optional[int]] = [None] * (high - low + 1)
+        for index, case_values in enumerate(values):
+            for value in case_values:
+                if table[value - low] is None:
+                    table[value - low] = index
+        other: int = len(cases)
+        table = [other if index is None else index for index in table]
+
+        index: str = self.temp()
+        offset: str = f"{subject} - {low}" if low else subject
+        self.emit(f"{index} = {tuple(table)!r}[{offset}] if {low} <= {subject} <= {high} else {other}")
+        scopes: List[Optional[ScopeNode]] = [case.scope for case in cases]
+        scopes.append(default.scope if default is not None else None)
+        self._case_tree(index, scopes, 0, other)
+
+    def _case_tree(self, index: str, scopes: List[Optional[ScopeNode]], first: int, last: int) -> None:
+        if first == last:
+            if scopes[first] is not None:
+                self.scope(scopes[first])
+            return
+        middle: int = (first + last + 1) // 2
+        self.emit(f"if {index} < {middle}:")
+        with self.indented():
+            self._case_tree(index, scopes, first, middle - 1)
+        self.emit('else:')
+        with self.indented():
+            self._case_tree(index, scopes, middle, last)
+
+    def _stmt_TryStmtNode(self, stmt: TryStmtNode) -> None:
+        self.emit('try:')
+        with self.indented():
+            self.scope(stmt.scope)
+        for clause in stmt.clauses:
+            names: List[str] = [self.expression(catch) for catch in clause.catches]
+            if not names:
+                self.emit('except Exception:')
+            elif len(names) == 1:
+                self.emit(f"except {names[0]}:")
+            else:
+                self.emit(f"except ({', '.join(names)}):")
+            with self.indented():
+                self.scope(clause.scope)
+        if not stmt.clauses:
+            self.emit('finally:')
+            self.emit(f"{INDENT}pass")
+
+    def _stmt_RaiseStmtNode(self, stmt: RaiseStmtNode) -> None:
+        self.emit(f"raise {self.expression(stmt.xcptexpr)}()")
+
+    def _target(self, label: Optional[str], is_continue: bool) -> Tuple[_Breakable, List[_Breakable]]:
+        """Returns the loop or switch a jump goes to, and the switches it leaves on the way."""
+        crossed: List[_Breakable] = []
+        for target in reversed(self._breakables):
+            if (label is None or target.label == label) and (target.is_loop or not is_continue):
+                break
+            crossed.append(target)
+        else:
+            raise TranslationError(f"No statement to {'continue' if is_continue else 'break'}: '{label}'")
+        if any(other.is_loop for other in crossed):
+            raise TranslationError(f"Labeled jump out of nested loops: '{label}'")
+        return target, crossed
+
+    def jump_continue(self, target: _Breakable, crossed: List[_Breakable]) -> None:
+        if crossed and not crossed[0].is_loop:
+            # leave the switch loop; the code after it continues the jump
+            switch: _Breakable = crossed[0]
+            if switch.flag is None:
+                switch.flag = self.temp()
+            self.emit(f"{switch.flag} = True")
+            self.emit('break')
+        else:
+            if target.prelude:
+                target.prelude()
+            self.emit('continue')
+
+    def _stmt_BreakStmtNode(self, stmt: BreakStmtNode) -> None:
+        target, crossed = self._target(stmt.stmtlabel, False)
+        if crossed:
+            raise TranslationError(f"Labeled break out of a nested switch: '{stmt.stmtlabel}'")
+        target.broken = True
+        self.emit('break')
+
+    def _stmt_ContinueStmtNode(self, stmt: ContinueStmtNode) -> None:
+        target, crossed = self._target(stmt.stmtlabel, True)
+        self.jump_continue(target, crossed)
+
+    def _stmt_ReturnStmtNode(self, stmt: ReturnStmtNode) -> None:
+        target: Optional[FunctionDeclNode] = self._tail_targets.get(stmt)
+        if stmt.valueexpr is None:
+            self.emit('return')
+        elif target in self._group and not self.lookup(stmt.valueexpr.funcnameexpr.name)[2]:
+            self.tail_call(stmt.valueexpr, target)
+        elif isinstance(stmt.valueexpr, AggregateExprNode):
+            # the caller unpacks the values straight into its variables
+            self.emit(f"return {self.expression(stmt.valueexpr)}")
+        else:
+            self.emit(f"return {self.converted(stmt.valueexpr, self.decl.type)}")
+
+    def tail_call(self, call: DirectCallExprNode, target: FunctionDeclNode) -> None:
+        """Emits a tail call as a jump to the start of the loop the function body runs in."""
+        args: List[str] = [self.expression(arg) for arg in call.arglist]
+        params: List[ParamDeclNode] = list(target.params.values())
+        args.extend(self.expression(param.default_value) for param in params[len(args):])
+        if len(self._group) > 1:
+            self.emit(f"{ARGS} = ({''.join(arg + ', ' for arg in args)})")
+            if target is not self.decl:
+                self.emit(f"{ENTRY} = {self._group[target]}")
+        elif args:
+            # the arguments are all evaluated before any parameter changes
+            self.emit(f"{', '.join(self._params[target])} = {', '.join(args)}")
+        self.emit('continue')
+
+    # endregion (statements)
+
+    # region expressions
+
+    def expression(self, expr: ExprNode) -> str:
+        return self._handler('expr', expr)(self, expr)
+
+    def enum_member(self, expr: ExprNode) -> Optional[Tuple[EnumTypeNode, str]]:
+        """Returns the enumeration and member name an expression refers to, if it does."""
+        if isinstance(expr, MemberExprNode) and isinstance(expr.baseexpr, NameExprNode):
+            enumtype = self.resolve(expr.baseexpr.name)
+            if isinstance(enumtype, EnumTypeNode) and expr.memberexpr.name in enumtype.members:
+                return enumtype, expr.memberexpr.name
+        elif isinstance(expr, EnumNameExprNode) and not self.lookup(expr.name)[2]:
+            decl = self.resolve(expr.name)
+            if isinstance(decl, EnumDeclNode) and isinstance(decl.type, EnumTypeNode):
+                return decl.type, decl.name
+        return None
+
+    def resolve(self, name: str) -> Optional[Union[DeclNode, TyclNode, TypeNode]]:
+        """Returns the declaration a global name refers to, when the enclosing scopes are known."""
+        scope: Optional[ScopeNode] = getattr(self.decl, 'scope', None)
+        return scope.get_name(name) if scope is not None else None
+
+    def constant(self, expr: ExprNode) -> Optional[int]:
+        """Returns the value of an integer literal or enumeration member, or None for other expressions."""
+        if isinstance(expr, LiteralExprNode):
+            return expr.value if isinstance(expr.value, int) and not isinstance(expr.value, bool) else None
+        elif isinstance(expr, NegateUnaryExprNode):
+            value: Optional[int] = self.constant(expr.operand)
+            return -value if value is not None else None
+        member: Optional[Tuple[EnumTypeNode, str]] = self.enum_member(expr)
+        if member is not None:
+            enumtype, name = member
+            return enumtype.code_of(name)
+        return None
+
+    def _expr_LiteralExprNode(self, expr: LiteralExprNode) -> str:
+        return repr(expr.value)
+
+    def _expr_NameExprNode(self, expr: NameExprNode) -> str:
+        return self.lookup(expr.name)[0]
+
+    def _expr_EnumNameExprNode(self, expr: EnumNameExprNode) -> str:
+        code: Optional[int] = self.constant(expr)
+        return repr(code) if code is not None else self.lookup(expr.name)[0]
+
+    def _expr_FieldNameExprNode(self, expr: FieldNameExprNode) -> str:
+        if not isinstance(self.decl, MethodDeclNode):
+            raise TranslationError(f"Field outside of a method: '{expr.name}'")
+        return f"{THIS}.{expr.name}"
+
+    _expr_PropertyNameExprNode = _expr_FieldNameExprNode
+
+    def _expr_LValueExprNode(self, expr: LValueExprNode) -> str:
+        return self.expression(expr.exprtarget)
+
+    def value(self, expr: ExprNode) -> str:
+        """Returns the Python expression of an exact value: wrapped if integer arithmetic is still pending."""
+        source: str = self.expression(expr)
+        return wrap_int(source, expr.type) if self.may_overflow(expr) else source
+
+    def may_overflow(self, expr: ExprNode) -> bool:
+        """Returns whether the value of an integer expression may lie outside of its type until wrapped."""
+        if not isinstance(expr.type, IntegerTypeNode):
+            return False
+        if isinstance(expr, BinaryExprNode):
+            return expr.operator not in _COMPARISONS + ('e', 'ou') and not self.fits(expr, expr.type)
+        elif isinstance(expr, NegateUnaryExprNode):
+            return True
+        elif isinstance(expr, TernaryExprNode):
+            return self.may_overflow(expr.thenexpr) or self.may_overflow(expr.elseexpr)
+        return False
+
+    def fits(self, expr: ExprNode, typenode: Optional[TypeNode]) -> bool:
+        """Returns whether the value of an expression needs no wrapping to be stored with the given type."""
+        if not isinstance(typenode, IntegerTypeNode):
+            return True
+        if not same_integer(expr.type, typenode):
+            return False
+        if isinstance(expr, LValueExprNode):
+            expr = expr.exprtarget
+        if isinstance(expr, LiteralExprNode):
+            return True
+        elif isinstance(expr, (IncrUnaryExprNode, DecrUnaryExprNode, DirectCallExprNode, IndirectCallExprNode)):
+            return not self.is_allocation(expr)
+        elif isinstance(expr, NameExprNode) and not isinstance(expr, (FieldNameExprNode, PropertyNameExprNode)):
+            return self.lookup(expr.name)[2]
+        elif isinstance(expr, TernaryExprNode):
+            return self.fits(expr.thenexpr, typenode) and self.fits(expr.elseexpr, typenode)
+        elif isinstance(expr, BinaryExprNode) and not expr.is_inplace:
+            # a remainder or unsigned quotient of exact operands is never larger than them
+            if expr.operator == '%' or (expr.operator == '/' and not typenode.signed):
+                return same_integer(expr.left.type, typenode) and same_integer(expr.right.type, typenode)
+            elif expr.operator in ('&', '|', '^'):
+                return self.fits(expr.left, typenode) and self.fits(expr.right, typenode)
+        return False
+
+    def converted(self, expr: ExprNode, typenode: Optional[TypeNode]) -> str:
+        """Returns the Python expression of a value stored with the given type."""
+        return self.narrowed(self.expression(expr), expr, typenode)
+
+    def narrowed(self, source: str, expr: Optional[ExprNode], typenode: Optional[TypeNode]) -> str:
+        """Returns a Python expression wrapped to be stored with the given type.
+
+        Integer arithmetic still pending is first wrapped at the width of its own
+        type, which a wider or non-integer destination would not do.
+        """
+        if expr is None:
+            return wrap_int(source, typenode)
+        if isinstance(typenode, (IntegerTypeNode, FloatTypeNode)):
+            source = self.declared(source, expr)
+        if self.may_overflow(expr) and not same_integer(expr.type, typenode):
+            source = wrap_int(source, expr.type)
+            return source if _holds(typenode, expr.type) else wrap_int(source, typenode)
+        return source if self.fits(expr, typenode) else wrap_int(source, typenode)
+
+    def binary(self, expr: BinaryExprNode) -> str:
+        operator: str = expr.operator
+        if expr.is_inplace and operator.endswith('=') and operator[:-1] in _OPERATORS.keys() | _HELPER_OPERATORS:
+            operator = operator[:-1]
+        lefttype, righttype = expr.left.type, expr.right.type
+        if find_operator(unalias(lefttype), operator) is not None:
+            return self.overload(operator, expr)
+        numeric: bool = (isinstance(lefttype, (IntegerTypeNode, FloatTypeNode))
+                         and isinstance(righttype, (IntegerTypeNode, FloatTypeNode)))
+        if operator in _HELPER_OPERATORS and numeric:
+            left, right = self.value(expr.left), self.value(expr.right)
+            if isinstance(lefttype, FloatTypeNode) or isinstance(righttype, FloatTypeNode):
+                return _FLOAT_OPERATORS[operator].format(left, right)
+            elif not lefttype.signed and not righttype.signed:
+                return _UINT_OPERATORS[operator].format(left, right)
+            return _INT_OPERATORS[operator].format(left, right)
+        if numeric and (operator in _COMPARISONS or operator == '>>' or lefttype.__class__ is not righttype.__class__):
+            # the operation depends on the exact integer values
+            left, right = self.value(expr.left), self.value(expr.right)
+        else:
+            left, right = self.expression(expr.left), self.expression(expr.right)
+        if operator not in ('==', '!=') or unalias(lefttype) is not unalias(righttype):
+            left, right = self.declared(left, expr.left), self.declared(right, expr.right)
+        if operator in _OPERATORS:
+            return f"({left} {_OPERATORS[operator]} {right})"
+        elif operator in _HELPER_OPERATORS:
+            return f"{_HELPER_OPERATORS[operator]}({left}, {right})"
+        raise TranslationError(f"Unsupported operator: '{expr.operator}'")
+
+    def overload(self, operator: str, expr: BinaryExprNode) -> str:
+        """Returns the call of the method overloading an operator, found in the operator table by the
+        classes of the operands, which a subclass of the declared ones may override."""
+        operands: List[str] = []
+        classes: List[str] = []
+        for operand in (expr.left, expr.right):
+            source: str = self.expression(operand)
+            if isinstance(operand, LiteralExprNode):
+                operands.append(source)
+                classes.append(f"({source}).__class__")
+            elif self.is_local(operand):
+                # a local reads the same twice
+                operands.append(source)
+                classes.append(f"{source}.__class__")
+            else:
+                operands.append(self.temp())
+                classes.append(f"({operands[-1]} := {source}).__class__")
+        return self.call(f"{OPERATORS}[({operator!r}, {classes[0]}, {classes[1]})]", operands)
+
+    def declared(self, source: str, expr: ExprNode) -> str:
+        """Returns the Python expression of the declared value of an enumeration value, given the one
+        of its run time value. Other values are returned unchanged."""
+        enumtype = unalias(expr.type)
+        if not isinstance(enumtype, EnumTypeNode) or not enumtype.renumbers():
+            return source
+        code: Optional[int] = self.constant(expr)
+        if code is not None:
+            return repr(enumtype.value_of(code))
+        return f"{tuple(enumtype.values)!r}[{source}]"
+
+    def _expr_BinaryExprNode(self, expr: BinaryExprNode) -> str:
+        if expr.is_inplace:
+            raise TranslationError("In-place operation used as a value")
+        return self.binary(expr)
+
+    def _expr_TernaryExprNode(self, expr: TernaryExprNode) -> str:
+        return (f"({self.expression(expr.thenexpr)} if {self.value(expr.condition)}"
+                f" else {self.expression(expr.elseexpr)})")
+
+    def _step(self, expr: UnaryExprNode, step: str, is_post: bool) -> str:
+        operand: ExprNode = expr.operand
+        if isinstance(operand, LValueExprNode):
+            operand = operand.exprtarget
+        pyname, typenode, is_local = self.lookup(getattr(operand, 'name', ''))
+        if not isinstance(operand, NameExprNode) or not is_local:
+            raise TranslationError("Increment or decrement of a non-local used as a value")
+        update: str = f"({pyname} := {wrap_int(f'{pyname} {step} 1', typenode)})"
+        if is_post:
+            old: str = self.temp()
+            return f"(({old} := {pyname}), {update})[0]"
+        return update
+
+    def _expr_IncrUnaryExprNode(self, expr: IncrUnaryExprNode) -> str:
+        return self._step(expr, '+', expr.is_post)
+
+    def _expr_DecrUnaryExprNode(self, expr: DecrUnaryExprNode) -> str:
+        return self._step(expr, '-', expr.is_post)
+
+    def _expr_NegateUnaryExprNode(self, expr: NegateUnaryExprNode) -> str:
+        return f"(-{self.expression(expr.operand)})"
+
+    def is_allocation(self, expr: ExprNode) -> bool:
+        """Returns whether the expression creates an instance of a class or structure."""
+        if not isinstance(expr, DirectCallExprNode):
+            return False
+        callee: NameExprNode = expr.funcnameexpr
+        if isinstance(callee, (ClassNameExprNode, StructNameExprNode)):
+            return True
+        return (not self.lookup(callee.name)[2]
+                and isinstance(self.resolve(callee.name), (ClassTyclNode, StructureTyclNode)))
+
+    def _expr_DirectCallExprNode(self, expr: DirectCallExprNode) -> str:
+        if self.is_allocation(expr):
+            args: str = ', '.join(self.value(arg) for arg in expr.arglist)
+            pool: str = self.expression(expr.funcnameexpr)
+            if expr in self._scoped:
+                self._uses_arena = True
+                return f"{pool}.new_in({ARENA}{', ' if args else ''}{args})"
+            return f"{pool}.new({args})"
+        # functions wrap their integer parameters themselves
+        callee: NameExprNode = expr.funcnameexpr
+        decl: Any = None if self.lookup(callee.name)[2] else self.resolve(callee.name)
+        params: List[ParamDeclNode] = list(decl.params.values()) if isinstance(decl, FunctionDeclNode) else []
+        args: List[str] = [self.argument(arg, params[index].type if index < len(params) else None)
+                           for index, arg in enumerate(expr.arglist)]
+        return self.call(self.expression(callee), args, self.is_leaf(decl))
+
+    def argument(self, arg: ExprNode, typenode: Optional[TypeNode]) -> str:
+        """Returns the Python expression of an argument passed to a parameter of the given type.
+        Integer arithmetic still pending is wrapped at its own width unless the parameter has the
+        same type, which the function wraps on entry."""
+        typenode = unalias(typenode)
+        source: str = self.expression(arg) if same_integer(arg.type, typenode) else self.value(arg)
+        return self.declared(source, arg) if isinstance(typenode, (IntegerTypeNode, FloatTypeNode)) else source
+
+    def _expr_IndirectCallExprNode(self, expr: IndirectCallExprNode) -> str:
+        return self.call(self.expression(expr.callableexpr), [self.argument(arg, None) for arg in expr.arglist])
+
+    def call(self, callee: str, args: List[str], direct: bool = False) -> str:
+        """Returns the Python expression of a call. Stackless, calls other than the direct
+        ones are yielded to ``run_stackless``."""
+        if self.asynchronous:
+            return f"(await {callee}({', '.join(args)}))"
+        elif self.stackless and not direct:
+            return f"(yield ({callee}, ({''.join(arg + ', ' for arg in args)})))"
+        return f"{callee}({', '.join(args)})"
+
+    def is_leaf(self, decl: Any) -> bool:
+        """Returns whether a declaration is a function making no calls, so that it is translated
+        to a plain function even stackless."""
+        if not isinstance(decl, FunctionDeclNode) or decl.scope is None:
+            return False
+        infer_types(decl)
+        for node in walk(decl.scope):
+            if isinstance(node, IndirectCallExprNode):
+                return False
+            elif isinstance(node, BinaryExprNode) and find_operator(
+                    unalias(node.left.type), node.operator[:-1] if node.is_inplace else node.operator):
+                return False
+            elif isinstance(node, DirectCallExprNode):
+                callee: NameExprNode = node.funcnameexpr
+                if not isinstance(callee, (ClassNameExprNode, StructNameExprNode)) and not isinstance(
+                        decl.scope.get_name(callee.name), (ClassTyclNode, StructureTyclNode)):
+                    return False
+        return True
+
+    def _expr_IndexExprNode(self, expr: IndexExprNode) -> str:
+        return f"{self.expression(expr.baseexpr)}[{self.value(expr.indexexpr)}]"
+
+    def _expr_MemberExprNode(self, expr: MemberExprNode) -> str:
+        code: Optional[int] = self.constant(expr)
+        if code is not None:
+            return repr(code)
+        return f"{self.expression(expr.baseexpr)}.{expr.memberexpr.name}"
+
+    def _expr_AggregateExprNode(self, expr: AggregateExprNode) -> str:
+        return f"({''.join(self.element(item) + ', ' for item in expr.exprlist)})"
+
+    def element(self, item: ExprNode) -> str:
+        """Returns the Python expression of an element of an aggregate, which an unpacked operand
+        spreads its own elements into."""
+        if isinstance(item, UnpackUnaryExprNode):
+            return f"*{self.expression(item.operand)}"
+        return self.expression(item)
+
+    def _expr_UnpackUnaryExprNode(self, expr: UnpackUnaryExprNode) -> str:
+        raise TranslationError("Unpacking outside of an aggregate")
+
+    # endregion (expressions)
+
+
+class CompiledMethod:
+    """A method of the host class of instances, translated the first time it is looked up."""
+
+    def __init__(self, decl: MethodDeclNode, namespace: Dict[str, Any], owner: type, asynchronous: bool = False,
+                 stackless: bool = False):
+        self.decl: MethodDeclNode = decl
+        self.namespace: Dict[str, Any] = namespace
+        self.owner: type = owner
+        self.asynchronous: bool = asynchronous
+        self.stackless: bool = stackless
+
+    def __get__(self, instance: Any, owner: type) -> Callable:
+        function: Callable = instantiate(self.decl, self.namespace, self.asynchronous, self.stackless)
+        # replaces the descriptor, so later lookups find the plain function
+        setattr(self.owner, self.decl.name, function)
+        return function if instance is None else function.__get__(instance, owner)
+
+
+class TieredFunction:
+    """A Brah function that runs in the interpreter until it gets hot, then runs compiled.
+
+    :ivar decl: the function declaration
+    :ivar namespace: the module globals the compiled version runs with
+    :ivar interpret: the interpreter entry point, called with the declaration and the arguments
+    :ivar threshold: the count of calls and back-edges that triggers the translation
+    :ivar counter: the calls and back-edges counted so far
+    :ivar compiled: the compiled version, once translated
+    """
+
+    def __init__(self, decl: FunctionDeclNode, namespace: Dict[str, Any],
+                 interpret: Optional[Callable[[DeclNode, tuple], Any]] = None, threshold: int = DEFAULT_THRESHOLD):
+        self.decl: FunctionDeclNode = decl
+        self.namespace: Dict[str, Any] = namespace
+        self.interpret: Optional[Callable[[DeclNode, tuple], Any]] = interpret
+        self.threshold: int = threshold
+        self.counter: int = 0
+        self.compiled: Optional[Callable] = None
+        self.translatable: bool = True
+
+    def __repr__(self):
+        return f"{self.__class__.__qualname__}({self.decl.name!r}, compiled={self.compiled is not None})"
+
+    def __call__(self, *args: Any) -> Any:
+        if self.compiled is not None:
+            return self.compiled(*args)
+        self.counter += 1
+        if self.interpret is None or (self.counter >= self.threshold and self.translatable):
+            if self.promote():
+                return self.compiled(*args)
+        return self.interpret(self.decl, args)
+
+    def backedge(self, count: int = 1) -> None:
+        """Called by the interpreter on loop back-edges. The translation happens on the next call."""
+        self.counter += count
+
+    def promote(self) -> bool:
+        """Translates the function and swaps the compiled version in, returning whether it succeeded."""
+        try:
+            self.compiled = instantiate(self.decl, self.namespace)
+        except TranslationError:
+            self.translatable = False
+            if self.interpret is None:
+                raise
+            return False
+        key: str = GLOBAL_PREFIX + self.decl.name
+        if self.namespace.get(key) is self:
+            self.namespace[key] = self.compiled
+        return True
+
+
+# endregion (classes)
+# ---------------------------------------------------------
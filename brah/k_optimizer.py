@@ -0,0 +1,769 @@
+"""Optimizer
+
+AST to AST passes run over a resolved assembly before compilation and caching.
+"""
+from dataclasses import dataclass, field
+from typing import Optional, Any, Union, List, Dict, Set, Tuple, Iterable, Iterator, Callable
+
+from brah.c_astnodes import *
+from brah.o_traversal import child_slots, clone_expr, get_slot, iter_children, set_slot, walk
+from brah.p_types import same_integer, unalias
+
+
+__all__ = [
+    # functions
+    'eliminate_dead_code',
+    'find_entry_points',
+    'find_scoped_allocations',
+    'find_tail_calls',
+    'find_tail_group',
+    'optimize_loops',
+    'prune_unreachable',
+
+    # classes
+    'DeadCodeReport',
+    'DefUse',
+    'LoopReport',
+]
+
+# ---------------------------------------------------------
+# region CONSTANTS & ENUMS
+
+
+ENTRY_POINT: str = 'principal'
+"""Name of the function a program starts from."""
+
+_JUMPS = (ReturnStmtNode, BreakStmtNode, ContinueStmtNode, RaiseStmtNode)
+
+_LOOPS = (ForStmtNode, WhileStmtNode, DoWhileStmtNode, DoUntilStmtNode)
+_CALLS = (DirectCallExprNode, IndirectCallExprNode)
+_COMPARISONS = ('<', '<=', '==', '!=', '>=', '>', 'e', 'ou')
+
+# a return inside these does not leave the function straight away: loops and switches
+# are Python loops once translated, and a try may catch what the callee raises
+_NO_TAIL_CALLS = (WhileStmtNode, DoWhileStmtNode, DoUntilStmtNode, RepeatStmtNode, ForStmtNode, ForEachStmtNode,
+                  SwitchStmtNode, TryStmtNode, ExprNode)
+
+INVARIANT_PREFIX: str = '_inv'
+INDUCTION_PREFIX: str = '_ind'
+
+# endregion (constants)
+# ---------------------------------------------------------
+# region FUNCTIONS
+
+
+def _terminates(stmt: StmtNode) -> bool:
+    """Returns whether control never reaches the statement following this one."""
+    if isinstance(stmt, _JUMPS):
+        return True
+    elif isinstance(stmt, IfElseStmtNode):
+        # a branch may still hold the statements following its own jump, which are pruned later
+        return (any(_terminates(inner) for inner in stmt.thenscope.statements)
+                and any(_terminates(inner) for inner in stmt.elsescope.statements))
+    return False
+
+
+def prune_unreachable(scope: BasicScopeNode) -> int:
+    """Removes the statements following unconditional jumps in the scope and its inner scopes.
+
+    Returns the number of statements removed.
+    """
+    removed: int = 0
+    stack: List[ASTNode] = [scope]
+    while stack:
+        node: ASTNode = stack.pop()
+        if isinstance(node, BasicScopeNode):
+            for i, stmt in enumerate(node.statements):
+                if _terminates(stmt):
+                    removed += len(node.statements) - i - 1
+                    del node.statements[i + 1:]
+                    break
+        if isinstance(node, (BasicScopeNode, StmtNode)):
+            stack.extend(child for child in iter_children(node) if isinstance(child, (BasicScopeNode, StmtNode)))
+    return removed
+
+
+def find_entry_points(asmb: AsmbNode, names: Iterable[str] = (ENTRY_POINT,)) -> List[FunctionDeclNode]:
+    """Returns the module level functions of the assembly with the given names."""
+    wanted: Set[str] = set(names)
+    return [
+        decl
+        for module in asmb.modules.values() if module.scope
+        for name, decl in module.scope.declarations.items()
+        if name in wanted and isinstance(decl, FunctionDeclNode)
+    ]
+
+
+def eliminate_dead_code(asmb: AsmbNode, entry_points: Iterable[Union[FunctionDeclNode, MethodDeclNode]],
+                        keep_exports: bool = False) -> 'DeadCodeReport':
+    """Removes from the assembly what cannot be reached from the entry points.
+
+    Names are matched by name only, across all modules, which errs on the side of
+    keeping declarations: functions and constants never named by reachable code,
+    methods whose name is never used as a member of reachable code, and
+    statements after unconditional jumps are removed.
+    """
+    report = DeadCodeReport()
+    analysis = _Reachability(asmb)
+    for decl in entry_points:
+        analysis.reach(decl)
+    if keep_exports:
+        for decls in analysis.globals.values():
+            for decl in decls:
+                if getattr(decl, 'exports', False):
+                    analysis.reach(decl)
+    analysis.run()
+
+    for module in asmb.modules.values():
+        if module.scope is None:
+            continue
+        declarations: Dict[str, DeclNode] = module.scope.declarations
+        for name, decl in list(declarations.items()):
+            if decl in analysis.reached:
+                continue
+            if isinstance(decl, FunctionDeclNode):
+                report.functions.append(decl)
+                del declarations[name]
+            elif isinstance(decl, ConstDeclNode):
+                report.constants.append(decl)
+                del declarations[name]
+
+    for tycl in analysis.classes:
+        for name, method in list(tycl.methods.items()):
+            if method not in analysis.reached:
+                report.methods.append(method)
+                del tycl.methods[name]
+                del tycl.members[name]
+
+    report.statements = analysis.pruned
+    return report
+
+
+def optimize_loops(decl: Union[FunctionDeclNode, MethodDeclNode]) -> 'LoopReport':
+    """Hoists loop invariant computations and strength-reduces induction variable products.
+
+    Inner loops are optimized first, so what they hoist can be hoisted again by the
+    loops around them.
+    """
+    optimizer = _LoopOptimizer(decl)
+    if decl.scope is not None:
+        optimizer.scope(decl.scope)
+    if optimizer.report.hoisted or optimizer.report.reduced:
+        decl.revision += 1
+    return optimizer.report
+
+
+def find_scoped_allocations(decl: Union[FunctionDeclNode, MethodDeclNode],
+                            is_allocation: Callable[[ExprNode], bool]) -> Set[ExprNode]:
+    """Returns the allocations of a function whose instances cannot outlive its call.
+
+    An allocation qualifies when it is stored straight into a local variable that
+    is only ever used to read or write fields of the instance. Returning the
+    variable, passing it as an argument (methods included, as ``this``), storing
+    it anywhere or using it in any other expression lets the instance escape.
+    """
+    sites: Dict[str, List[ExprNode]] = {}
+    escaped: Set[str] = set()
+    if decl.scope is None:
+        return set()
+
+    stack: List[Tuple[ASTNode, Optional[ASTNode]]] = [(decl.scope, None)]
+    while stack:
+        node, parent = stack.pop()
+        if isinstance(node, (AssignmentStmtNode, VarDeclNode)):
+            if isinstance(node, AssignmentStmtNode):
+                target: ExprNode = node.exprlvalue.exprtarget
+                value: Optional[ExprNode] = node.exprvalue
+            else:
+                target, value = VarNameExprNode(node.location, node.name), node.value
+            if isinstance(target, VarNameExprNode) and value is not None and is_allocation(value):
+                sites.setdefault(target.name, []).append(value)
+                stack.extend((child, value) for child in iter_children(value))
+                continue
+        elif isinstance(node, VarNameExprNode):
+            used_as_base: bool = isinstance(parent, MemberExprNode) and parent.baseexpr is node
+            if not used_as_base and not isinstance(parent, LValueExprNode):
+                escaped.add(node.name)
+        elif isinstance(node, _CALLS):
+            # a member used as the callee passes its base as 'this'
+            callee: ExprNode = node.callableexpr if isinstance(node, IndirectCallExprNode) else node.funcnameexpr
+            if isinstance(callee, MemberExprNode) and isinstance(callee.baseexpr, VarNameExprNode):
+                escaped.add(callee.baseexpr.name)
+        stack.extend((child, node) for child in iter_children(node))
+
+    return {site for name, allocations in sites.items() if name not in escaped for site in allocations}
+
+
+def find_tail_calls(decl: FunctionDeclNode) -> Dict[ReturnStmtNode, FunctionDeclNode]:
+    """Returns the return statements of a function whose value is a call to a module level
+    function, with the function called, when the call can replace the caller's frame.
+
+    The return must leave the function straight away: it is not inside a loop, a
+    switch or a try. The callee must take the arguments given, filling in the rest
+    from defaults, and return a value that needs no conversion to the caller's result type.
+    """
+    scope: Optional[ScopeNode] = decl.scope
+    if scope is None:
+        return {}
+    restype = unalias(decl.type)
+    calls: Dict[ReturnStmtNode, FunctionDeclNode] = {}
+    for node in walk(scope, prune=lambda node: isinstance(node, _NO_TAIL_CALLS)):
+        if not isinstance(node, ReturnStmtNode) or not isinstance(node.valueexpr, DirectCallExprNode):
+            continue
+        call: DirectCallExprNode = node.valueexpr
+        callee: ExprNode = call.funcnameexpr
+        if not isinstance(callee, NameExprNode) or isinstance(callee, (ClassNameExprNode, StructNameExprNode)):
+            continue
+        target: Any = scope.get_name(callee.name)
+        if not isinstance(target, FunctionDeclNode) or target.scope is None or len(call.arglist) > len(target.params):
+            continue
+        if not all(param.has_default for param in list(target.params.values())[len(call.arglist):]):
+            continue
+        if isinstance(restype, IntegerTypeNode) and not same_integer(unalias(target.type), restype):
+            continue
+        calls[node] = target
+    return calls
+
+
+def find_tail_group(decl: FunctionDeclNode) -> List[FunctionDeclNode]:
+    """Returns the functions that reach the given one and are reached from it through tail calls,
+    in module order: the given function alone if it only tail calls itself, nothing if it
+    never gets back to itself through tail calls."""
+    calls: Dict[FunctionDeclNode, Set[FunctionDeclNode]] = {}
+
+    def reachable(start: FunctionDeclNode) -> Set[FunctionDeclNode]:
+        seen: Set[FunctionDeclNode] = set()
+        stack: List[FunctionDeclNode] = [start]
+        while stack:
+            current: FunctionDeclNode = stack.pop()
+            if current not in calls:
+                calls[current] = set(find_tail_calls(current).values())
+            for target in calls[current]:
+                if target not in seen:
+                    seen.add(target)
+                    stack.append(target)
+        return seen
+
+    if decl not in reachable(decl):
+        return []
+    group: List[FunctionDeclNode] = [target for target in reachable(decl) if decl in reachable(target)]
+    module: Optional[ScopeNode] = decl.scope.basescope
+    order: List[Any] = list(module.declarations.values()) if module is not None else []
+    group.sort(key=lambda target: (order.index(target) if target in order else len(order), target.name))
+    return group
+
+
+def _assigned_target(stmt: ASTNode) -> Optional[ExprNode]:
+    """Returns the expression written by an assignment, in-place operation, increment or decrement."""
+    if isinstance(stmt, AssignmentStmtNode):
+        target: ExprNode = stmt.exprlvalue
+    elif isinstance(stmt, BinaryExprNode) and stmt.is_inplace:
+        target = stmt.left
+    elif isinstance(stmt, (IncrUnaryExprNode, DecrUnaryExprNode)):
+        target = stmt.operand
+    else:
+        return None
+    return target.exprtarget if isinstance(target, LValueExprNode) else target
+
+
+def _assigned_targets(stmt: ASTNode) -> List[ExprNode]:
+    """Returns the expressions written by a node: those of an unpacking, or the one ``_assigned_target`` finds."""
+    if isinstance(stmt, UnpackStmtNode):
+        return [target.exprtarget if isinstance(target, LValueExprNode) else target
+                for target in stmt.exprlvalues if target is not None]
+    target: Optional[ExprNode] = _assigned_target(stmt)
+    return [target] if target is not None else []
+
+
+def _may_raise(expr: ExprNode) -> bool:
+    """Returns whether evaluating the expression itself (not its operands) may raise."""
+    if isinstance(expr, (MemberExprNode, IndexExprNode)):
+        return True
+    elif isinstance(expr, BinaryExprNode):
+        if expr.operator in ('/', '%'):
+            return True
+        if expr.operator in ('<<', '>>'):
+            return not (isinstance(expr.right, LiteralExprNode) and expr.right.value >= 0)
+    return False
+
+
+def _signature(expr: ExprNode) -> str:
+    """Returns a key equal for structurally equal expressions."""
+    parts: List[str] = [expr.__class__.__name__]
+    for attr in ('name', 'operator', 'value'):
+        if hasattr(expr, attr):
+            parts.append(repr(getattr(expr, attr)))
+    parts.extend(_signature(child) for child in iter_children(expr))
+    return f"({' '.join(parts)})"
+
+# endregion (functions)
+# ---------------------------------------------------------
+# region CLASSES
+
+
+@dataclass
+class DeadCodeReport:
+    """What eliminate_dead_code removed."""
+
+    functions: List[FunctionDeclNode] = field(default_factory=list)
+    constants: List[ConstDeclNode] = field(default_factory=list)
+    methods: List[MethodDeclNode] = field(default_factory=list)
+    statements: int = 0
+    """Number of statements removed after unconditional jumps."""
+
+
+class _Reachability:
+    """Fixed point computation of the declarations reachable from a set of roots."""
+
+    def __init__(self, asmb: AsmbNode):
+        self.globals: Dict[str, List[Union[DeclNode, TyclNode, TypeNode]]] = {}
+        for module in asmb.modules.values():
+            if module.scope is None:
+                continue
+            for name, decl in module.scope.declarations.items():
+                self.globals.setdefault(name, []).append(decl)
+
+        self.reached: Set[ASTNode] = set()
+        self.classes: List[TyclNode] = []
+        self.members: Set[str] = set()
+        self.pruned: int = 0
+        self._pending: List[ASTNode] = []
+
+    def reach(self, decl: ASTNode) -> None:
+        if decl not in self.reached:
+            self.reached.add(decl)
+            self._pending.append(decl)
+
+    def reach_name(self, name: Optional[str]) -> None:
+        for decl in self.globals.get(name, ()):
+            self.reach(decl)
+
+    def reach_type(self, typenode: Union[TypeNode, TyclNode, None]) -> None:
+        while typenode is not None:
+            if isinstance(typenode, TyclNode):
+                self.reach(typenode)
+            else:
+                self.reach_name(typenode.name)
+            typenode = getattr(typenode, 'basetype', None)
+
+    def reach_member(self, name: str) -> None:
+        if name in self.members:
+            return
+        self.members.add(name)
+        for tycl in self.classes:
+            if name in tycl.methods:
+                self.reach(tycl.methods[name])
+
+    def run(self) -> None:
+        while self._pending:
+            node: ASTNode = self._pending.pop()
+            if isinstance(node, TyclNode):
+                self._visit_tycl(node)
+                continue
+            if isinstance(node, DeclNode):
+                self.reach_type(node.type)
+            if isinstance(node, (FunctionDeclNode, MethodDeclNode)) and node.scope is not None:
+                # dead statements must not make what they reference reachable
+                pruned: int = prune_unreachable(node.scope)
+                if pruned:
+                    node.revision += 1
+                    self.pruned += pruned
+            if isinstance(node, (DeclNode, ScopeNode, StmtNode, ExprNode)):
+                self._walk(node)
+
+    def _visit_tycl(self, tycl: TyclNode) -> None:
+        self.classes.append(tycl)
+        self.reach_type(getattr(tycl, 'baseclass', None))
+        # fields and properties are walked with the class; methods only once named
+        for member in (*tycl.fields.values(), *tycl.properties.values()):
+            self._walk(member)
+        for operator in tycl.operators.values():
+            self.reach(operator)
+        for name, method in tycl.methods.items():
+            if name in self.members:
+                self.reach(method)
+
+    def _walk(self, root: ASTNode) -> None:
+        # the member named by a member expression is not a name of its own
+        members: Set[int] = set()
+        for node in walk(root, prune=lambda node: id(node) in members):
+            if id(node) in members:
+                continue
+            if isinstance(node, MemberExprNode):
+                self.reach_member(node.memberexpr.name)
+                members.add(id(node.memberexpr))
+            elif isinstance(node, (FieldNameExprNode, PropertyNameExprNode)):
+                self.reach_member(node.name)
+            elif isinstance(node, NameExprNode):
+                # a bare name inside a method may also be a method of the same class
+                self.reach_name(node.name)
+                self.reach_member(node.name)
+            elif isinstance(node, DeclNode):
+                self.reach_type(node.type)
+
+
+@dataclass
+class LoopReport:
+    """What optimize_loops changed."""
+
+    hoisted: int = 0
+    """Number of invariant expressions moved out of loops."""
+
+    reduced: int = 0
+    """Number of induction variable multiplications replaced by additions."""
+
+
+class DefUse:
+    """Names written by a piece of code, and whether it calls or writes through fields and indexes.
+
+    :ivar defs: number of definitions of each local name
+    :ivar calls: whether the code calls anything
+    :ivar writes_memory: whether the code assigns to fields, indexes or dereferences
+    :ivar has_try: whether the code has try statements
+    """
+
+    def __init__(self, *roots: ASTNode):
+        self.defs: Dict[str, int] = {}
+        self.calls: bool = False
+        self.writes_memory: bool = False
+        self.has_try: bool = False
+        for root in roots:
+            self.add(root)
+
+    def define(self, name: str) -> None:
+        self.defs[name] = self.defs.get(name, 0) + 1
+
+    def add(self, root: ASTNode) -> None:
+        for node in walk(root):
+            targets: List[ExprNode] = _assigned_targets(node)
+            for target in targets:
+                if isinstance(target, NameExprNode):
+                    self.define(target.name)
+                    if isinstance(target, (FieldNameExprNode, PropertyNameExprNode)):
+                        self.writes_memory = True
+                else:
+                    self.writes_memory = True
+            if targets:
+                continue
+            if isinstance(node, (VarDeclNode, ParamDeclNode)):
+                self.define(node.name)
+            elif isinstance(node, _CALLS):
+                self.calls = True
+            elif isinstance(node, TryStmtNode):
+                self.has_try = True
+
+    def is_invariant(self, expr: ExprNode) -> bool:
+        """Returns whether the expression has the same value on every iteration and no side effects."""
+        if isinstance(expr, LiteralExprNode):
+            return True
+        elif isinstance(expr, PropertyNameExprNode):
+            return False
+        elif isinstance(expr, FieldNameExprNode):
+            return not self.calls and not self.writes_memory and expr.name not in self.defs
+        elif isinstance(expr, NameExprNode):
+            return expr.name not in self.defs
+        elif isinstance(expr, BinaryExprNode):
+            return not expr.is_inplace and self.is_invariant(expr.left) and self.is_invariant(expr.right)
+        elif isinstance(expr, NegateUnaryExprNode):
+            return self.is_invariant(expr.operand)
+        elif isinstance(expr, TernaryExprNode):
+            return all(self.is_invariant(child) for child in (expr.condition, expr.thenexpr, expr.elseexpr))
+        elif isinstance(expr, MemberExprNode):
+            return (not self.calls and not self.writes_memory and not isinstance(expr.memberexpr, PropertyNameExprNode)
+                    and self.is_invariant(expr.baseexpr))
+        elif isinstance(expr, IndexExprNode):
+            return (not self.calls and not self.writes_memory
+                    and self.is_invariant(expr.baseexpr) and self.is_invariant(expr.indexexpr))
+        return False
+
+
+class _LoopOptimizer:
+    """Loop invariant code motion and strength reduction over one function or method."""
+
+    def __init__(self, decl: Union[FunctionDeclNode, MethodDeclNode]):
+        self.decl: Union[FunctionDeclNode, MethodDeclNode] = decl
+        self.report: LoopReport = LoopReport()
+        self.function: DefUse = DefUse(decl.scope) if decl.scope is not None else DefUse()
+
+        # declared type of the locals, None when a name is declared with different types
+        self.types: Dict[str, Optional[Union[TypeNode, TyclNode]]] = {}
+        for param in decl.params.values():
+            self.types[param.name] = param.type
+        for node in self._declarations(decl.scope):
+            previous = self.types.setdefault(node.name, node.type)
+            if previous is not node.type:
+                self.types[node.name] = None
+        self._count: int = 0
+
+    @staticmethod
+    def _declarations(root: Optional[ASTNode]) -> Iterator[VarDeclNode]:
+        if root is not None:
+            yield from (node for node in walk(root) if isinstance(node, VarDeclNode))
+
+    def type_of(self, expr: ExprNode) -> Optional[Union[TypeNode, TyclNode]]:
+        if isinstance(expr, LiteralExprNode):
+            return expr.type
+        elif isinstance(expr, FieldNameExprNode) and isinstance(self.decl, MethodDeclNode):
+            fielddecl: Optional[FieldDeclNode] = self.decl.thisdecl.fields.get(expr.name)
+            return fielddecl.type if fielddecl else None
+        elif isinstance(expr, NameExprNode):
+            return self.types.get(expr.name)
+        elif isinstance(expr, MemberExprNode):
+            basetype = self.type_of(expr.baseexpr)
+            if isinstance(basetype, TyclNode) and expr.memberexpr.name in basetype.fields:
+                return basetype.fields[expr.memberexpr.name].type
+        elif isinstance(expr, IndexExprNode):
+            basetype = self.type_of(expr.baseexpr)
+            if isinstance(basetype, ArrayTypeNode):
+                return basetype.basetype
+            elif isinstance(basetype, StringTypeNode):
+                return basetype
+        elif isinstance(expr, BinaryExprNode) and expr.operator not in _COMPARISONS:
+            left = self.type_of(expr.left)
+            right = self.type_of(expr.right)
+            if left is right or right is None or left is None:
+                return left if left is right else None
+            if isinstance(left, FloatTypeNode) or isinstance(right, FloatTypeNode):
+                floats = [t for t in (left, right) if isinstance(t, FloatTypeNode)]
+                return max(floats, key=lambda t: t.bytesize)
+            if isinstance(left, IntegerTypeNode) and isinstance(right, IntegerTypeNode):
+                return right if right.bytesize > left.bytesize else left
+        return None
+
+    def temp(self, prefix: str, location: int, typenode: Union[TypeNode, TyclNode],
+             scope: ScopeNode) -> VarDeclNode:
+        name: str = f"{prefix}{self._count}"
+        self._count += 1
+        decl = VarDeclNode(location, len(scope.declarations), name, typenode)
+        self.types[name] = typenode
+        return decl
+
+    # region traversal
+
+    def scope(self, scope: BasicScopeNode) -> None:
+        i: int = 0
+        while i < len(scope.statements):
+            stmt: StmtNode = scope.statements[i]
+            for inner in self._inner_scopes(stmt):
+                self.scope(inner)
+            if isinstance(stmt, _LOOPS):
+                i += self.loop(scope, i, stmt)
+            i += 1
+
+    @staticmethod
+    def _inner_scopes(stmt: StmtNode) -> Iterator[BasicScopeNode]:
+        for child in iter_children(stmt):
+            if isinstance(child, BasicScopeNode):
+                yield child
+            elif isinstance(child, StmtNode):
+                yield from _LoopOptimizer._inner_scopes(child)
+
+    # endregion (traversal)
+
+    def loop(self, parent: BasicScopeNode, index: int, loop: StmtNode) -> int:
+        """Optimizes the loop at parent.statements[index], returning the number of statements inserted before it."""
+        if isinstance(loop, ForStmtNode):
+            self.reduce(loop)
+        defuse = DefUse(loop)
+        hoists: Dict[str, Tuple[VarDeclNode, ExprNode]] = {}
+
+        # expressions that may raise are only hoisted when evaluating them earlier cannot be observed
+        speculate: bool = not defuse.calls and not defuse.writes_memory and not self.function.has_try
+        guard: Optional[ExprNode] = None
+        if isinstance(loop, WhileStmtNode):
+            if speculate and self._pure(loop.condexpr):
+                guard = clone_expr(loop.condexpr)
+            # the condition is evaluated before anything else, so it may always lose what can raise
+            self._hoist_in(loop, 'condexpr', defuse, hoists, parent, speculate)
+            self._hoist_body(loop.scope, defuse, hoists, parent, guard is not None)
+        elif isinstance(loop, ForStmtNode):
+            for i in range(len(loop.stopexprs)):
+                self._hoist_in(loop.stopexprs, i, defuse, hoists, parent, False)
+            self._hoist_body(loop.scope, defuse, hoists, parent, False)
+            for stepstmt in loop.stepstmts:
+                self._hoist_tree(stepstmt, defuse, hoists, parent)
+        else:
+            self._hoist_body(loop.scope, defuse, hoists, parent, speculate)
+            self._hoist_in(loop, 'condexpr', defuse, hoists, parent, False)
+        if not hoists:
+            return 0
+
+        assignments: List[StmtNode] = []
+        for decl, expr in hoists.values():
+            parent.declarations[decl.name] = decl
+            target = LValueExprNode(expr.location, VarNameExprNode(expr.location, decl.name))
+            assignments.append(AssignmentStmtNode(expr.location, target, expr))
+        self.report.hoisted += len(hoists)
+
+        if guard is not None and any(self._raises_within(expr) for _, expr in hoists.values()):
+            # the loop may not run at all: 'se (cond) { hoisted; enquanto (cond) {...} }'
+            guarded = BasicScopeNode(loop.location, parent)
+            guarded.statements = assignments + [loop]
+            loop.scope.basescope = guarded
+            parent.statements[index] = IfThenStmtNode(loop.location, guard, guarded)
+            return 0
+        parent.statements[index:index] = assignments
+        return len(assignments)
+
+    @staticmethod
+    def _pure(expr: ExprNode) -> bool:
+        for node in walk(expr):
+            if isinstance(node, _CALLS + (IncrUnaryExprNode, DecrUnaryExprNode, PropertyNameExprNode)):
+                return False
+            if isinstance(node, BinaryExprNode) and node.is_inplace:
+                return False
+        return True
+
+    def _hoist_body(self, body: BasicScopeNode, defuse: DefUse, hoists: Dict[str, Tuple[VarDeclNode, ExprNode]],
+                    parent: BasicScopeNode, speculate: bool) -> None:
+        """Hoists from the statements of a loop body. Only the statements before the first one
+        that may jump run on every iteration, so only they may lose expressions that can raise."""
+        certain: bool = speculate
+        for stmt in body.statements:
+            if certain and not isinstance(stmt, (AssignmentStmtNode, ExpressionStmtNode)):
+                certain = False
+            if certain:
+                self._hoist_tree(stmt, defuse, hoists, parent, True)
+            else:
+                self._hoist_tree(stmt, defuse, hoists, parent)
+
+    def _hoist_tree(self, root: ASTNode, defuse: DefUse, hoists: Dict[str, Tuple[VarDeclNode, ExprNode]],
+                    parent: BasicScopeNode, certain: bool = False) -> None:
+        stack: List[Tuple[ASTNode, bool]] = [(root, certain)]
+        while stack:
+            node, certain = stack.pop()
+            if isinstance(node, (LValueExprNode, IncrUnaryExprNode, DecrUnaryExprNode)):
+                continue
+            if isinstance(node, TernaryExprNode):
+                self._hoist_in(node, 'condition', defuse, hoists, parent, certain)
+                self._hoist_in(node, 'thenexpr', defuse, hoists, parent, False)
+                self._hoist_in(node, 'elseexpr', defuse, hoists, parent, False)
+                continue
+            if isinstance(node, BinaryExprNode) and node.operator in ('e', 'ou'):
+                self._hoist_in(node, 'left', defuse, hoists, parent, certain)
+                self._hoist_in(node, 'right', defuse, hoists, parent, False)
+                continue
+            for holder, key in list(child_slots(node)):
+                child: ASTNode = get_slot(holder, key)
+                if isinstance(child, ExprNode) and not (isinstance(node, BinaryExprNode) and node.is_inplace
+                                                       and key == 'left'):
+                    self._hoist_in(holder, key, defuse, hoists, parent, certain)
+                elif isinstance(child, StmtNode) or isinstance(child, BasicScopeNode):
+                    stack.append((child, certain and isinstance(node, ExpressionStmtNode)))
+
+    def _hoist_in(self, holder: Any, key: Any, defuse: DefUse, hoists: Dict[str, Tuple[VarDeclNode, ExprNode]],
+                  parent: BasicScopeNode, certain: bool) -> None:
+        """Replaces the expression in the slot by a temporary when it is invariant, or looks inside it."""
+        expr: ASTNode = get_slot(holder, key)
+        if not isinstance(expr, ExprNode):
+            return
+        if (isinstance(expr, (BinaryExprNode, MemberExprNode, IndexExprNode)) and defuse.is_invariant(expr)
+                and (certain or not self._raises_within(expr))):
+            typenode = self.type_of(expr)
+            if typenode is not None:
+                signature: str = _signature(expr)
+                if signature not in hoists:
+                    hoists[signature] = (self.temp(INVARIANT_PREFIX, expr.location, typenode, parent), expr)
+                decl: VarDeclNode = hoists[signature][0]
+                set_slot(holder, key, VarNameExprNode(expr.location, decl.name))
+                return
+        self._hoist_tree(expr, defuse, hoists, parent, certain)
+
+    @staticmethod
+    def _raises_within(expr: ExprNode) -> bool:
+        return any(isinstance(node, ExprNode) and _may_raise(node) for node in walk(expr))
+
+    # region strength reduction
+
+    def reduce(self, loop: ForStmtNode) -> None:
+        """Replaces ``i * k`` by a variable stepped along with the induction variable ``i``.
+
+        The factor must not change anywhere in the loop: the start declarations and the
+        steps count too, so another induction variable is never taken for invariant.
+        """
+        body = DefUse(loop.scope)
+        whole = DefUse(loop)
+        for startdecl in list(loop.startdecls):
+            name: str = startdecl.name
+            typenode = self.types.get(name)
+            stride: Optional[int] = self._stride(loop, name)
+            if stride is None or name in body.defs or not isinstance(typenode, IntegerTypeNode):
+                continue
+            reduced: Dict[str, VarDeclNode] = {}
+            for holder, key, factor in self._products(loop.scope, name, whole):
+                product: ExprNode = get_slot(holder, key)
+                typenode = self.type_of(product)
+                if not isinstance(typenode, IntegerTypeNode):
+                    continue
+                signature: str = _signature(factor)
+                decl: Optional[VarDeclNode] = reduced.get(signature)
+                if decl is None:
+                    decl = reduced[signature] = self._induction(loop, startdecl, factor, stride, typenode)
+                set_slot(holder, key, VarNameExprNode(product.location, decl.name))
+                self.report.reduced += 1
+
+    def _induction(self, loop: ForStmtNode, startdecl: VarDeclNode, factor: ExprNode, stride: int,
+                   typenode: IntegerTypeNode) -> VarDeclNode:
+        location: int = factor.location
+        start = MultBinaryExprNode(location, VarNameExprNode(location, startdecl.name), clone_expr(factor), '*')
+        decl: VarDeclNode = self.temp(INDUCTION_PREFIX, location, typenode, loop.scope)
+        decl.value = start
+        loop.startdecls.insert(loop.startdecls.index(startdecl) + 1, decl)
+        if isinstance(factor, LiteralExprNode):
+            step: ExprNode = LiteralExprNode(location, stride * factor.value, typenode)
+        elif stride == 1:
+            step = clone_expr(factor)
+        else:
+            step = MultBinaryExprNode(location, LiteralExprNode(location, stride, typenode),
+                                      clone_expr(factor), '*')
+        target = VarNameExprNode(location, decl.name)
+        loop.stepstmts.append(ExpressionStmtNode(location, AddBinaryExprNode(location, target, step, '+=', True)))
+        return decl
+
+    @staticmethod
+    def _stride(loop: ForStmtNode, name: str) -> Optional[int]:
+        """Returns the constant the steps of the loop add to the variable, if that is all they do to it."""
+        stride: Optional[int] = None
+        for stepstmt in loop.stepstmts:
+            expr: ExprNode = stepstmt.expr if isinstance(stepstmt, ExpressionStmtNode) else stepstmt
+            target: Optional[ExprNode] = _assigned_target(expr)
+            if not isinstance(target, NameExprNode) or target.name != name:
+                if name in DefUse(stepstmt).defs:
+                    return None
+                continue
+            if stride is not None:
+                return None
+            if isinstance(expr, IncrUnaryExprNode):
+                stride = 1
+            elif isinstance(expr, DecrUnaryExprNode):
+                stride = -1
+            elif (isinstance(expr, BinaryExprNode) and expr.operator in ('+=', '-=', '+', '-')
+                  and isinstance(expr.right, LiteralExprNode) and isinstance(expr.right.value, int)):
+                stride = expr.right.value if expr.operator[0] == '+' else -expr.right.value
+            else:
+                return None
+        return stride
+
+    def _products(self, root: ASTNode, name: str, body: DefUse) -> Iterator[Tuple[Any, Any, ExprNode]]:
+        """Yields the slots holding ``name * factor`` or ``factor * name`` with an invariant integer factor."""
+        for holder, key in list(child_slots(root)):
+            child: ASTNode = get_slot(holder, key)
+            if isinstance(child, LValueExprNode):
+                continue
+            if isinstance(child, MultBinaryExprNode) and child.operator == '*' and not child.is_inplace:
+                for this, factor in ((child.left, child.right), (child.right, child.left)):
+                    if (isinstance(this, NameExprNode) and this.name == name and body.is_invariant(factor)
+                            and not self._raises_within(factor)
+                            and isinstance(self.type_of(factor), IntegerTypeNode)):
+                        yield holder, key, factor
+                        break
+                else:
+                    yield from self._products(child, name, body)
+            else:
+                yield from self._products(child, name, body)
+
+    # endregion (strength reduction)
+
+
+# endregion (classes)
+# ---------------------------------------------------------
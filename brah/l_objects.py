@@ -0,0 +1,202 @@
+"""Objects
+
+Run time representation of class and structure instances.
+
+Each ``ClassTyclNode`` or ``StructureTyclNode`` gets a host class whose
+``__slots__`` follow the declaration order of its fields (``FieldDeclNode``
+offsets), base class fields first. Instances are requested from the
+``InstancePool`` of their class, which reuses the instances given back to it
+before creating new ones.
+
+Instances the compiler proves do not outlive the call that creates them are
+allocated through an ``Arena`` instead: the call gives all of them back to their
+pools when it returns.
+
+Operators overloaded by classes and structures are dispatched through an
+``OperatorTable``, keyed by the operator and the host classes of both operands.
+"""
+from typing import Optional, Any, Union, List, Dict, Tuple, Callable
+
+from brah.c_astnodes import *
+from brah.g_profiler import AllocStats
+
+
+__all__ = [
+    # constants
+    'DEFAULT_POOL_CAPACITY',
+
+    # functions
+    'field_layout',
+    'zero_value',
+
+    # classes
+    'Arena',
+    'InstancePool',
+    'OperatorTable',
+]
+
+# ---------------------------------------------------------
+# region CONSTANTS & ENUMS
+
+
+DEFAULT_POOL_CAPACITY: int = 256
+"""Largest number of free instances a pool keeps for reuse."""
+
+# endregion (constants)
+# ---------------------------------------------------------
+# region FUNCTIONS
+
+
+def field_layout(tycl: TyclNode) -> List[FieldDeclNode]:
+    """Returns the fields of a class or structure in storage order: inherited fields, then its own by offset."""
+    fields: List[FieldDeclNode] = []
+    baseclass: Optional[TyclNode] = getattr(tycl, 'baseclass', None)
+    if baseclass is not None:
+        fields.extend(field_layout(baseclass))
+    fields.extend(sorted(tycl.fields.values(), key=lambda fielddecl: fielddecl.offset.index))
+    return fields
+
+
+def zero_value(typenode: Optional[Union[TypeNode, TyclNode]]) -> Any:
+    """Returns the value of a field of the given type without a default."""
+    if isinstance(typenode, (IntegerTypeNode, EnumTypeNode)):
+        return 0
+    elif isinstance(typenode, FloatTypeNode):
+        return 0.0
+    elif isinstance(typenode, StringTypeNode):
+        return ''
+    return None
+
+# endregion (functions)
+# ---------------------------------------------------------
+# region CLASSES
+
+
+class InstancePool:
+    """Creates and recycles the instances of a class or structure.
+
+    Calling the pool (or ``new``) returns an initialized instance: positional
+    arguments set the fields in storage order, the others take their default.
+
+    :ivar tycl: the class or structure declaration
+    :ivar cls: the host class of the instances
+    :ivar defaults: the default of each field that declares one, inherited ones included
+    :ivar free: the instances available for reuse
+    :ivar capacity: the most instances kept in ``free``
+    :ivar stats: the allocation counters
+    """
+
+    def __init__(self, tycl: TyclNode, defaults: Optional[Dict[str, Any]] = None,
+                 base: Optional['InstancePool'] = None, stats: Optional[AllocStats] = None,
+                 capacity: int = DEFAULT_POOL_CAPACITY):
+        self.tycl: TyclNode = tycl
+        self.defaults: Dict[str, Any] = {**(base.defaults if base is not None else {}), **(defaults or {})}
+        self.free: List[Any] = []
+        self.capacity: int = capacity
+        self.stats: AllocStats = stats if stats is not None else AllocStats(tycl)
+        self.cls: type = self._build_class(tycl, self.defaults, base)
+
+    def __repr__(self):
+        return f"{self.__class__.__qualname__}({self.tycl.name!r}, free={len(self.free)})"
+
+    def _build_class(self, tycl: TyclNode, defaults: Dict[str, Any], base: Optional['InstancePool']) -> type:
+        fields: List[FieldDeclNode] = field_layout(tycl)
+        inherited: int = len(field_layout(base.tycl)) if base is not None else 0
+        names: List[str] = [fielddecl.name for fielddecl in fields]
+
+        # __init__ is generated so that initializing an instance is a single call with plain stores
+        namespace: Dict[str, Any] = {}
+        params: List[str] = []
+        for index, fielddecl in enumerate(fields):
+            key: str = f"_d{index}"
+            namespace[key] = defaults.get(fielddecl.name, zero_value(fielddecl.type))
+            params.append(f"{fielddecl.name}={key}")
+        body: str = ''.join(f"\n    self.{name} = {name}" for name in names) or '\n    pass'
+        exec(f"def __init__(self, {', '.join(params)}):{body}", namespace)
+
+        bases: Tuple[type, ...] = (base.cls,) if base is not None else ()
+        return type(tycl.name, bases, {
+            '__slots__': tuple(names[inherited:]),
+            '__init__': namespace['__init__'],
+            '_pool': self,
+        })
+
+    def new(self, *args: Any) -> Any:
+        free: List[Any] = self.free
+        if free:
+            instance: Any = free.pop()
+            self.stats.reused += 1
+            instance.__init__(*args)
+            return instance
+        self.stats.allocated += 1
+        return self.cls(*args)
+
+    __call__ = new
+
+    def new_in(self, arena: 'Arena', *args: Any) -> Any:
+        """Returns an instance that goes back to the pool when the arena closes."""
+        instance: Any = self.new(*args)
+        self.stats.scoped += 1
+        arena.instances.append(instance)
+        return instance
+
+    def release(self, instance: Any) -> None:
+        """Gives back an instance nothing refers to anymore."""
+        if len(self.free) < self.capacity:
+            self.free.append(instance)
+            self.stats.released += 1
+
+
+class Arena:
+    """The instances allocated by one call that do not escape it."""
+
+    __slots__ = ('instances',)
+
+    def __init__(self):
+        self.instances: List[Any] = []
+
+    def close(self) -> None:
+        """Gives every instance back to its pool."""
+        for instance in self.instances:
+            instance._pool.release(instance)
+        self.instances.clear()
+
+
+class OperatorTable(dict):
+    """The operator overloads of the host classes of a namespace, by (operator, left class, right class).
+
+    When a class is built, its overloads are gathered from its bases and its own
+    declaration, with the host classes their parameter accepts. A combination of
+    operand classes is resolved the first time an operation meets it and the method
+    found is kept under its key, so every later operation on the same classes costs
+    one lookup.
+
+    :ivar overloads: for each host class, the accepted right operand classes and the owner of each operator
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.overloads: Dict[type, Dict[str, Tuple[Tuple[type, ...], type]]] = {}
+
+    def register(self, cls: type, operators: Dict[str, Tuple[type, ...]]) -> None:
+        """Builds the overloads of a host class, whose bases are registered already: the ones it
+        inherits, then the ones it declares as attributes named after the operator."""
+        overloads: Dict[str, Tuple[Tuple[type, ...], type]] = {}
+        for base in reversed(cls.__mro__[1:]):
+            overloads.update(self.overloads.get(base, {}))
+        overloads.update((operator, (accepts, cls)) for operator, accepts in operators.items())
+        self.overloads[cls] = overloads
+
+    def __missing__(self, key: Tuple[str, type, type]) -> Callable:
+        operator, left, right = key
+        overload: Optional[Tuple[Tuple[type, ...], type]] = self.overloads.get(left, {}).get(operator)
+        if overload is None or not issubclass(right, overload[0]):
+            raise TypeError(f"Operator '{operator}' not defined for '{left.__name__}' and '{right.__name__}'")
+        # looked up on the owner, so that a method still to be translated is translated once
+        method: Callable = getattr(overload[1], operator)
+        self[key] = method
+        return method
+
+
+# endregion (classes)
+# ---------------------------------------------------------
@@ -0,0 +1,343 @@
+"""Parallel Foreach
+
+Runs the iterations of a ``para cada`` over a numeric array in chunks across a
+pool of processes.
+
+A loop is run in parallel when it asks for it, either through the
+``ForEachStmtNode.parallel`` flag or the ``paralelo`` label, and its body passes
+``ParallelCheck``. The body may only assign its own locals, its element (which
+stores into the element's slot of the array) and the reduction variables
+declared in ``ForEachStmtNode.reductions``, and only through their reduction
+operator. It may call functions that are pure by the same rules. A body that
+stores its element may not read the array it iterates nor any other array, since
+the chunks would see it at different points of the loop; a body that does not may
+read the array, which is the shared block itself rather than a copy.
+
+The array is copied once into a ``multiprocessing.shared_memory`` block that
+every worker maps. The block holds the array packed with the C type of its
+elements, so element stores wrap as the element type does. Chunks have a fixed
+size and their partial reductions are folded in chunk order, so the result does
+not depend on the number of workers or on which finishes first.
+"""
+import os
+import operator
+from array import array
+from concurrent.futures import ProcessPoolExecutor, Future
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional, Any, Union, List, Dict, Set, Tuple, Callable, Sequence
+
+from brah.c_astnodes import *
+from brah.o_traversal import iter_children, walk
+from brah.p_types import unalias
+
+
+__all__ = [
+    # constants
+    'PARALLEL_CHUNK',
+    'PARALLEL_LABEL',
+    'PARALLEL_MIN_ITEMS',
+    'REDUCTIONS',
+
+    # functions
+    'array_typecode',
+    'get_executor',
+    'is_parallel',
+    'run_parallel',
+    'shutdown_executor',
+
+    # classes
+    'ParallelCheck',
+]
+
+# ---------------------------------------------------------
+# region CONSTANTS & ENUMS
+
+
+PARALLEL_LABEL: str = 'paralelo'
+"""Label that marks a foreach as parallel."""
+
+PARALLEL_CHUNK: int = 4096
+"""Number of elements each task processes. Fixed, so reductions are folded the same way on every machine."""
+
+PARALLEL_MIN_ITEMS: int = 4 * PARALLEL_CHUNK
+"""Arrays shorter than this are processed chunk by chunk in the calling process."""
+
+REDUCTIONS: Dict[str, Tuple[Callable[[Any, Any], Any], int, Tuple[str, ...]]] = {
+    '+': (operator.add, 0, ('+=', '++')),
+    '*': (operator.mul, 1, ('*=',)),
+    '&': (operator.and_, -1, ('&=',)),
+    '|': (operator.or_, 0, ('|=',)),
+    '^': (operator.xor, 0, ('^=',)),
+}
+"""Combining function, identity and in-place operators of each reduction operator."""
+
+_executor: Optional[ProcessPoolExecutor] = None
+_chunk_functions: Dict[Tuple[str, str], Callable] = {}
+
+# endregion (constants)
+# ---------------------------------------------------------
+# region FUNCTIONS
+
+
+def is_parallel(stmt: ForEachStmtNode) -> bool:
+    """Returns whether a foreach asks to run in parallel."""
+    return stmt.parallel or stmt.label == PARALLEL_LABEL
+
+
+def array_typecode(typenode: Optional[TypeNode]) -> Optional[str]:
+    """Returns the ``array`` type code elements of the type are packed with, or None if they cannot be packed."""
+    if isinstance(typenode, IntegerTypeNode):
+        codes: Dict[int, str] = {1: 'b', 2: 'h', 4: 'i', 8: 'q'}
+        code: Optional[str] = codes.get(typenode.bytesize)
+        return (code if typenode.signed else code.upper()) if code else None
+    elif isinstance(typenode, FloatTypeNode):
+        return {4: 'f', 8: 'd'}.get(typenode.bytesize)
+    return None
+
+
+def get_executor(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Returns the process pool parallel loops run on, creating it on first use."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(workers or os.cpu_count())
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
+
+def _chunk_function(source: str, name: str, constants: Dict[str, Any]) -> Callable:
+    key: Tuple[str, str] = (source, name)
+    function: Optional[Callable] = _chunk_functions.get(key)
+    if function is None:
+        namespace: Dict[str, Any] = dict(constants)
+        exec(compile(source, f"<brah {name}>", 'exec'), namespace)
+        function = _chunk_functions[key] = namespace[name]
+    return function
+
+
+def _run_chunk(source: str, name: str, constants: Dict[str, Any], shm_name: str, typecode: str,
+               start: int, stop: int, outer: tuple) -> tuple:
+    """Runs one chunk in a worker process, returning the partial reductions."""
+    function: Callable = _chunk_function(source, name, constants)
+    # pool workers share the resource tracker of the parent, which unlinks the block
+    shm = SharedMemory(name=shm_name)
+    try:
+        view: memoryview = shm.buf.cast(typecode)
+        try:
+            return function(view, start, stop, *outer)
+        finally:
+            view.release()
+    finally:
+        shm.close()
+
+
+def run_parallel(source: str, name: str, constants: Dict[str, Any], typecode: str, container: List[Any],
+                 outer: tuple, operators: Sequence[str], initial: tuple, writes: bool) -> tuple:
+    """Runs the chunk function ``name`` defined by ``source`` over every chunk of the container.
+
+    The chunk function is called with the element buffer, the chunk bounds and
+    the outer values, and returns its partial reductions. These are folded, in
+    chunk order, into the initial values of the reduction variables, which are
+    returned. When ``writes`` is set, the container is updated with the stored
+    elements.
+    """
+    length: int = len(container)
+    bounds: List[Tuple[int, int]] = [(start, min(start + PARALLEL_CHUNK, length))
+                                     for start in range(0, length, PARALLEL_CHUNK)]
+    if length < PARALLEL_MIN_ITEMS:
+        function: Callable = _chunk_function(source, name, constants)
+        partials: List[tuple] = [function(container, start, stop, *outer) for start, stop in bounds]
+    else:
+        packed: array = array(typecode, container)
+        shm = SharedMemory(create=True, size=len(packed) * packed.itemsize)
+        view: memoryview = shm.buf.cast(typecode)
+        try:
+            view[:] = packed
+            executor: ProcessPoolExecutor = get_executor()
+            futures: List[Future] = [
+                executor.submit(_run_chunk, source, name, constants, shm.name, typecode, start, stop, outer)
+                for start, stop in bounds
+            ]
+            partials = [future.result() for future in futures]
+            if writes:
+                container[:] = view.tolist()
+        finally:
+            view.release()
+            shm.close()
+            shm.unlink()
+
+    result: List[Any] = list(initial)
+    for partial in partials:
+        for index, symbol in enumerate(operators):
+            result[index] = REDUCTIONS[symbol][0](result[index], partial[index])
+    return tuple(result)
+
+# endregion (functions)
+# ---------------------------------------------------------
+# region CLASSES
+
+
+class ParallelCheck:
+    """Verifies that the iterations of a foreach are independent of each other.
+
+    :ivar stmt: the foreach verified
+    :ivar reasons: why the loop cannot run in parallel; empty when it can
+    :ivar reads: the names the body reads but does not declare, in order of appearance
+    :ivar functions: the functions called by the body or by those, all pure
+    :ivar constants: the global names the called functions read
+    :ivar writes_element: whether the body assigns its element
+    """
+
+    def __init__(self, stmt: ForEachStmtNode, resolve: Callable[[str], Optional[Union[DeclNode, TyclNode, TypeNode]]]):
+        self.stmt: ForEachStmtNode = stmt
+        self.resolve: Callable[[str], Optional[Union[DeclNode, TyclNode, TypeNode]]] = resolve
+        self.reasons: List[str] = []
+        self.reads: List[str] = []
+        self.functions: Dict[str, FunctionDeclNode] = {}
+        self.constants: List[str] = []
+        self.writes_element: bool = False
+        self._purity: Dict[FunctionDeclNode, bool] = {}
+
+        for name, symbol in stmt.reductions.items():
+            if symbol not in REDUCTIONS:
+                self.reasons.append(f"Unsupported reduction operator for '{name}': '{symbol}'")
+        self._check_body()
+
+    def __bool__(self) -> bool:
+        return not self.reasons
+
+    @staticmethod
+    def _declared(root: ASTNode) -> Set[str]:
+        return {node.name for node in walk(root) if isinstance(node, VarDeclNode)}
+
+    @staticmethod
+    def _target_name(expr: ExprNode) -> Optional[str]:
+        if isinstance(expr, LValueExprNode):
+            expr = expr.exprtarget
+        if isinstance(expr, NameExprNode) and not isinstance(expr, (FieldNameExprNode, PropertyNameExprNode)):
+            return expr.name
+        return None
+
+    def _check_body(self) -> None:
+        stmt: ForEachStmtNode = self.stmt
+        element: str = stmt.element.name
+        local: Set[str] = self._declared(stmt.scope)
+        local.add(element)
+
+        container: Optional[str] = self._target_name(stmt.container)
+        arrays: Set[str] = set()
+        stack: List[ASTNode] = [stmt.scope]
+        while stack:
+            node: ASTNode = stack.pop()
+            written: Optional[ExprNode] = None
+            operation: Optional[str] = None
+            if isinstance(node, AssignmentStmtNode):
+                written, operation = node.exprlvalue, '='
+                stack.append(node.exprvalue)
+            elif isinstance(node, BinaryExprNode) and node.is_inplace:
+                written, operation = node.left, node.operator
+                stack.append(node.right)
+            elif isinstance(node, (IncrUnaryExprNode, DecrUnaryExprNode)):
+                written, operation = node.operand, '++' if isinstance(node, IncrUnaryExprNode) else '--'
+            elif isinstance(node, UnpackStmtNode):
+                self.reasons.append("Unpacks into several targets")
+
+            if written is not None:
+                name: Optional[str] = self._target_name(written)
+                if name is None:
+                    self.reasons.append("Stores into an array, field or reference")
+                elif name in stmt.reductions:
+                    symbol: str = stmt.reductions[name]
+                    if symbol in REDUCTIONS and operation not in REDUCTIONS[symbol][2]:
+                        self.reasons.append(f"Reduction variable '{name}' updated with '{operation}'")
+                elif name not in local:
+                    self.reasons.append(f"Assigns to outer variable '{name}'")
+                elif name == element:
+                    self.writes_element = True
+                continue
+
+            if isinstance(node, (FieldNameExprNode, PropertyNameExprNode)):
+                self.reasons.append(f"Reads field '{node.name}'")
+            elif isinstance(node, NameExprNode):
+                if node.name in stmt.reductions:
+                    self.reasons.append(f"Reads reduction variable '{node.name}'")
+                elif node.name not in local:
+                    if node.name not in self.reads:
+                        self.reads.append(node.name)
+                    if isinstance(unalias(node.type), ArrayTypeNode):
+                        arrays.add(node.name)
+            elif isinstance(node, DirectCallExprNode):
+                self._check_call(node.funcnameexpr.name)
+                stack.extend(node.arglist)
+                continue
+            elif isinstance(node, IndirectCallExprNode):
+                self.reasons.append("Calls through a reference or method")
+            elif isinstance(node, (ReturnStmtNode, BreakStmtNode)):
+                self.reasons.append(f"Leaves the loop with a {node._node_name}")
+            elif isinstance(node, ContinueStmtNode) and node.stmtlabel not in (None, stmt.label):
+                self.reasons.append(f"Continues an outer loop: '{node.stmtlabel}'")
+            stack.extend(iter_children(node))
+
+        if self.writes_element:
+            for name in self.reads:
+                if name == container or name in arrays:
+                    self.reasons.append(f"Reads array '{name}' while storing elements")
+
+    def _check_call(self, name: str) -> None:
+        decl = self.resolve(name)
+        if not isinstance(decl, FunctionDeclNode) or not self.is_pure(decl):
+            self.reasons.append(f"Calls a function that is not pure: '{name}'")
+        else:
+            self.functions.setdefault(name, decl)
+
+    def is_pure(self, decl: FunctionDeclNode) -> bool:
+        """Returns whether a function only assigns its own locals and calls pure functions."""
+        purity: Optional[bool] = self._purity.get(decl)
+        if purity is not None:
+            return purity
+        self._purity[decl] = True  # recursion does not make a function impure
+        local: Set[str] = self._declared(decl.scope) | set(decl.params) if decl.scope is not None else set()
+        pure: bool = decl.scope is not None
+        stack: List[ASTNode] = [decl.scope] if pure else []
+        while stack and pure:
+            node: ASTNode = stack.pop()
+            written: Optional[ExprNode] = None
+            if isinstance(node, AssignmentStmtNode):
+                written = node.exprlvalue
+            elif isinstance(node, BinaryExprNode) and node.is_inplace:
+                written = node.left
+            elif isinstance(node, (IncrUnaryExprNode, DecrUnaryExprNode)):
+                written = node.operand
+            elif isinstance(node, UnpackStmtNode) and any(
+                    self._target_name(target) not in local for target in node.exprlvalues if target is not None):
+                pure = False
+            if written is not None and self._target_name(written) not in local:
+                pure = False
+            elif isinstance(node, (FieldNameExprNode, PropertyNameExprNode, IndirectCallExprNode)):
+                pure = False
+            elif isinstance(node, DirectCallExprNode):
+                callee = self.resolve(node.funcnameexpr.name)
+                pure = isinstance(callee, FunctionDeclNode) and self.is_pure(callee)
+                if pure:
+                    self.functions.setdefault(callee.name, callee)
+                stack.extend(node.arglist)
+                continue
+            elif isinstance(node, NameExprNode) and node.name not in local:
+                constant = self.resolve(node.name)
+                if isinstance(constant, (ConstDeclNode, EnumDeclNode)):
+                    if node.name not in self.constants:
+                        self.constants.append(node.name)
+                elif not isinstance(constant, FunctionDeclNode):
+                    pure = False
+            stack.extend(iter_children(node))
+        self._purity[decl] = pure
+        return pure
+
+
+# endregion (classes)
+# ---------------------------------------------------------
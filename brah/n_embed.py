@@ -0,0 +1,499 @@
+"""Embedding
+
+Calls exported Brah functions from Python.
+
+A ``Program`` takes a resolved ``AsmbNode`` once and keeps a pool of
+``ExecutionContext`` objects: the module globals the compiled functions run
+with and their instance pools. Contexts are built and their exported functions
+compiled up front, then handed to one caller at a time and given back after the
+call, so a call costs a pool pop, a dict lookup and the function itself. Brah
+code cannot assign globals, so a context needs no reset between callers.
+
+Usage::
+
+    program = Program(asmb)
+    total = program.call('soma', 1, 2)
+
+    with program.context() as context:
+        for value in values:
+            context.call('processe', value)
+
+A program built with a budget runs its functions as coroutines that yield to the
+event loop once per ``budget`` function entries and loop iterations, so many
+calls interleave on one event loop::
+
+    program = Program(asmb, budget=10_000)
+    results = await asyncio.gather(*(run_function(program, 'processe', value) for value in values))
+
+A stackless program runs the Brah calls of its functions from an explicit stack
+of frames instead of nesting Python calls (see ``run_stackless``), so recursion
+is bounded by memory rather than the recursion limit::
+
+    program = Program(asmb, stackless=True)
+    total = program.call('somatorio', 1_000_000)
+
+Given a profiler and ``trace=True``, the functions and loops of a program report
+their calls and iterations to it (see ``Profiler``)::
+
+    program = Program(asmb, profiler=Profiler(), trace=True)
+
+Given a stack, they keep their frames on it, for a ``SamplingProfiler`` to read
+while the program runs. Contexts share the stack, so sample a program called
+from one thread at a time::
+
+    stack = ExecStack()
+    program = Program(asmb, stack=stack)
+    with SamplingProfiler(stack) as sampler:
+        program.call('processe', values)
+    print(sampler.report())
+
+Run ``python -m brah.n_embed`` to measure the calls per second of a trivial
+function, the cost of the budget countdown and of tracing in a loop, the time
+taken to build a string out of a million parts and the cost of stackless calls.
+"""
+import sys
+import asyncio
+import statistics
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
+from time import perf_counter
+from typing import Optional, Any, List, Dict, Callable, Iterator, Deque
+
+from brah.c_astnodes import *
+from brah.g_profiler import ExecStack, Profiler
+from brah.j_hostjit import DEFAULT_BUDGET, GLOBAL_PREFIX, FunctionTranslator, TieredFunction, TranslationError, \
+    build_namespace, run_stackless
+from brah.p_types import unalias
+
+
+__all__ = [
+    # constants
+    'DEFAULT_CONTEXTS',
+
+    # functions
+    'exported_functions',
+    'main',
+    'measure_async_calls',
+    'measure_calls',
+    'run_function',
+
+    # classes
+    'ExecutionContext',
+    'Program',
+]
+
+# ---------------------------------------------------------
+# region CONSTANTS & ENUMS
+
+
+DEFAULT_CONTEXTS: int = 4
+"""Number of execution contexts a Program builds up front, and keeps at most when idle."""
+
+DEFAULT_CALLS: int = 100_000
+
+# endregion (constants)
+# ---------------------------------------------------------
+# region FUNCTIONS
+
+
+def exported_functions(asmb: AsmbNode) -> Dict[str, FunctionDeclNode]:
+    """Returns the exported functions of every module of the assembly, by name."""
+    exports: Dict[str, FunctionDeclNode] = {}
+    for module in asmb.modules.values():
+        if module.scope is None:
+            continue
+        for name, decl in module.scope.declarations.items():
+            if not isinstance(decl, FunctionDeclNode) or not decl.exports:
+                continue
+            if name in exports:
+                raise ValueError(f"Function exported by more than one module: '{name}'")
+            exports[name] = decl
+    return exports
+
+
+def _host_function(decl: FunctionDeclNode, function: Callable, asynchronous: bool = False) -> Callable:
+    """Returns the function called from Python with the declared values of its enumeration
+    parameters and result instead of their run time values, when they differ."""
+    params: List[Optional[EnumTypeNode]] = [
+        typenode if isinstance(typenode, EnumTypeNode) and typenode.renumbers() else None
+        for typenode in (unalias(param.type) for param in decl.params.values())
+    ]
+    restype: Any = unalias(decl.type)
+    result: Optional[EnumTypeNode] = restype if isinstance(restype, EnumTypeNode) and restype.renumbers() else None
+    if result is None and not any(params):
+        return function
+
+    def codes(args: tuple) -> tuple:
+        return tuple(enumtype.code_of_value(arg) if enumtype else arg for enumtype, arg in zip(params, args)) \
+            + args[len(params):]
+
+    if asynchronous:
+        async def host(*args: Any) -> Any:
+            value: Any = await function(*codes(args))
+            return result.value_of(value) if result is not None else value
+    else:
+        def host(*args: Any) -> Any:
+            value: Any = function(*codes(args))
+            return result.value_of(value) if result is not None else value
+    return host
+
+
+async def run_function(program: 'Program', name: str, *args: Any) -> Any:
+    """Runs an exported function of a program built with a budget, yielding to the event loop as it goes.
+    When every context is in use, waits for one to be given back."""
+    context: ExecutionContext = await program.wait_context()
+    try:
+        return await context.call(name, *args)
+    finally:
+        program.release(context)
+
+
+def _timings(samples: List[float]) -> Dict[str, float]:
+    return {
+        'min_us': min(samples) * 1e6,
+        'median_us': statistics.median(samples) * 1e6,
+        'calls_per_sec': 1.0 / min(samples),
+    }
+
+
+def measure_calls(program: 'Program', name: str, args: tuple = (), number: int = DEFAULT_CALLS,
+                  repeat: int = 5) -> Dict[str, float]:
+    """Times ``program.call(name, *args)``, returning the best and median cost of a call in
+    microseconds and the calls per second at the best rate."""
+    call: Callable = program.call
+    samples: List[float] = []
+    for _ in range(repeat):
+        start: float = perf_counter()
+        for _ in range(number):
+            call(name, *args)
+        samples.append((perf_counter() - start) / number)
+    return _timings(samples)
+
+
+def measure_async_calls(program: 'Program', name: str, args: tuple = (), number: int = DEFAULT_CALLS,
+                        repeat: int = 5) -> Dict[str, float]:
+    """Times ``await run_function(program, name, *args)`` as measure_calls does, inside one event loop."""
+    async def run() -> List[float]:
+        samples: List[float] = []
+        for _ in range(repeat):
+            start: float = perf_counter()
+            for _ in range(number):
+                await run_function(program, name, *args)
+            samples.append((perf_counter() - start) / number)
+        return samples
+
+    return _timings(asyncio.run(run()))
+
+
+def _sample_program() -> AsmbNode:
+    """Returns an assembly exporting ``soma(a: i32, b: i32): i32``, which adds its parameters,
+    ``conta(n: i32): i64``, which adds the numbers below n in a loop, and
+    ``junta(n: i32, parte: str): str``, which appends a part to a string n times, and
+    ``soma_ate(n: i64, total: i64): i64``, which adds the numbers up to n through tail calls, and
+    ``somatorio(n: i64): i64``, which adds them up through calls that are not tail calls."""
+    i32 = IntegerTypeNode(0, 'i32', 4, True)
+    i64 = IntegerTypeNode(0, 'i64', 8, True)
+    string = StringTypeNode(0, 'str')
+    scope = ModuleScopeNode(0)
+
+    body = FunctionScopeNode(0, scope)
+    body.statements.append(ReturnStmtNode(0, AddBinaryExprNode(
+        0, ParamNameExprNode(0, 'a'), ParamNameExprNode(0, 'b'), '+'
+    )))
+    params: Dict[str, ParamDeclNode] = {'a': ParamDeclNode(0, 0, 'a', i32), 'b': ParamDeclNode(0, 1, 'b', i32)}
+    scope.declarations['soma'] = FunctionDeclNode(0, 0, 'soma', i32, params, body, exports=True)
+
+    body = FunctionScopeNode(0, scope)
+    body.declarations['total'] = VarDeclNode(0, 0, 'total', i64, LiteralExprNode(0, 0, i64))
+    loop = LoopScopeNode(0, body)
+    loop.statements.append(ExpressionStmtNode(0, AddBinaryExprNode(
+        0, VarNameExprNode(0, 'total'), VarNameExprNode(0, 'i'), '+=', True
+    )))
+    body.statements.append(ForStmtNode(
+        0, [VarDeclNode(0, 1, 'i', i32, LiteralExprNode(0, 0, i32))],
+        [CompareBinaryExprNode(0, VarNameExprNode(0, 'i'), ParamNameExprNode(0, 'n'), '<')],
+        [ExpressionStmtNode(0, IncrUnaryExprNode(0, VarNameExprNode(0, 'i'), True))], loop
+    ))
+    body.statements.append(ReturnStmtNode(0, VarNameExprNode(0, 'total')))
+    params = {'n': ParamDeclNode(0, 0, 'n', i32)}
+    scope.declarations['conta'] = FunctionDeclNode(0, 0, 'conta', i64, params, body, exports=True)
+
+    body = FunctionScopeNode(0, scope)
+    body.declarations['texto'] = VarDeclNode(0, 0, 'texto', string, LiteralExprNode(0, '', string))
+    loop = LoopScopeNode(0, body)
+    loop.statements.append(ExpressionStmtNode(0, AddBinaryExprNode(
+        0, VarNameExprNode(0, 'texto'), ParamNameExprNode(0, 'parte'), '+=', True
+    )))
+    body.statements.append(ForStmtNode(
+        0, [VarDeclNode(0, 1, 'i', i32, LiteralExprNode(0, 0, i32))],
+        [CompareBinaryExprNode(0, VarNameExprNode(0, 'i'), ParamNameExprNode(0, 'n'), '<')],
+        [ExpressionStmtNode(0, IncrUnaryExprNode(0, VarNameExprNode(0, 'i'), True))], loop
+    ))
+    body.statements.append(ReturnStmtNode(0, VarNameExprNode(0, 'texto')))
+    params = {'n': ParamDeclNode(0, 0, 'n', i32), 'parte': ParamDeclNode(0, 1, 'parte', string)}
+    scope.declarations['junta'] = FunctionDeclNode(0, 0, 'junta', string, params, body, exports=True)
+
+    body = FunctionScopeNode(0, scope)
+    then = BasicScopeNode(0, body)
+    then.statements.append(ReturnStmtNode(0, ParamNameExprNode(0, 'total')))
+    body.statements.append(IfThenStmtNode(0, CompareBinaryExprNode(
+        0, ParamNameExprNode(0, 'n'), LiteralExprNode(0, 0, i64), '=='
+    ), then))
+    body.statements.append(ReturnStmtNode(0, DirectCallExprNode(0, FunctionNameExprNode(0, 'soma_ate'), [
+        AddBinaryExprNode(0, ParamNameExprNode(0, 'n'), LiteralExprNode(0, 1, i64), '-'),
+        AddBinaryExprNode(0, ParamNameExprNode(0, 'total'), ParamNameExprNode(0, 'n'), '+'),
+    ])))
+    params = {'n': ParamDeclNode(0, 0, 'n', i64), 'total': ParamDeclNode(0, 1, 'total', i64)}
+    scope.declarations['soma_ate'] = FunctionDeclNode(0, 0, 'soma_ate', i64, params, body, exports=True)
+
+    body = FunctionScopeNode(0, scope)
+    then = BasicScopeNode(0, body)
+    then.statements.append(ReturnStmtNode(0, LiteralExprNode(0, 0, i64)))
+    body.statements.append(IfThenStmtNode(0, CompareBinaryExprNode(
+        0, ParamNameExprNode(0, 'n'), LiteralExprNode(0, 0, i64), '=='
+    ), then))
+    body.statements.append(ReturnStmtNode(0, AddBinaryExprNode(
+        0, ParamNameExprNode(0, 'n'), DirectCallExprNode(0, FunctionNameExprNode(0, 'somatorio'), [
+            AddBinaryExprNode(0, ParamNameExprNode(0, 'n'), LiteralExprNode(0, 1, i64), '-'),
+        ]), '+'
+    )))
+    params = {'n': ParamDeclNode(0, 0, 'n', i64)}
+    scope.declarations['somatorio'] = FunctionDeclNode(0, 0, 'somatorio', i64, params, body, exports=True)
+
+    asmb = AsmbNode()
+    asmb['principal'] = ModuleNode('principal', scope)
+    return asmb
+
+
+def main() -> int:
+    asmb: AsmbNode = _sample_program()
+    program = Program(asmb)
+    timings: Dict[str, float] = measure_calls(program, 'soma', (1, 2))
+    print(f"soma(1, 2): {timings['min_us']:.3f} us/call (median {timings['median_us']:.3f}),"
+          f" {timings['calls_per_sec']:,.0f} calls/s")
+
+    # the budget countdown runs on every iteration: compare a loop with and without it
+    sync: Dict[str, float] = measure_calls(program, 'conta', (10_000,), number=200)
+    asynchronous: Dict[str, float] = measure_async_calls(Program(asmb, budget=DEFAULT_BUDGET), 'conta',
+                                                         (10_000,), number=200)
+    print(f"conta(10000): {sync['min_us']:.1f} us/call, {asynchronous['min_us']:.1f} us/call with a budget"
+          f" of {DEFAULT_BUDGET} ({asynchronous['min_us'] / sync['min_us'] - 1.0:+.1%})")
+
+    # a traced program reports every call and loop iteration to the profiler: compare both ways
+    traced = Program(asmb, profiler=Profiler(), trace=True)
+    calls: float = measure_calls(traced, 'soma', (1, 2))['min_us']
+    loops: float = measure_calls(traced, 'conta', (10_000,), number=200)['min_us']
+    print(f"traced: soma(1, 2) {calls:.3f} us/call ({calls / timings['min_us'] - 1.0:+.1%}),"
+          f" conta(10000) {loops:.1f} us/call ({loops / sync['min_us'] - 1.0:+.1%})")
+
+    # appending to a string copies it unless the parts are kept in a list: compare both on the
+    # same number of parts, then build a string of a million parts
+    concatenated: Dict[str, float] = {}
+    for builders in (False, True):
+        FunctionTranslator.string_builders = builders
+        try:
+            concatenated[str(builders)] = measure_calls(Program(_sample_program()), 'junta', (100_000, 'ab'),
+                                                        number=1, repeat=3)['min_us']
+        finally:
+            FunctionTranslator.string_builders = True
+    million: float = measure_calls(program, 'junta', (1_000_000, 'ab'), number=1, repeat=3)['min_us']
+    print(f"junta(100000): {concatenated['False'] / 1e3:.1f} ms appending to the string,"
+          f" {concatenated['True'] / 1e3:.1f} ms with a list; junta(1000000): {million / 1e3:.1f} ms")
+
+    # tail calls become jumps: compare with calls, at a depth within the recursion limit
+    recursive: Dict[str, float] = {}
+    for tail_calls in (False, True):
+        FunctionTranslator.tail_calls = tail_calls
+        try:
+            recursive[str(tail_calls)] = measure_calls(Program(_sample_program()), 'soma_ate', (500, 0),
+                                                       number=100)['min_us']
+        finally:
+            FunctionTranslator.tail_calls = True
+    deep: float = measure_calls(program, 'soma_ate', (1_000_000, 0), number=1, repeat=3)['min_us']
+    print(f"soma_ate(500, 0): {recursive['False']:.1f} us/call with calls, {recursive['True']:.1f} us/call"
+          f" with jumps; soma_ate(1000000, 0): {deep / 1e3:.1f} ms")
+
+    # a stackless program keeps its frames on a list: compare with nested calls, then go deeper
+    # than the recursion limit allows
+    stackless = Program(_sample_program(), stackless=True)
+    nested: float = measure_calls(program, 'somatorio', (500,), number=100)['min_us']
+    driven: float = measure_calls(stackless, 'somatorio', (500,), number=100)['min_us']
+    deep = measure_calls(stackless, 'somatorio', (1_000_000,), number=1, repeat=3)['min_us']
+    print(f"somatorio(500): {nested:.1f} us/call nested, {driven:.1f} us/call stackless;"
+          f" somatorio(1000000): {deep / 1e3:.1f} ms stackless")
+    return 0
+
+# endregion (functions)
+# ---------------------------------------------------------
+# region CLASSES
+
+
+class ExecutionContext:
+    """The globals and instance pools one caller runs Brah functions with.
+
+    :ivar program: the program the context belongs to
+    :ivar namespaces: the globals of each module, by module name
+    :ivar functions: the exported functions, by name, compiled once the context is warmed up
+    :ivar calls: the number of calls made through the context
+    """
+
+    def __init__(self, program: 'Program'):
+        self.program: 'Program' = program
+        self.namespaces: Dict[str, Dict[str, Any]] = {
+            name: build_namespace(module, program.interpret, profiler=program.profiler, budget=program.budget,
+                                  stackless=program.stackless, trace=program.trace, stack=program.stack)
+            for name, module in program.asmb.modules.items() if module.scope is not None
+        }
+        self.calls: int = 0
+        self.functions: Dict[str, Callable] = {}
+        self._link()
+
+    def _link(self) -> None:
+        # the exported names of every module are visible from the others, as if imported
+        exported: Dict[str, Any] = {}
+        for namespace in self.namespaces.values():
+            for name in self.program.exports:
+                if GLOBAL_PREFIX + name in namespace:
+                    exported[GLOBAL_PREFIX + name] = namespace[GLOBAL_PREFIX + name]
+        for namespace in self.namespaces.values():
+            for key, value in exported.items():
+                namespace.setdefault(key, value)
+        self.functions = {name: exported[GLOBAL_PREFIX + name] for name in self.program.exports}
+        if self.program.stackless:
+            # called from Brah through yields, from Python through the driver
+            self.functions = {name: partial(run_stackless, function) for name, function in self.functions.items()}
+        self.functions = {name: _host_function(self.program.exports[name], function, self.program.budget is not None)
+                          for name, function in self.functions.items()}
+
+    def warm(self) -> None:
+        """Compiles every function of the context now rather than on its first call.
+
+        Functions the translator rejects stay in the interpreted tier; without an
+        interpreter, calling one of them raises the TranslationError.
+        """
+        for namespace in self.namespaces.values():
+            for value in list(namespace.values()):
+                if isinstance(value, TieredFunction) and value.compiled is None and value.translatable:
+                    try:
+                        value.promote()
+                    except TranslationError:
+                        pass
+        for name, function in self.functions.items():
+            if isinstance(function, TieredFunction) and function.compiled is not None:
+                self.functions[name] = function.compiled
+
+    def call(self, name: str, *args: Any) -> Any:
+        function: Optional[Callable] = self.functions.get(name)
+        if function is None:
+            raise KeyError(f"Not exported: '{name}'")
+        self.calls += 1
+        return function(*args)
+
+
+class Program:
+    """A resolved assembly ready to be called from Python.
+
+    Contexts are taken and given back with ``list.pop`` and ``list.append``,
+    which are atomic, so callers on several threads never share one. Coroutines
+    of an asynchronous program wait in line for a context to be given back
+    instead, so at most ``contexts`` of them are ever built.
+
+    :ivar asmb: the assembly
+    :ivar exports: the exported functions, by name
+    :ivar interpret: the interpreter functions start in and fall back to when they cannot be translated, if any
+    :ivar profiler: the profiler instance pools count allocations in, if any
+    :ivar trace: whether functions and loops also report their calls and iterations to the profiler
+    :ivar stack: the Brah call stack functions keep their frames on for a SamplingProfiler, if any
+    :ivar budget: for asynchronous programs, the entries and iterations run between two yields
+    :ivar stackless: whether Brah calls run from an explicit stack of frames rather than nested
+    :ivar capacity: the most idle contexts kept
+    """
+
+    def __init__(self, asmb: AsmbNode, contexts: int = DEFAULT_CONTEXTS, warm: bool = True,
+                 profiler: Optional[Profiler] = None, budget: Optional[int] = None, stackless: bool = False,
+                 trace: bool = False, stack: Optional[ExecStack] = None,
+                 interpret: Optional[Callable[[DeclNode, tuple], Any]] = None):
+        self.asmb: AsmbNode = asmb
+        self.exports: Dict[str, FunctionDeclNode] = exported_functions(asmb)
+        self.interpret: Optional[Callable[[DeclNode, tuple], Any]] = interpret
+        self.profiler: Optional[Profiler] = profiler
+        self.trace: bool = trace
+        self.stack: Optional[ExecStack] = stack
+        self.budget: Optional[int] = budget
+        self.stackless: bool = stackless
+        self.capacity: int = contexts
+        self.warm: bool = warm
+        self._free: List[ExecutionContext] = [self.new_context() for _ in range(contexts)]
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def new_context(self) -> ExecutionContext:
+        context = ExecutionContext(self)
+        if self.warm:
+            context.warm()
+        return context
+
+    def acquire(self) -> ExecutionContext:
+        """Returns an idle context, building one if all are in use."""
+        try:
+            return self._free.pop()
+        except IndexError:
+            return self.new_context()
+
+    async def wait_context(self) -> ExecutionContext:
+        """Returns an idle context, waiting for one to be given back if all are in use. Call from
+        one event loop at a time."""
+        if self._free and not self._waiters:
+            return self._free.pop()
+        if self.capacity == 0:
+            # nothing is ever given back to wait for
+            return self.new_context()
+        waiter: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            # given a context just before being cancelled: pass it on
+            if waiter.done() and not waiter.cancelled():
+                self.release(waiter.result())
+            raise
+
+    def release(self, context: ExecutionContext) -> None:
+        while self._waiters:
+            waiter: asyncio.Future = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(context)
+                return
+        if len(self._free) < self.capacity:
+            self._free.append(context)
+
+    @contextmanager
+    def context(self) -> Iterator[ExecutionContext]:
+        """Holds a context for a sequence of calls."""
+        context: ExecutionContext = self.acquire()
+        try:
+            yield context
+        finally:
+            self.release(context)
+
+    def call(self, name: str, *args: Any) -> Any:
+        """Calls an exported function with Python arguments. Asynchronous programs use run_function."""
+        if self.budget is not None:
+            raise TypeError("Asynchronous program: use 'await run_function(program, name, ...)'")
+        free: List[ExecutionContext] = self._free
+        try:
+            context: ExecutionContext = free.pop()
+        except IndexError:
+            context = self.new_context()
+        try:
+            return context.call(name, *args)
+        finally:
+            self.release(context)
+
+
+# endregion (classes)
+# ---------------------------------------------------------
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,388 @@
+"""Traversal
+
+Walks and rewrites trees of ``ASTNode`` through the child fields each node class
+declares (``ASTNode.child_fields``), so that passes do not re-implement
+traversal. Every walk is iterative: deep trees do not reach the recursion limit
+and no call is made per node besides the class's generated ``child_values``.
+
+``walk`` yields the nodes below a root in pre or post order, optionally pruning
+subtrees; ``walk_declarations`` yields the declarations only, each with the
+declaration enclosing it. ``Visitor`` calls ``enter_<NodeClass>`` and ``leave_<NodeClass>``
+methods, found along the class hierarchy once per node class, and lets them
+prune the walk, replace the node they are given or remove it.
+
+Run ``python -m brah.o_traversal`` to compare the walks over a tree of about a
+million nodes against recursive method dispatch.
+"""
+import sys
+import copy
+from time import perf_counter
+from typing import Optional, Any, List, Dict, Tuple, Iterator, Callable
+
+from brah.c_astnodes import *
+
+
+__all__ = [
+    # constants
+    'PRUNE',
+    'REMOVE',
+
+    # functions
+    'child_slots',
+    'clone_expr',
+    'get_slot',
+    'iter_children',
+    'main',
+    'set_slot',
+    'walk',
+    'walk_declarations',
+
+    # classes
+    'Visitor',
+]
+
+# ---------------------------------------------------------
+# region CONSTANTS & ENUMS
+
+
+class _Signal:
+
+    def __init__(self, name: str):
+        self.name: str = name
+
+    def __repr__(self):
+        return self.name
+
+
+PRUNE: Any = _Signal('PRUNE')
+"""Returned by an enter method: the children of the node are not walked."""
+
+REMOVE: Any = _Signal('REMOVE')
+"""Returned by a leave method: the node is taken out of the list or dict holding it, or its field is set to None."""
+
+BENCHMARK_DEPTH: int = 20
+"""Depth of the expression tree the benchmark walks: 2 ** 20 - 1 nodes."""
+
+# endregion (constants)
+# ---------------------------------------------------------
+# region FUNCTIONS
+
+
+def iter_children(node: ASTNode) -> Iterator[ASTNode]:
+    """Yields the nodes directly below a node, in the order of its child fields."""
+    for value in node.child_values():
+        cls: type = value.__class__
+        if cls is list:
+            for item in value:
+                if item is not None:
+                    yield item
+        elif cls is dict:
+            yield from value.values()
+        elif value is not None:
+            yield value
+
+
+def child_slots(node: ASTNode) -> Iterator[Tuple[Any, Any]]:
+    """Yields a (holder, key) pair for each node directly below a node.
+
+    The holder is the node itself, keyed by attribute name, or the list or dict
+    keeping the child.
+    """
+    for name, value in zip(node.child_fields, node.child_values()):
+        cls: type = value.__class__
+        if cls is list:
+            for i, item in enumerate(value):
+                if item is not None:
+                    yield value, i
+        elif cls is dict:
+            for key in value:
+                yield value, key
+        elif value is not None:
+            yield node, name
+
+
+def get_slot(holder: Any, key: Any) -> ASTNode:
+    return getattr(holder, key) if isinstance(holder, ASTNode) else holder[key]
+
+
+def set_slot(holder: Any, key: Any, node: Optional[ASTNode]) -> None:
+    if isinstance(holder, ASTNode):
+        setattr(holder, key, node)
+    else:
+        holder[key] = node
+
+
+def walk(root: ASTNode, postorder: bool = False,
+         prune: Optional[Callable[[ASTNode], bool]] = None) -> Iterator[ASTNode]:
+    """Yields the root and the nodes below it, each before its children or, in post order, after them.
+
+    The children of a node for which ``prune`` returns true are not walked. In
+    pre order a node may change its own children before they are walked.
+    """
+    if postorder:
+        yield from _walk_post(root, prune)
+        return
+    stack: List[ASTNode] = [root]
+    pop: Callable[[], ASTNode] = stack.pop
+    push: Callable[[Any], None] = stack.append
+    while stack:
+        node: ASTNode = pop()
+        yield node
+        if prune is not None and prune(node):
+            continue
+        # pushed last to first, so that they are popped in order
+        for value in reversed(node.child_values()):
+            cls: type = value.__class__
+            if cls is list:
+                stack.extend(item for item in reversed(value) if item is not None)
+            elif cls is dict:
+                stack.extend(reversed(value.values()))
+            elif value is not None:
+                push(value)
+
+
+def _walk_post(root: ASTNode, prune: Optional[Callable[[ASTNode], bool]]) -> Iterator[ASTNode]:
+    stack: List[Tuple[ASTNode, bool]] = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded or (prune is not None and prune(node)):
+            yield node
+            continue
+        stack.append((node, True))
+        for value in reversed(node.child_values()):
+            cls: type = value.__class__
+            if cls is list:
+                stack.extend((item, False) for item in reversed(value) if item is not None)
+            elif cls is dict:
+                stack.extend((item, False) for item in reversed(value.values()))
+            elif value is not None:
+                stack.append((value, False))
+
+
+def walk_declarations(root: ASTNode) -> Iterator[Tuple[ASTNode, Optional[ASTNode]]]:
+    """Yields (declaration, enclosing declaration or None) for the root and each node below it that
+    declares a name: DeclNode, TyclNode or named TypeNode, enclosing declarations first.
+
+    Expressions declare nothing, so they are not walked.
+    """
+    stack: List[Tuple[ASTNode, Optional[ASTNode]]] = [(root, None)]
+    pop: Callable[[], Tuple[ASTNode, Optional[ASTNode]]] = stack.pop
+    push: Callable[[Any], None] = stack.append
+    while stack:
+        node, container = pop()
+        if isinstance(node, ExprNode):
+            continue
+        if isinstance(node, (DeclNode, TyclNode)) or (isinstance(node, TypeNode) and node.name is not None):
+            yield node, container
+            container = node
+        for value in reversed(node.child_values()):
+            cls: type = value.__class__
+            if cls is list:
+                stack.extend((item, container) for item in reversed(value) if item is not None)
+            elif cls is dict:
+                stack.extend((item, container) for item in reversed(value.values()))
+            elif value is not None:
+                push((value, container))
+
+
+def clone_expr(expr: ExprNode) -> ExprNode:
+    """Returns a copy of an expression tree. Types and declarations are shared, not copied."""
+    copied: ExprNode = copy.copy(expr)
+    for name, value in zip(expr.child_fields, expr.child_values()):
+        if isinstance(value, list):
+            setattr(copied, name, [clone_expr(item) for item in value])
+        elif isinstance(value, ExprNode):
+            setattr(copied, name, clone_expr(value))
+    return copied
+
+
+def _benchmark_tree(depth: int) -> ExprNode:
+    """Returns a complete binary tree of additions over literals, built bottom up."""
+    i32 = IntegerTypeNode(0, 'i32', 4, True)
+    level: List[ExprNode] = [LiteralExprNode(0, i, i32) for i in range(2 ** (depth - 1))]
+    while len(level) > 1:
+        level = [AddBinaryExprNode(0, level[i], level[i + 1], '+') for i in range(0, len(level), 2)]
+    return level[0]
+
+
+def _best_of(repeat: int, func: Callable[[], Any]) -> Tuple[float, Any]:
+    samples: List[float] = []
+    result: Any = None
+    for _ in range(repeat):
+        start: float = perf_counter()
+        result = func()
+        samples.append(perf_counter() - start)
+    return min(samples), result
+
+
+def main() -> int:
+    tree: ExprNode = _benchmark_tree(BENCHMARK_DEPTH)
+
+    def recursive() -> int:
+        counter = _RecursiveCounter()
+        counter.visit(tree)
+        return counter.nodes
+
+    def walked() -> int:
+        return sum(1 for _ in walk(tree))
+
+    def walked_post() -> int:
+        return sum(1 for _ in walk(tree, postorder=True))
+
+    def visited() -> int:
+        counter = _LiteralCounter()
+        counter.visit(tree)
+        return counter.nodes
+
+    baseline: Optional[float] = None
+    for label, func in (('recursive dispatch', recursive), ('walk', walked), ('walk, post order', walked_post),
+                        ('Visitor', visited)):
+        seconds, nodes = _best_of(3, func)
+        baseline = baseline or seconds
+        print(f"{label:<20} {nodes:,} nodes in {seconds * 1e3:7.1f} ms,"
+              f" {nodes / seconds / 1e6:5.2f} M nodes/s ({baseline / seconds:.2f}x)")
+    return 0
+
+# endregion (functions)
+# ---------------------------------------------------------
+# region CLASSES
+
+
+class Visitor:
+    """Iterative pre and post order traversal with in-place rewriting.
+
+    Subclasses define ``enter_<NodeClass>(node)`` and ``leave_<NodeClass>(node)``
+    methods; a node gets the methods of the nearest class along its MRO that has
+    one, so ``enter_BinaryExprNode`` sees every binary expression.
+
+    An enter method may return ``PRUNE`` to skip the children of the node, or a
+    node to put in its place, whose children are walked instead. A leave method,
+    called once the children are done, may return a node to put in its place, or
+    ``REMOVE``. Returning None leaves the tree as it is.
+    """
+
+    def __init__(self):
+        self._dispatch: Dict[type, Tuple[Optional[Callable], Optional[Callable]]] = {}
+
+    def _methods(self, cls: type) -> Tuple[Optional[Callable], Optional[Callable]]:
+        enter: Optional[Callable] = None
+        leave: Optional[Callable] = None
+        for base in cls.__mro__:
+            if enter is None:
+                enter = getattr(self, 'enter_' + base.__name__, None)
+            if leave is None:
+                leave = getattr(self, 'leave_' + base.__name__, None)
+        methods = self._dispatch[cls] = (enter, leave)
+        return methods
+
+    def visit(self, root: ASTNode) -> Optional[ASTNode]:
+        """Walks the tree, returning the root or what replaced it (None if removed)."""
+        dispatch: Dict[type, Tuple[Optional[Callable], Optional[Callable]]] = self._dispatch
+        removed: Dict[int, list] = {}
+        box: List[Optional[ASTNode]] = [root]
+        # entries are (node, holder, key, leaving): the holder is the parent node, keyed by
+        # attribute name, or the list or dict keeping the node
+        stack: List[Tuple[ASTNode, Any, Any, bool]] = [(root, box, 0, False)]
+        pop: Callable[[], Tuple[ASTNode, Any, Any, bool]] = stack.pop
+        push: Callable[[Any], None] = stack.append
+
+        while stack:
+            node, holder, key, leaving = pop()
+            methods = dispatch.get(node.__class__) or self._methods(node.__class__)
+
+            if leaving:
+                result: Any = methods[1](node)
+                if result is None:
+                    continue
+                if result is REMOVE:
+                    if holder.__class__ is list:
+                        # taken out once the walk is over: the keys of the siblings are list indexes
+                        holder[key] = REMOVE
+                        removed[id(holder)] = holder
+                    elif holder.__class__ is dict:
+                        del holder[key]
+                    else:
+                        setattr(holder, key, None)
+                else:
+                    set_slot(holder, key, result)
+                continue
+
+            if methods[0] is not None:
+                result = methods[0](node)
+                if result is PRUNE:
+                    if methods[1] is not None:
+                        push((node, holder, key, True))
+                    continue
+                if result is not None and result is not node:
+                    set_slot(holder, key, result)
+                    node = result
+                    methods = dispatch.get(node.__class__) or self._methods(node.__class__)
+            if methods[1] is not None:
+                push((node, holder, key, True))
+
+            # pushed last to first, so that they are popped in order
+            fields: Tuple[str, ...] = node.child_fields
+            values: Tuple[Any, ...] = node.child_values()
+            i: int = len(values)
+            while i:
+                i -= 1
+                value: Any = values[i]
+                cls: type = value.__class__
+                if cls is list:
+                    for j in range(len(value) - 1, -1, -1):
+                        if value[j] is not None:
+                            push((value[j], value, j, False))
+                elif cls is dict:
+                    for name in reversed(value):
+                        push((value[name], value, name, False))
+                elif value is not None:
+                    push((value, node, fields[i], False))
+
+        top: Optional[ASTNode] = box[0] if box[0] is not REMOVE else None
+        for items in removed.values():
+            items[:] = [item for item in items if item is not REMOVE]
+        return top
+
+
+class _RecursiveCounter:
+    """The baseline: a visit method per node class, found by name, recursing into the children."""
+
+    def __init__(self):
+        self.literals: int = 0
+        self.nodes: int = 0
+
+    def visit(self, node: ASTNode) -> None:
+        getattr(self, 'visit_' + node.__class__.__name__, self.generic_visit)(node)
+
+    def generic_visit(self, node: ASTNode) -> None:
+        self.nodes += 1
+        for child in iter_children(node):
+            self.visit(child)
+
+    def visit_LiteralExprNode(self, node: LiteralExprNode) -> None:
+        self.nodes += 1
+        self.literals += 1
+
+
+class _LiteralCounter(Visitor):
+
+    def __init__(self):
+        super().__init__()
+        self.literals: int = 0
+        self.nodes: int = 0
+
+    def enter_ASTNode(self, node: ASTNode) -> None:
+        self.nodes += 1
+
+    def enter_LiteralExprNode(self, node: LiteralExprNode) -> Any:
+        self.nodes += 1
+        self.literals += 1
+        return PRUNE
+
+
+# endregion (classes)
+# ---------------------------------------------------------
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""Type Inference
+
+Annotates the expressions of a function or method with the type of their value
+(``ExprNode.type``), working from the types of literals, declarations and
+members up through operators, calls and indexing. Compilation then reads the
+annotation instead of looking at operand types on every evaluation.
+
+Each declaration is inferred once: ``infer_types`` remembers the ones it has
+done, until a pass rewrites the body and bumps its revision. Expressions whose
+type cannot be told keep None.
+"""
+from weakref import WeakKeyDictionary
+from typing import Optional, Any, Union, List, Dict
+
+from brah.c_astnodes import *
+from brah.o_traversal import Visitor
+
+
+__all__ = [
+    # constants
+    'BOOLEAN_TYPE',
+
+    # functions
+    'arithmetic_type',
+    'find_operator',
+    'infer_types',
+    'same_integer',
+    'unalias',
+
+    # classes
+    'TypeInference',
+]
+
+# ---------------------------------------------------------
+# region CONSTANTS & ENUMS
+
+
+BOOLEAN_TYPE: IntegerTypeNode = IntegerTypeNode(0, 'bool', 1, False)
+"""Type of comparisons and logical operations."""
+
+_LOGICAL = ('<', '<=', '==', '!=', '>=', '>', 'e', 'ou')
+
+# the revision of each declaration whose expressions are annotated
+_inferred: 'WeakKeyDictionary[DeclNode, int]' = WeakKeyDictionary()
+
+# endregion (constants)
+# ---------------------------------------------------------
+# region FUNCTIONS
+
+
+def unalias(typenode: Optional[Union[TypeNode, TyclNode]]) -> Optional[Union[TypeNode, TyclNode]]:
+    """Returns the type an alias stands for; other types are returned unchanged."""
+    while isinstance(typenode, AliasTypeNode):
+        typenode = typenode.basetype
+    return typenode
+
+
+def same_integer(first: Optional[Union[TypeNode, TyclNode]], second: Optional[Union[TypeNode, TyclNode]]) -> bool:
+    """Returns whether both are integer types of the same width and signedness."""
+    return (isinstance(first, IntegerTypeNode) and isinstance(second, IntegerTypeNode)
+            and first.bytesize == second.bytesize and first.signed == second.signed)
+
+
+def find_operator(tycl: Optional[Union[TypeNode, TyclNode]], operator: str) -> Optional[MethodDeclNode]:
+    """Returns the overload of an operator a class or structure declares or inherits, if any."""
+    while isinstance(tycl, TyclNode):
+        overload: Optional[MethodDeclNode] = tycl.operators.get(operator)
+        if overload is not None:
+            return overload
+        tycl = getattr(tycl, 'baseclass', None)
+    return None
+
+
+def arithmetic_type(operator: str, left: Optional[Union[TypeNode, TyclNode]],
+                    right: Optional[Union[TypeNode, TyclNode]]) -> Optional[Union[TypeNode, TyclNode]]:
+    """Returns the type of the result of a binary operator, given the operand types.
+
+    Mixed integer operations take the wider operand type (the left one for
+    equal widths); an integer and a float make a float; an enumeration mixed with
+    another type counts as its base type. An operator the class of
+    the left operand overloads has the type its overload returns.
+    """
+    left, right = unalias(left), unalias(right)
+    overload: Optional[MethodDeclNode] = find_operator(left, operator)
+    if overload is not None:
+        return overload.type
+    if operator in _LOGICAL:
+        return BOOLEAN_TYPE
+    if left is not right:
+        # an enumeration value used with another type counts as its declared value
+        if isinstance(left, EnumTypeNode):
+            left = unalias(left.basetype)
+        if isinstance(right, EnumTypeNode):
+            right = unalias(right.basetype)
+    if operator in ('<<', '>>'):
+        return left if isinstance(left, IntegerTypeNode) else None
+    if isinstance(left, IntegerTypeNode) and isinstance(right, IntegerTypeNode):
+        return right if right.bytesize > left.bytesize else left
+    if isinstance(left, FloatTypeNode) and isinstance(right, FloatTypeNode):
+        return right if right.bytesize > left.bytesize else left
+    if isinstance(left, FloatTypeNode) and isinstance(right, IntegerTypeNode):
+        return left
+    if isinstance(left, IntegerTypeNode) and isinstance(right, FloatTypeNode):
+        return right
+    if isinstance(left, StringTypeNode) and isinstance(right, StringTypeNode) and operator == '+':
+        return left
+    if isinstance(left, EnumTypeNode) and left is right:
+        return left
+    return None
+
+
+def infer_types(decl: DeclNode) -> None:
+    """Annotates the expressions of a function or method, unless already done since the body
+    was last rewritten."""
+    revision: int = getattr(decl, 'revision', 0)
+    if _inferred.get(decl) == revision:
+        return
+    _inferred[decl] = revision
+    # the walk goes through the parameter default values, then the body
+    TypeInference(decl).visit(decl)
+
+# endregion (functions)
+# ---------------------------------------------------------
+# region CLASSES
+
+
+class TypeInference(Visitor):
+    """Sets the type of each expression once its operands have theirs.
+
+    Local declarations are tracked by scope as the walk enters and leaves them;
+    other names are looked up in the scopes enclosing the declaration.
+
+    :ivar decl: the function or method inferred
+    """
+
+    def __init__(self, decl: DeclNode):
+        super().__init__()
+        self.decl: DeclNode = decl
+        self._scopes: List[Dict[str, Optional[Union[TypeNode, TyclNode]]]] = [
+            {name: param.type for name, param in getattr(decl, 'params', {}).items()}
+        ]
+
+    def lookup(self, name: str) -> Optional[Union[TypeNode, TyclNode]]:
+        for scope in reversed(self._scopes):
+            if name in scope:
+                return scope[name]
+        outer: Optional[ScopeNode] = getattr(self.decl, 'scope', None)
+        found: Any = outer.get_name(name) if outer is not None else None
+        if isinstance(found, (VarDeclNode, ConstDeclNode, EnumDeclNode)):
+            return unalias(found.type)
+        return None
+
+    def member(self, owner: Optional[Union[TypeNode, TyclNode]], name: str) -> Optional[Union[TypeNode, TyclNode]]:
+        """Returns the type of a field, property or method result of a class, structure or enumeration."""
+        owner = unalias(owner)
+        if isinstance(owner, PointerTypeNode):
+            owner = unalias(owner.basetype)
+        if isinstance(owner, TyclNode) and name in owner.members:
+            return unalias(owner.members[name].type)
+        return None
+
+    # region scopes
+
+    def _enter_scope(self, node: ASTNode) -> None:
+        self._scopes.append({})
+
+    def _leave_scope(self, node: ASTNode) -> None:
+        self._scopes.pop()
+
+    enter_BasicScopeNode = enter_ForStmtNode = enter_RepeatStmtNode = enter_ForEachStmtNode = _enter_scope
+    leave_BasicScopeNode = leave_ForStmtNode = leave_RepeatStmtNode = leave_ForEachStmtNode = _leave_scope
+
+    def leave_VarDeclNode(self, node: VarDeclNode) -> None:
+        self._scopes[-1][node.name] = unalias(node.type)
+
+    # endregion (scopes)
+
+    # region expressions
+
+    def leave_NameExprNode(self, expr: NameExprNode) -> None:
+        expr.type = self.lookup(expr.name)
+
+    def leave_FieldNameExprNode(self, expr: FieldNameExprNode) -> None:
+        expr.type = self.member(getattr(self.decl, 'thisdecl', None), expr.name)
+
+    leave_PropertyNameExprNode = leave_FieldNameExprNode
+
+    def leave_LValueExprNode(self, expr: LValueExprNode) -> None:
+        expr.type = expr.exprtarget.type
+
+    def leave_UnaryExprNode(self, expr: UnaryExprNode) -> None:
+        if isinstance(expr, (NegateUnaryExprNode, IncrUnaryExprNode, DecrUnaryExprNode)):
+            expr.type = unalias(expr.operand.type)
+        elif isinstance(expr, DereferenceUnaryExprNode) and isinstance(expr.operand.type, PointerTypeNode):
+            expr.type = unalias(expr.operand.type.basetype)
+
+    def leave_BinaryExprNode(self, expr: BinaryExprNode) -> None:
+        operator: str = expr.operator
+        if expr.is_inplace and operator.endswith('='):
+            operator = operator[:-1]
+        expr.type = arithmetic_type(operator, expr.left.type, expr.right.type)
+
+    def leave_TernaryExprNode(self, expr: TernaryExprNode) -> None:
+        thentype = unalias(expr.thenexpr.type)
+        elsetype = unalias(expr.elseexpr.type)
+        if thentype is elsetype or same_integer(thentype, elsetype):
+            expr.type = thentype
+        elif isinstance(thentype, (IntegerTypeNode, FloatTypeNode)):
+            expr.type = arithmetic_type('+', thentype, elsetype)
+
+    def leave_DirectCallExprNode(self, expr: DirectCallExprNode) -> None:
+        callee: ExprNode = expr.funcnameexpr
+        if isinstance(callee, MemberExprNode):
+            expr.type = callee.type
+            return
+        found: Any = self.lookup_global(callee.name)
+        if isinstance(found, (FunctionDeclNode, MethodDeclNode)):
+            expr.type = unalias(found.type)
+        elif isinstance(found, (ClassTyclNode, StructureTyclNode)):
+            expr.type = found
+        elif isinstance(self.decl, MethodDeclNode) and callee.name in self.decl.thisdecl.methods:
+            expr.type = unalias(self.decl.thisdecl.methods[callee.name].type)
+
+    def lookup_global(self, name: str) -> Any:
+        for scope in self._scopes:
+            if name in scope:
+                return None
+        outer: Optional[ScopeNode] = getattr(self.decl, 'scope', None)
+        return outer.get_name(name) if outer is not None else None
+
+    def leave_IndirectCallExprNode(self, expr: IndirectCallExprNode) -> None:
+        signature = unalias(expr.callableexpr.type)
+        if isinstance(signature, SignatureTypeNode):
+            expr.type = unalias(signature.restype)
+        else:
+            expr.type = expr.callableexpr.type if isinstance(expr.callableexpr, MemberExprNode) else None
+
+    def leave_IndexExprNode(self, expr: IndexExprNode) -> None:
+        base = unalias(expr.baseexpr.type)
+        if isinstance(base, (ArrayTypeNode, PointerTypeNode)):
+            expr.type = unalias(base.basetype)
+        elif isinstance(base, StringTypeNode):
+            expr.type = base
+
+    def leave_MemberExprNode(self, expr: MemberExprNode) -> None:
+        name: str = expr.memberexpr.name
+        if isinstance(expr.baseexpr, NameExprNode) and expr.baseexpr.type is None:
+            found: Any = self.lookup_global(expr.baseexpr.name)
+            if isinstance(found, EnumTypeNode) and name in found.members:
+                expr.type = expr.memberexpr.type = found
+                return
+        expr.type = expr.memberexpr.type = self.member(expr.baseexpr.type, name)
+
+    # endregion (expressions)
+
+
+# endregion (classes)
+# ---------------------------------------------------------
@@ -0,0 +1,439 @@
+"""Module Locator
+
+Finds the source files ``importe`` statements name, without probing the file
+system on every import.
+
+A ``ModuleLocator`` scans the source tree of an assembly (``AsmbNode.src_dir``)
+once, keeping the ``stat`` result of every ``.brah`` file and directory it finds
+and indexing the files by qualified name (``a/b/c.brah`` is ``a.b.c``) and by
+absolute path. Both forms of import are then dict lookups::
+
+    locator = ModuleLocator(asmb.src_dir)
+    locator.locate('util.texto')                # importe util.texto;
+    locator.locate_path('../util/texto.brah', importer='app.principal')
+
+For hot reload, ``refresh`` asks a watcher which paths changed since the last
+call and updates only their entries, dropping the modules built from them from
+the assembly. The watcher uses inotify where the C library has it and
+compares ``stat`` results otherwise.
+
+Run ``python -m brah.q_modules [root]`` to time lookups through the index
+against building a path from the name and checking it on the file system.
+"""
+import os
+import sys
+import errno
+import struct
+import ctypes
+import ctypes.util
+from abc import ABC, abstractmethod
+from stat import S_ISDIR
+from argparse import ArgumentParser
+from time import perf_counter
+from typing import Optional, Any, List, Dict, Set, Callable
+
+from brah.c_astnodes import *
+from brah.f_utils import SourceCode
+
+
+__all__ = [
+    # constants
+    'SOURCE_EXTENSION',
+
+    # functions
+    'create_watcher',
+    'main',
+    'qualified_name',
+
+    # classes
+    'InotifyWatcher',
+    'ModuleLocator',
+    'PollingWatcher',
+    'Watcher',
+]
+
+# ---------------------------------------------------------
+# region CONSTANTS & ENUMS
+
+
+SOURCE_EXTENSION: str = '.brah'
+"""Extension of Brah source files."""
+
+_IN_MODIFY: int = 0x002
+_IN_CLOSE_WRITE: int = 0x008
+_IN_MOVED_FROM: int = 0x040
+_IN_MOVED_TO: int = 0x080
+_IN_CREATE: int = 0x100
+_IN_DELETE: int = 0x200
+_IN_DELETE_SELF: int = 0x400
+_IN_ISDIR: int = 0x40000000
+_IN_NONBLOCK: int = os.O_NONBLOCK
+_IN_MASK: int = (_IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+                 | _IN_DELETE_SELF)
+
+_EVENT = struct.Struct('iIII')
+
+# endregion (constants)
+# ---------------------------------------------------------
+# region FUNCTIONS
+
+
+def qualified_name(root: str, filepath: str) -> str:
+    """Returns the qualified module name of a source file below the root: ``a/b/c.brah`` is ``a.b.c``."""
+    relative: str = os.path.relpath(filepath, root)
+    return os.path.splitext(relative)[0].replace(os.sep, '.')
+
+
+def _libc() -> Optional[Any]:
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def create_watcher(locator: 'ModuleLocator') -> 'Watcher':
+    """Returns an inotify watcher over the source tree when available, a polling one otherwise."""
+    libc = _libc()
+    if libc is not None:
+        try:
+            return InotifyWatcher(locator, libc)
+        except OSError:
+            pass
+    return PollingWatcher(locator)
+
+
+def _probe(root: str, qualname: str, extension: str = SOURCE_EXTENSION) -> Optional[str]:
+    """The lookup the index replaces: a path built from the name, checked on the file system."""
+    filepath: str = os.path.join(root, *qualname.split('.')) + extension
+    return filepath if os.path.isfile(filepath) else None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = ArgumentParser(description="Times module lookups through the index against file system probes.")
+    parser.add_argument('root', nargs='?', default='examples', help="source directory")
+    parser.add_argument('-n', '--lookups', type=int, default=100_000, help="lookups per measurement")
+    args = parser.parse_args(argv)
+
+    start: float = perf_counter()
+    locator = ModuleLocator(args.root, watch=False)
+    print(f"indexed {len(locator.modules)} modules in {(perf_counter() - start) * 1e3:.2f} ms")
+    names: List[str] = sorted(locator.modules) + ['nao.existe']
+    count: int = args.lookups // len(names) * len(names)
+    for label, lookup in (('probe', lambda name: _probe(locator.root, name)), ('index', locator.locate)):
+        start = perf_counter()
+        for _ in range(count // len(names)):
+            for name in names:
+                lookup(name)
+        seconds: float = perf_counter() - start
+        print(f"{label:<8} {count:,} lookups in {seconds * 1e3:8.2f} ms, {seconds / count * 1e9:7.0f} ns each")
+
+    locator.watcher = create_watcher(locator)
+    start = perf_counter()
+    locator.refresh()
+    print(f"{type(locator.watcher).__name__} refresh with nothing changed: {(perf_counter() - start) * 1e6:.0f} us")
+    locator.close()
+    return 0
+
+# endregion (functions)
+# ---------------------------------------------------------
+# region CLASSES
+
+
+class ModuleLocator:
+    """The source files of a tree, indexed by qualified name and path.
+
+    :ivar root: the absolute path of the source directory
+    :ivar extension: the extension of source files
+    :ivar modules: the path of each source file, by qualified name
+    :ivar paths: the qualified name of each source file, by absolute path
+    :ivar stats: the cached ``stat`` result of the files and directories of the tree
+    :ivar asmb: the assembly the modules are loaded into, if any
+    """
+
+    def __init__(self, root: str, extension: str = SOURCE_EXTENSION, asmb: Optional[AsmbNode] = None,
+                 watch: bool = True):
+        self.root: str = os.path.abspath(root)
+        self.extension: str = extension
+        self.asmb: Optional[AsmbNode] = asmb
+        self.modules: Dict[str, str] = {}
+        self.paths: Dict[str, str] = {}
+        self.stats: Dict[str, os.stat_result] = {}
+        self.scan(self.root)
+        self.watcher: Optional[Watcher] = create_watcher(self) if watch else None
+
+    def __repr__(self):
+        return f"{self.__class__.__qualname__}({self.root!r}, modules={len(self.modules)})"
+
+    def __contains__(self, qualname: str) -> bool:
+        return qualname in self.modules
+
+    def scan(self, directory: str) -> None:
+        """Indexes the source files below a directory. ``scandir`` entries carry their stat results,
+        so a scan costs one listing per directory."""
+        stack: List[str] = [directory]
+        while stack:
+            current: str = stack.pop()
+            try:
+                self.stats[current] = os.stat(current)
+                entries: List[os.DirEntry] = list(os.scandir(current))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(self.extension) and entry.is_file():
+                    self._add(entry.path, entry.stat())
+
+    def _add(self, filepath: str, stat: os.stat_result) -> None:
+        qualname: str = qualified_name(self.root, filepath)
+        self.stats[filepath] = stat
+        self.modules[qualname] = filepath
+        self.paths[filepath] = qualname
+
+    def _remove(self, filepath: str) -> Optional[str]:
+        self.stats.pop(filepath, None)
+        qualname: Optional[str] = self.paths.pop(filepath, None)
+        if qualname is not None:
+            del self.modules[qualname]
+        return qualname
+
+    def stat(self, path: str) -> Optional[os.stat_result]:
+        """Returns the cached stat result of a path, statting it on the first request."""
+        stat: Optional[os.stat_result] = self.stats.get(path)
+        if stat is None:
+            try:
+                stat = self.stats[path] = os.stat(path)
+            except OSError:
+                return None
+        return stat
+
+    # region lookups
+
+    def locate(self, qualname: str) -> Optional[str]:
+        """Returns the path of the source file of a qualified name (``importe a.b.c``)."""
+        return self.modules.get(qualname)
+
+    def locate_path(self, filepath: str, importer: Optional[str] = None) -> Optional[str]:
+        """Returns the qualified name of a source file named by path (``importe ... de FILEPATH``),
+        relative to the directory of the importing module, then to the root."""
+        bases: List[str] = []
+        if importer is not None and importer in self.modules:
+            bases.append(os.path.dirname(self.modules[importer]))
+        bases.append(self.root)
+        for base in bases:
+            qualname: Optional[str] = self.paths.get(os.path.normpath(os.path.join(base, filepath)))
+            if qualname is not None:
+                return qualname
+        return None
+
+    def load(self, qualname: str, parse: Optional[Callable[[SourceCode], ModuleScopeNode]] = None) -> ModuleNode:
+        """Returns the module of a qualified name, reading (and parsing, given a parser) its source
+        the first time. Loaded modules are kept in the assembly, under their qualified name."""
+        if self.asmb is not None and qualname in self.asmb.modules:
+            return self.asmb[qualname]
+        filepath: Optional[str] = self.locate(qualname)
+        if filepath is None:
+            raise KeyError(f"Module not found: '{qualname}'")
+        source: SourceCode = SourceCode.load(filepath, encoding='utf-8')
+        module = ModuleNode(qualname, parse(source) if parse is not None else None, source)
+        if self.asmb is not None:
+            self.asmb[qualname] = module
+        return module
+
+    # endregion (lookups)
+
+    def refresh(self) -> Set[str]:
+        """Updates the entries of the paths changed since the last refresh, returning the
+        qualified names of the modules changed, added or removed. Their modules leave the
+        assembly, to be loaded again."""
+        if self.watcher is None:
+            return set()
+        changed: Set[str] = set()
+        for path in self.watcher.changes():
+            changed.update(self.invalidate(path))
+        if self.asmb is not None:
+            for qualname in changed:
+                if qualname in self.asmb.modules:
+                    del self.asmb[qualname]
+        return changed
+
+    def invalidate(self, path: str) -> Set[str]:
+        """Indexes a changed path again, returning the qualified names of the modules affected.
+
+        A directory is listed again without descending into the subdirectories
+        already known: files that left it are dropped, new files and
+        subdirectories are indexed.
+        """
+        affected: Set[str] = set()
+        try:
+            stat: Optional[os.stat_result] = os.stat(path)
+        except OSError:
+            stat = None
+        known: bool = path in self.stats
+
+        if known and path not in self.paths or stat is not None and S_ISDIR(stat.st_mode):
+            if stat is None or not S_ISDIR(stat.st_mode):
+                affected.update(self._forget(path))
+                if stat is not None:
+                    affected.update(self.invalidate(path))
+                return affected
+            self.stats[path] = stat
+            if not known:
+                before: Set[str] = set(self.modules)
+                self.scan(path)
+                return set(self.modules) - before
+            present: Set[str] = set()
+            for entry in os.scandir(path):
+                present.add(entry.path)
+                if entry.path in self.stats:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    affected.update(self.invalidate(entry.path))
+                elif entry.name.endswith(self.extension) and entry.is_file():
+                    self._add(entry.path, entry.stat())
+                    affected.add(self.paths[entry.path])
+            prefix: str = path + os.sep
+            for child in [child for child in self.stats if child.startswith(prefix)]:
+                if os.path.dirname(child) == path and child not in present and child in self.stats:
+                    affected.update(self._forget(child))
+            return affected
+
+        qualname: Optional[str] = self._remove(path)
+        if qualname is not None:
+            affected.add(qualname)
+        if stat is not None and path.endswith(self.extension):
+            self._add(path, stat)
+            affected.add(self.paths[path])
+        return affected
+
+    def _forget(self, path: str) -> Set[str]:
+        """Drops a path and everything below it from the index."""
+        prefix: str = path + os.sep
+        forgotten: Set[str] = set()
+        for child in [child for child in self.stats if child == path or child.startswith(prefix)]:
+            qualname: Optional[str] = self._remove(child)
+            if qualname is not None:
+                forgotten.add(qualname)
+        return forgotten
+
+    def close(self) -> None:
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+
+
+class Watcher(ABC):
+    """Reports the paths of a source tree changed since the previous call."""
+
+    @abstractmethod
+    def changes(self) -> Set[str]:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class PollingWatcher(Watcher):
+    """Compares the modification time and size of the indexed files and directories with the
+    ones in the locator's stat cache. A file added or removed changes its directory."""
+
+    def __init__(self, locator: ModuleLocator):
+        self.locator: ModuleLocator = locator
+
+    def changes(self) -> Set[str]:
+        changed: Set[str] = set()
+        for path, seen in self.locator.stats.items():
+            try:
+                stat: os.stat_result = os.stat(path)
+            except OSError:
+                changed.add(path)
+                continue
+            if stat.st_mtime_ns != seen.st_mtime_ns or stat.st_size != seen.st_size:
+                changed.add(path)
+        return changed
+
+
+class InotifyWatcher(Watcher):
+    """Watches every directory of the tree with inotify, reading queued events without blocking.
+
+    :ivar fd: the inotify file descriptor
+    :ivar directories: the directory of each watch descriptor
+    """
+
+    def __init__(self, locator: ModuleLocator, libc: Any):
+        self.locator: ModuleLocator = locator
+        self.libc: Any = libc
+        self.fd: int = libc.inotify_init1(_IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories: Dict[int, str] = {}
+        for path in list(locator.stats):
+            if path == locator.root or path not in locator.paths:
+                self.watch(path)
+
+    def watch(self, directory: str) -> None:
+        descriptor: int = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), _IN_MASK)
+        if descriptor >= 0:
+            self.directories[descriptor] = directory
+
+    def _read(self) -> bytes:
+        chunks: List[bytes] = []
+        while True:
+            try:
+                chunk: bytes = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            except OSError as error:
+                if error.errno == errno.EINTR:
+                    continue
+                raise
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def changes(self) -> Set[str]:
+        changed: Set[str] = set()
+        data: bytes = self._read()
+        offset: int = 0
+        while offset < len(data):
+            descriptor, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name: str = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            directory: Optional[str] = self.directories.get(descriptor)
+            if directory is None:
+                continue
+            if mask & _IN_DELETE_SELF:
+                del self.directories[descriptor]
+                changed.add(directory)
+                continue
+            path: str = os.path.join(directory, name) if name else directory
+            if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO):
+                self._watch_tree(path)
+            changed.add(path)
+        return changed
+
+    def _watch_tree(self, directory: str) -> None:
+        self.watch(directory)
+        for current, subdirectories, _ in os.walk(directory):
+            for subdirectory in subdirectories:
+                self.watch(os.path.join(current, subdirectory))
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+# endregion (classes)
+# ---------------------------------------------------------
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,472 @@
+"""Symbol Index
+
+Answers the questions an editor asks about an assembly (go to definition,
+find references, completion) without walking the tree for each of them.
+
+``SymbolIndex`` keeps every declaration of the modules it indexed (functions,
+variables, constants, parameters, types, classes and their members, enumeration
+members) as a ``Symbol``, under a key made of the module and the path of names
+leading to it (``geometria:Vetor.soma``), and every name or member expression
+that resolves to one of them as a ``Reference``. Keys are strings, so an entry
+outlives the nodes it was made from: references from other modules still point
+at ``geometria:Vetor.soma`` after ``geometria`` is rebuilt.
+
+Lookups are dict accesses; prefix search bisects the sorted symbol names.
+``update`` replaces the entries of a single module, leaving the others as they
+are. The index is saved to and loaded from JSON; a loaded index is tied to the
+nodes of a new assembly with ``attach``, which goes over declarations only.
+
+Run ``python -m brah.r_symbols`` to time building, updating and querying the
+index of a generated assembly with thousands of declarations.
+"""
+import sys
+import json
+import statistics
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Optional, Any, List, Dict, Set, Tuple, Iterator, Callable
+
+from brah.c_astnodes import *
+from brah.f_utils import SourceCode
+from brah.o_traversal import Visitor, walk_declarations
+from brah.p_types import infer_types, unalias
+
+
+__all__ = [
+    # constants
+    'INDEX_VERSION',
+
+    # functions
+    'main',
+
+    # classes
+    'Reference',
+    'Symbol',
+    'SymbolIndex',
+]
+
+# ---------------------------------------------------------
+# region CONSTANTS & ENUMS
+
+
+INDEX_VERSION: int = 1
+"""Version of the saved index format; files of other versions are not loaded."""
+
+Position = Tuple[int, int]
+"""One-based line and column of a node in its module."""
+
+# endregion (constants)
+# ---------------------------------------------------------
+# region FUNCTIONS
+
+
+def _position(module: ModuleNode, node: SourceNode) -> Optional[Position]:
+    resolved: Optional[Tuple[str, int, int]] = module.locations.resolve(node.location)
+    return resolved[1:] if resolved is not None else None
+
+
+def _benchmark_assembly(modules: int, functions: int) -> AsmbNode:
+    """Returns an assembly of modules declaring a class and functions calling each other and using
+    the class, each node placed on its own line of a generated source."""
+    i32 = IntegerTypeNode(-1, 'i32', 4, True)
+    asmb = AsmbNode()
+    for m in range(modules):
+        name: str = f"modulo{m}"
+        source = SourceCode('\n' * (functions * 4 + 8), f"{name}.brah")
+        line: List[int] = [0]
+
+        def at() -> int:
+            line[0] += 1
+            return source.location(line[0])
+
+        scope = ModuleScopeNode(at())
+        tycl = ClassTyclNode(at(), f"Ponto{m}")
+        tycl.declare(FieldDeclNode(at(), 0, tycl, 'x', i32))
+        tycl.declare(FieldDeclNode(at(), 1, tycl, 'y', i32))
+        scope.declarations[tycl.name] = tycl
+        for f in range(functions):
+            body = FunctionScopeNode(at(), scope)
+            body.declarations['p'] = VarDeclNode(at(), 0, 'p', tycl)
+            callee: str = f"funcao{m}_{(f + 1) % functions}"
+            body.statements.append(ReturnStmtNode(at(), AddBinaryExprNode(
+                at(), MemberExprNode(at(), VarNameExprNode(at(), 'p'), FieldNameExprNode(at(), 'x')),
+                DirectCallExprNode(at(), FunctionNameExprNode(at(), callee), [ParamNameExprNode(at(), 'n')]), '+'
+            )))
+            decl = FunctionDeclNode(at(), f, f"funcao{m}_{f}", i32, {'n': ParamDeclNode(at(), 0, 'n', i32)}, body)
+            scope.declarations[decl.name] = decl
+        asmb[name] = ModuleNode(name, scope, source)
+    return asmb
+
+
+def _median_us(repeat: int, func: Callable[[], Any]) -> float:
+    samples: List[float] = []
+    for _ in range(repeat):
+        start: float = perf_counter()
+        func()
+        samples.append(perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def main() -> int:
+    asmb: AsmbNode = _benchmark_assembly(50, 200)
+    index = SymbolIndex()
+    start: float = perf_counter()
+    index.build(asmb)
+    print(f"indexed {len(index.symbols):,} symbols and {index.reference_count():,} references"
+          f" in {(perf_counter() - start) * 1e3:.1f} ms")
+
+    rebuilt: AsmbNode = _benchmark_assembly(1, 200)
+    start = perf_counter()
+    index.update('modulo0', rebuilt['modulo0'])
+    print(f"update of one module: {(perf_counter() - start) * 1e3:.2f} ms")
+
+    queries: Dict[str, Callable[[], Any]] = {
+        'search("funcao4")': lambda: index.search('funcao4'),
+        'definition': lambda: index.definition('modulo7:funcao7_3'),
+        'references': lambda: index.references('modulo7:Ponto7.x'),
+        'at(line, column)': lambda: index.at('modulo7', 40, 1),
+    }
+    for label, query in queries.items():
+        print(f"{label:<20} {_median_us(1000, query):7.2f} us")
+    return 0
+
+# endregion (functions)
+# ---------------------------------------------------------
+# region CLASSES
+
+
+@dataclass
+class Symbol:
+    """A declaration, as the index keeps it."""
+
+    key: str
+    """Module and path of names leading to the declaration: ``module:Class.method.local``."""
+
+    name: str
+    kind: str
+    """Name of the node class, e.g. ``FunctionDecl`` or ``ClassTycl``."""
+
+    module: str
+    position: Optional[Position]
+    container: Optional[str] = None
+    """Key of the enclosing declaration, if any."""
+
+    node: Optional[ASTNode] = field(default=None, repr=False, compare=False)
+    """The declaration itself, unless the symbol was loaded and not attached yet."""
+
+
+@dataclass
+class Reference:
+    """A name or member expression that resolves to a declaration."""
+
+    key: str
+    """Key of the symbol referenced."""
+
+    module: str
+    position: Optional[Position]
+    name: str
+    member: bool = False
+
+
+class SymbolIndex:
+    """Declarations and references of the modules of an assembly, by key, name and position.
+
+    :ivar symbols: every symbol, by key
+    """
+
+    def __init__(self):
+        self.symbols: Dict[str, Symbol] = {}
+        self._names: List[str] = []
+        self._by_name: Dict[str, List[str]] = {}
+        self._declared: Dict[str, List[str]] = {}
+        self._references: Dict[str, Dict[str, List[Reference]]] = {}
+        self._referenced: Dict[str, List[Reference]] = {}
+        self._placed: Dict[str, List[Reference]] = {}
+        self._positions: Dict[str, List[Position]] = {}
+        self._keys: Dict[int, str] = {}
+
+    def __repr__(self):
+        return f"{self.__class__.__qualname__}(modules={len(self._declared)}, symbols={len(self.symbols)})"
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.symbols
+
+    # region queries
+
+    def definition(self, key: str) -> Optional[Symbol]:
+        return self.symbols.get(key)
+
+    def references(self, key: str) -> List[Reference]:
+        """Returns the references to a symbol, module by module."""
+        return [reference for references in self._references.get(key, {}).values() for reference in references]
+
+    def reference_count(self) -> int:
+        return sum(len(references) for references in self._referenced.values())
+
+    def search(self, prefix: str, limit: Optional[int] = 50) -> List[Symbol]:
+        """Returns the symbols whose name starts with the prefix, ignoring case, in name order."""
+        prefix = prefix.casefold()
+        names: List[str] = self._names
+        found: List[Symbol] = []
+        for i in range(bisect_left(names, prefix), len(names)):
+            if not names[i].startswith(prefix):
+                break
+            found.extend(self.symbols[key] for key in self._by_name[names[i]])
+            if limit is not None and len(found) >= limit:
+                return found[:limit]
+        return found
+
+    def at(self, module: str, line: int, column: int) -> Optional[Symbol]:
+        """Returns the symbol referenced by the name found at a position of a module (go to definition)."""
+        positions: List[Position] = self._positions.get(module, [])
+        i: int = bisect_right(positions, (line, column)) - 1
+        if i < 0:
+            return None
+        reference: Reference = self._placed[module][i]
+        start_line, start_column = reference.position
+        if start_line != line or column >= start_column + len(reference.name):
+            return None
+        return self.symbols.get(reference.key)
+
+    # endregion (queries)
+
+    # region updates
+
+    def build(self, asmb: AsmbNode) -> None:
+        """Indexes every module of an assembly: declarations first, so that references across
+        modules find them."""
+        for name, module in asmb.modules.items():
+            self.remove(name)
+            self._declare(name, module)
+        for name, module in asmb.modules.items():
+            self._refer(name, module)
+
+    def update(self, name: str, module: ModuleNode) -> None:
+        """Replaces the entries of a rebuilt module."""
+        self.remove(name)
+        self._declare(name, module)
+        self._refer(name, module)
+
+    def attach(self, asmb: AsmbNode) -> None:
+        """Ties the symbols of a loaded index to the declarations of an assembly, so that modules
+        updated afterwards resolve their references into the others."""
+        for name, module in asmb.modules.items():
+            for key, _, decl, _ in self._walk_declarations(name, module):
+                symbol: Optional[Symbol] = self.symbols.get(key)
+                if symbol is not None:
+                    symbol.node = decl
+                    self._keys[id(decl)] = key
+
+    def remove(self, name: str) -> None:
+        """Drops the declarations of a module and the references made from it. References from
+        other modules to its symbols are kept: they are resolved again by key."""
+        for key in self._declared.pop(name, ()):
+            symbol: Symbol = self.symbols.pop(key)
+            if symbol.node is not None:
+                self._keys.pop(id(symbol.node), None)
+            folded: str = symbol.name.casefold()
+            keys: List[str] = self._by_name[folded]
+            keys.remove(key)
+            if not keys:
+                del self._by_name[folded]
+                del self._names[bisect_left(self._names, folded)]
+        for reference in self._referenced.pop(name, ()):
+            modules: Optional[Dict[str, List[Reference]]] = self._references.get(reference.key)
+            if modules is not None:
+                modules.pop(name, None)
+                if not modules:
+                    del self._references[reference.key]
+        self._placed.pop(name, None)
+        self._positions.pop(name, None)
+
+    def _add(self, symbol: Symbol) -> None:
+        self.symbols[symbol.key] = symbol
+        self._declared.setdefault(symbol.module, []).append(symbol.key)
+        if symbol.node is not None:
+            self._keys[id(symbol.node)] = symbol.key
+        folded: str = symbol.name.casefold()
+        keys: Optional[List[str]] = self._by_name.get(folded)
+        if keys is None:
+            keys = self._by_name[folded] = []
+            self._names.insert(bisect_left(self._names, folded), folded)
+        keys.append(symbol.key)
+
+    def _refer(self, name: str, module: ModuleNode) -> None:
+        collector = _ReferenceCollector(self, name, module)
+        collector.collect()
+        self._add_references(name, collector.found)
+
+    def _add_references(self, name: str, references: List[Reference]) -> None:
+        self._referenced[name] = references
+        placed: List[Reference] = sorted(
+            (reference for reference in references if reference.position is not None),
+            key=lambda reference: reference.position
+        )
+        self._placed[name] = placed
+        self._positions[name] = [reference.position for reference in placed]
+        for reference in references:
+            self._references.setdefault(reference.key, {}).setdefault(name, []).append(reference)
+
+    def _declare(self, name: str, module: ModuleNode) -> None:
+        self._declared.setdefault(name, [])
+        for key, declname, decl, container in self._walk_declarations(name, module):
+            if key in self.symbols:
+                continue
+            self._add(Symbol(key, declname, decl._node_name, name, _position(module, decl), container, decl))
+
+    def _walk_declarations(self, name: str, module: ModuleNode
+                           ) -> Iterator[Tuple[str, str, ASTNode, Optional[str]]]:
+        """Yields (key, name, node, container key) for each declaration of a module, enclosing
+        declarations before the ones they hold. Locals declared twice in a function get a ``#n`` suffix."""
+        if module.scope is None:
+            return
+        keys: Dict[int, str] = {}
+        seen: Dict[Tuple[str, str], int] = {}
+        for decl, container in walk_declarations(module.scope):
+            path: str = decl.name
+            outer: Optional[str] = keys.get(id(container)) if container is not None else None
+            if outer is not None and isinstance(decl, VarDeclNode):
+                count: int = seen.get((outer, path), 0)
+                seen[outer, path] = count + 1
+                if count:
+                    path = f"{path}#{count}"
+            key: str = f"{outer}.{path}" if outer is not None else f"{name}:{path}"
+            keys[id(decl)] = key
+            yield key, decl.name, decl, outer
+
+    # endregion (updates)
+
+    # region persistence
+
+    def save(self, filepath: str) -> None:
+        data: Dict[str, Any] = {
+            'version': INDEX_VERSION,
+            'symbols': [[symbol.key, symbol.name, symbol.kind, symbol.module, symbol.position, symbol.container]
+                        for symbol in self.symbols.values()],
+            'references': {module: [[ref.key, ref.position, ref.name, ref.member] for ref in references]
+                           for module, references in self._referenced.items()},
+        }
+        with open(filepath, 'w', encoding='utf-8') as file:
+            json.dump(data, file, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, filepath: str) -> 'SymbolIndex':
+        with open(filepath, encoding='utf-8') as file:
+            data: Dict[str, Any] = json.load(file)
+        if data.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported symbol index version: {data.get('version')!r}")
+        index = cls()
+        for key, name, kind, module, position, container in data['symbols']:
+            index._add(Symbol(key, name, kind, module, tuple(position) if position else None, container))
+        for module, references in data['references'].items():
+            index._add_references(module, [Reference(key, module, tuple(position) if position else None, name, member)
+                                           for key, position, name, member in references])
+        return index
+
+    # endregion (persistence)
+
+
+class _ReferenceCollector(Visitor):
+    """Resolves the names and members used in the bodies and initializers of a module.
+
+    Names are looked up in the scopes the walk is in, then in the scopes enclosing the
+    function, method, field or property the walk is in; members in the class, structure or
+    enumeration of the base expression type, as inferred by ``infer_types``, and its base
+    classes.
+    """
+
+    def __init__(self, index: SymbolIndex, name: str, module: ModuleNode):
+        super().__init__()
+        self.index: SymbolIndex = index
+        self.name: str = name
+        self.module: ModuleNode = module
+        self.found: List[Reference] = []
+        self.decl: Optional[DeclNode] = None
+        self._decls: List[Optional[DeclNode]] = []
+        self._scopes: List[Dict[str, DeclNode]] = []
+        self._members: Set[int] = set()
+
+    def collect(self) -> None:
+        if self.module.scope is not None:
+            self.visit(self.module.scope)
+
+    def refer(self, expr: NameExprNode, decl: Any, member: bool = False) -> None:
+        key: Optional[str] = self.index._keys.get(id(decl)) if decl is not None else None
+        if key is not None:
+            self.found.append(Reference(key, self.name, _position(self.module, expr), expr.name, member))
+
+    def lookup(self, name: str) -> Any:
+        for scope in reversed(self._scopes):
+            if name in scope:
+                return scope[name]
+        outer: Optional[ScopeNode] = getattr(self.decl, 'scope', None) or self.module.scope
+        return outer.get_name(name)
+
+    @staticmethod
+    def member(owner: Any, name: str) -> Any:
+        owner = unalias(owner)
+        if isinstance(owner, PointerTypeNode):
+            owner = unalias(owner.basetype)
+        while isinstance(owner, (TyclNode, EnumTypeNode)):
+            if name in owner.members:
+                return owner.members[name]
+            owner = getattr(owner, 'baseclass', None)
+        return None
+
+    def _enter_decl(self, decl: DeclNode) -> None:
+        # the scopes of the walk restart at each function, method, field or property
+        self._decls.append(self.decl)
+        self.decl = decl
+        self._scopes.append(dict(getattr(decl, 'params', None) or {}))
+        if isinstance(decl, (FunctionDeclNode, MethodDeclNode)) and decl.scope is not None:
+            infer_types(decl)
+
+    def _leave_decl(self, decl: DeclNode) -> None:
+        self._scopes.pop()
+        self.decl = self._decls.pop()
+
+    enter_FunctionDeclNode = enter_MethodDeclNode = enter_FieldDeclNode = enter_PropertyDeclNode = _enter_decl
+    leave_FunctionDeclNode = leave_MethodDeclNode = leave_FieldDeclNode = leave_PropertyDeclNode = _leave_decl
+
+    def _enter_scope(self, node: ASTNode) -> None:
+        self._scopes.append({})
+
+    def _leave_scope(self, node: ASTNode) -> None:
+        self._scopes.pop()
+
+    enter_BasicScopeNode = enter_ForStmtNode = enter_RepeatStmtNode = enter_ForEachStmtNode = _enter_scope
+    leave_BasicScopeNode = leave_ForStmtNode = leave_RepeatStmtNode = leave_ForEachStmtNode = _leave_scope
+
+    def enter_VarDeclNode(self, node: VarDeclNode) -> None:
+        if self._scopes:
+            self._scopes[-1][node.name] = node
+
+    def enter_MemberExprNode(self, expr: MemberExprNode) -> None:
+        self._members.add(id(expr.memberexpr))
+
+    def leave_MemberExprNode(self, expr: MemberExprNode) -> None:
+        self._members.discard(id(expr.memberexpr))
+        owner: Any = expr.baseexpr.type
+        if owner is None and isinstance(expr.baseexpr, NameExprNode):
+            owner = self.lookup(expr.baseexpr.name)
+        self.refer(expr.memberexpr, self.member(owner, expr.memberexpr.name), True)
+
+    def leave_NameExprNode(self, expr: NameExprNode) -> None:
+        if id(expr) in self._members:
+            return
+        if isinstance(expr, (FieldNameExprNode, PropertyNameExprNode)):
+            decl: Any = self.member(getattr(self.decl, 'thisdecl', None), expr.name)
+        else:
+            decl = self.lookup(expr.name)
+            if decl is None and isinstance(self.decl, MethodDeclNode):
+                decl = self.member(self.decl.thisdecl, expr.name)
+        self.refer(expr, decl)
+
+
+# endregion (classes)
+# ---------------------------------------------------------
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""Memory Footprint
+
+Accounts for the memory held by an assembly, by module and by node class.
+
+``take_snapshot`` walks everything reachable from the modules of an ``AsmbNode``
+(or from any other root) once, and charges each object to the nearest node or
+other instance above it: a ``BinaryExprNode`` is charged for its own object, its
+attribute dict, its operator string and any list or dict it keeps, but not for
+its operands, which are nodes of their own. Objects reachable from several places,
+such as shared types and interned names, are charged once, to the first module
+that reaches them. Functions, classes and Python modules are not followed.
+
+Snapshots are plain data: they are stored as JSON with the benchmark results
+(``python -m brah.h_benchmark ... -m``) and ``diff_snapshots`` tells which
+classes grew between two of them.
+"""
+import sys
+from dataclasses import dataclass, field
+from types import FunctionType, MethodType, BuiltinFunctionType, ModuleType
+from typing import Optional, Any, List, Dict, Set, Tuple
+
+from brah.c_astnodes import AsmbNode, ModuleNode
+
+
+__all__ = [
+    # functions
+    'diff_snapshots',
+    'format_diff',
+    'format_snapshot',
+    'measure',
+    'take_snapshot',
+
+    # classes
+    'Footprint',
+    'MemorySnapshot',
+]
+
+# ---------------------------------------------------------
+# region CONSTANTS & ENUMS
+
+
+_NOT_FOLLOWED = (type, FunctionType, MethodType, BuiltinFunctionType, ModuleType)
+_CONTAINERS = (list, tuple, set, frozenset)
+
+# endregion (constants)
+# ---------------------------------------------------------
+# region FUNCTIONS
+
+
+def measure(root: Any, seen: Optional[Set[int]] = None, stop: Tuple[type, ...] = (AsmbNode,)
+            ) -> Dict[str, 'Footprint']:
+    """Returns the instances and bytes reachable from a root, by class.
+
+    Objects whose id is in ``seen`` are skipped, and the ids of the ones charged are
+    added to it. Instances of the ``stop`` classes other than the root are not followed.
+    """
+    seen = set() if seen is None else seen
+    footprints: Dict[str, Footprint] = {}
+    getsizeof = sys.getsizeof
+    # containers and values met before any instance are charged to the class of the root
+    loose = Footprint()
+    stack: List[Tuple[Any, Footprint]] = [(root, loose)]
+    while stack:
+        obj, owner = stack.pop()
+        if id(obj) in seen or isinstance(obj, _NOT_FOLLOWED) or (obj is not root and isinstance(obj, stop)):
+            continue
+        seen.add(id(obj))
+        cls: type = obj.__class__
+        if cls is dict:
+            owner.size += getsizeof(obj)
+            for key, value in obj.items():
+                stack.append((key, owner))
+                stack.append((value, owner))
+        elif cls in _CONTAINERS:
+            owner.size += getsizeof(obj)
+            stack.extend((item, owner) for item in obj)
+        elif hasattr(obj, '__dict__') or hasattr(cls, '__slots__'):
+            name: str = cls.__name__
+            owner = footprints.get(name)
+            if owner is None:
+                owner = footprints[name] = Footprint()
+            owner.count += 1
+            owner.size += getsizeof(obj)
+            attributes: Optional[Dict[str, Any]] = getattr(obj, '__dict__', None)
+            if attributes is not None:
+                seen.add(id(attributes))
+                owner.size += getsizeof(attributes)
+                stack.extend((value, owner) for value in attributes.values())
+            for slot in getattr(cls, '__slots__', ()):
+                value: Any = getattr(obj, slot, None)
+                if value is not None:
+                    stack.append((value, owner))
+        else:
+            owner.size += getsizeof(obj)
+    if loose.size:
+        footprints.setdefault(root.__class__.__name__, Footprint()).size += loose.size
+    return footprints
+
+
+def take_snapshot(root: Any, label: str = '') -> 'MemorySnapshot':
+    """Measures an assembly module by module, a single module, or any other object as a whole."""
+    snapshot = MemorySnapshot(label)
+    seen: Set[int] = set()
+    if isinstance(root, AsmbNode):
+        for name, module in root.modules.items():
+            snapshot.add(name, measure(module, seen, (AsmbNode, ModuleNode)))
+        snapshot.add('', measure(root, seen, (ModuleNode,)))
+    elif isinstance(root, ModuleNode):
+        snapshot.add(root.fname, measure(root, seen, (AsmbNode, ModuleNode)))
+    else:
+        snapshot.add('', measure(root, seen))
+    return snapshot
+
+
+def diff_snapshots(before: 'MemorySnapshot', after: 'MemorySnapshot') -> List[Tuple[str, int, int, int, int]]:
+    """Returns (class, count before, count after, size before, size after) for each class whose
+    count or size changed, largest size change first."""
+    rows: List[Tuple[str, int, int, int, int]] = []
+    empty = Footprint()
+    for name in before.classes.keys() | after.classes.keys():
+        old: Footprint = before.classes.get(name, empty)
+        new: Footprint = after.classes.get(name, empty)
+        if old != new:
+            rows.append((name, old.count, new.count, old.size, new.size))
+    rows.sort(key=lambda row: abs(row[4] - row[3]), reverse=True)
+    return rows
+
+
+def _kib(size: int) -> str:
+    return f"{size / 1024:,.1f} KiB"
+
+
+def format_snapshot(snapshot: 'MemorySnapshot', top: int = 15) -> str:
+    lines: List[str] = [f"total {_kib(snapshot.total)}"]
+    for name, size in sorted(snapshot.modules.items(), key=lambda item: item[1], reverse=True)[:top]:
+        lines.append(f"  module {name or '(assembly)':<30} {_kib(size):>14}")
+    for name, footprint in snapshot.largest(top):
+        lines.append(f"  {name:<37} {_kib(footprint.size):>14} {footprint.count:>10,} instances")
+    return '\n'.join(lines)
+
+
+def format_diff(before: 'MemorySnapshot', after: 'MemorySnapshot', top: int = 15) -> str:
+    lines: List[str] = [f"total {_kib(before.total)} -> {_kib(after.total)}"
+                        f" ({(after.total - before.total) / 1024:+,.1f} KiB)"]
+    for name, old_count, new_count, old_size, new_size in diff_snapshots(before, after)[:top]:
+        lines.append(f"  {name:<37} {(new_size - old_size) / 1024:+12,.1f} KiB"
+                     f" {new_count - old_count:+10,} instances")
+    return '\n'.join(lines)
+
+# endregion (functions)
+# ---------------------------------------------------------
+# region CLASSES
+
+
+@dataclass
+class Footprint:
+    """Instances of a class and the bytes charged to them."""
+
+    count: int = 0
+    size: int = 0
+
+
+@dataclass
+class MemorySnapshot:
+    """Footprint of an assembly by module and by class.
+
+    :ivar modules: bytes charged to each module, by name ('' for the assembly itself)
+    :ivar classes: footprint of each class, over every module
+    :ivar by_module: footprint of each class in each module
+    """
+
+    label: str = ''
+    modules: Dict[str, int] = field(default_factory=dict)
+    classes: Dict[str, Footprint] = field(default_factory=dict)
+    by_module: Dict[str, Dict[str, Footprint]] = field(default_factory=dict)
+
+    @property
+    def total(self) -> int:
+        return sum(self.modules.values())
+
+    def add(self, module: str, footprints: Dict[str, Footprint]) -> None:
+        self.by_module[module] = footprints
+        self.modules[module] = sum(footprint.size for footprint in footprints.values())
+        for name, footprint in footprints.items():
+            total: Footprint = self.classes.setdefault(name, Footprint())
+            total.count += footprint.count
+            total.size += footprint.size
+
+    def largest(self, top: Optional[int] = None) -> List[Tuple[str, Footprint]]:
+        return sorted(self.classes.items(), key=lambda item: item[1].size, reverse=True)[:top]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'label': self.label,
+            'total': self.total,
+            'modules': {
+                module: {name: [footprint.count, footprint.size] for name, footprint in footprints.items()}
+                for module, footprints in self.by_module.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'MemorySnapshot':
+        snapshot = cls(data.get('label', ''))
+        for module, footprints in data['modules'].items():
+            snapshot.add(module, {name: Footprint(count, size) for name, (count, size) in footprints.items()})
+        return snapshot
+
+
+# endregion (classes)
+# ---------------------------------------------------------
@@ -0,0 +1,90 @@
+"""Small constructors of AST nodes and compiled modules shared by the tests."""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from brah.c_astnodes import *
+from brah.j_hostjit import GLOBAL_PREFIX, FunctionTranslator, build_namespace
+
+
+I32 = IntegerTypeNode(0, 'i32', 4, True)
+I64 = IntegerTypeNode(0, 'i64', 8, True)
+F64 = FloatTypeNode(0, 'f64', 8)
+STR = StringTypeNode(0, 'str')
+
+
+def lit(value: Any, typenode: TypeNode = I32) -> LiteralExprNode:
+    return LiteralExprNode(0, value, typenode)
+
+
+def var(name: str) -> VarNameExprNode:
+    return VarNameExprNode(0, name)
+
+
+def param(name: str) -> ParamNameExprNode:
+    return ParamNameExprNode(0, name)
+
+
+def target(name: str) -> LValueExprNode:
+    return LValueExprNode(0, VarNameExprNode(0, name))
+
+
+def add(left: ExprNode, right: ExprNode, operator: str = '+') -> AddBinaryExprNode:
+    return AddBinaryExprNode(0, left, right, operator)
+
+
+def mul(left: ExprNode, right: ExprNode, operator: str = '*') -> MultBinaryExprNode:
+    return MultBinaryExprNode(0, left, right, operator)
+
+
+def compare(left: ExprNode, right: ExprNode, operator: str = '<') -> CompareBinaryExprNode:
+    return CompareBinaryExprNode(0, left, right, operator)
+
+
+def call(name: str, *args: ExprNode) -> DirectCallExprNode:
+    return DirectCallExprNode(0, FunctionNameExprNode(0, name), list(args))
+
+
+def increment(name: str) -> ExpressionStmtNode:
+    return ExpressionStmtNode(0, IncrUnaryExprNode(0, var(name), True))
+
+
+def accumulate(name: str, value: ExprNode, operator: str = '+=') -> ExpressionStmtNode:
+    return ExpressionStmtNode(0, AddBinaryExprNode(0, var(name), value, operator, True))
+
+
+def returns_if(scope: ScopeNode, condition: ExprNode, value: ExprNode) -> IfThenStmtNode:
+    """se (condition) retorne value, in the given scope"""
+    then = BasicScopeNode(0, scope)
+    then.statements.append(ReturnStmtNode(0, value))
+    return IfThenStmtNode(0, condition, then)
+
+
+def function(scope: ModuleScopeNode, name: str, returns: Optional[TypeNode] = I32,
+             params: Sequence[Tuple[str, TypeNode]] = (), variables: Sequence[Tuple[str, TypeNode, ExprNode]] = (),
+             statements: Sequence[StmtNode] = ()) -> FunctionDeclNode:
+    """Declares an exported function in a module scope; its variables are declared in its body."""
+    body = FunctionScopeNode(0, scope)
+    for index, (varname, typenode, value) in enumerate(variables):
+        body.declarations[varname] = VarDeclNode(0, index, varname, typenode, value)
+    body.statements.extend(statements)
+    decl = FunctionDeclNode(0, 0, name, returns, {
+        paramname: ParamDeclNode(0, index, paramname, typenode) for index, (paramname, typenode) in enumerate(params)
+    }, body, exports=True)
+    scope.declarations[name] = decl
+    return decl
+
+
+def loop_scope(parent: ScopeNode, *statements: StmtNode) -> LoopScopeNode:
+    scope = LoopScopeNode(0, parent)
+    scope.statements.extend(statements)
+    return scope
+
+
+def compiled(scope: ModuleScopeNode, **options: Any) -> Dict[str, Any]:
+    """Returns the functions of a module scope compiled right away, by name."""
+    namespace: Dict[str, Any] = build_namespace(ModuleNode('teste', scope), **options)
+    return {name[len(GLOBAL_PREFIX):]: value for name, value in namespace.items() if name.startswith(GLOBAL_PREFIX)}
+
+
+def translated(decl: DeclNode, **options: Any) -> str:
+    """Returns the Python source a function is translated to."""
+    return FunctionTranslator(decl, **options).translate()
@@ -0,0 +1,24 @@
+import asyncio
+
+from brah.j_hostjit import build_namespace
+from tests.builders import *
+
+
+def test_asynchronous_code_yields_once_per_budget():
+    scope = ModuleScopeNode(0)
+    decl = function(scope, 'conta', I64, [('n', I32)], [('total', I64, lit(0, I64))])
+    body = loop_scope(decl.scope, accumulate('total', var('i')))
+    decl.scope.statements.append(ForStmtNode(
+        0, [VarDeclNode(0, 1, 'i', I32, lit(0))], [compare(var('i'), param('n'))], [increment('i')], body
+    ))
+    decl.scope.statements.append(ReturnStmtNode(0, var('total')))
+    namespace = build_namespace(ModuleNode('teste', scope), budget=2)
+    pauses = []
+
+    async def pause(delay: float) -> None:
+        pauses.append(delay)
+
+    namespace['_pause'] = pause
+    # one function entry and ten iterations spend eleven units of the budget
+    assert asyncio.run(namespace['g_conta'](10)) == 45
+    assert len(pauses) == 5
@@ -0,0 +1,86 @@
+import os
+from typing import Any, Dict
+
+import pytest
+
+from brah import h_benchmark
+from brah.h_benchmark import compare_memory, measure_sampling, register_stage, run_benchmark, run_suite
+from brah.s_memory import take_snapshot
+from tests.builders import *
+
+
+EXAMPLES: str = os.path.join(os.path.dirname(__file__), '..', 'examples', 'benchmarks')
+
+
+def _results(timings: Dict[str, float]) -> Dict[str, Any]:
+    return {'benchmarks': {'numeric': {stage: {'min': seconds} for stage, seconds in timings.items()}}}
+
+
+def _program(helpers: int = 0) -> AsmbNode:
+    """principal() returns 42, next to the given number of functions never called"""
+    scope = ModuleScopeNode(0)
+    function(scope, 'principal', I32, statements=[ReturnStmtNode(0, add(lit(20), lit(22)))])
+    for index in range(helpers):
+        function(scope, f"ajuda{index}", I32, statements=[ReturnStmtNode(0, lit(index))])
+    asmb = AsmbNode()
+    asmb['teste'] = ModuleNode('teste', scope)
+    return asmb
+
+
+def test_only_known_stages_can_be_registered():
+    with pytest.raises(ValueError):
+        register_stage('optimize', lambda value: value)
+
+
+def test_source_files_run_up_to_the_first_stage_without_implementation():
+    filepath = os.path.join(EXAMPLES, 'numeric.brah')
+    assert list(run_benchmark(filepath, repeat=1)) == ['load']
+
+
+def test_registered_stages_receive_the_output_of_the_previous_one(monkeypatch):
+    received = []
+    monkeypatch.setitem(h_benchmark._stage_funcs, 'lex', lambda source: received.append(source) or [])
+    filepath = os.path.join(EXAMPLES, 'numeric.brah')
+    assert list(run_benchmark(filepath, repeat=2)) == ['load', 'lex']
+    assert len(received) == 2 and received[0].filepath == filepath
+
+
+def test_programs_built_as_asts_are_compiled_and_executed(monkeypatch):
+    results = []
+    monkeypatch.setitem(h_benchmark._stage_funcs, 'execute', lambda program: results.append(program.call('principal')))
+    monkeypatch.setattr(h_benchmark, '_programs', {'resposta': _program})
+    suite = run_suite(EXAMPLES, repeat=2, names=['resposta'])
+    assert list(suite['benchmarks']) == ['resposta']
+    assert list(suite['benchmarks']['resposta']) == ['compile', 'execute']
+    assert results == [42, 42]
+
+
+def test_stages_slower_than_the_tolerance_are_regressions():
+    baseline = _results({'load': 1.0, 'compile': 1.0})
+    current = _results({'load': 1.05, 'compile': 1.2, 'execute': 5.0})
+    assert h_benchmark.compare(current, baseline, tolerance=0.10) == [('numeric', 'compile', 1.0, 1.2)]
+    assert h_benchmark.compare(current, baseline, tolerance=0.25) == []
+
+
+def test_stages_whose_output_grew_past_the_tolerance_are_memory_regressions():
+    small, large = take_snapshot(_program(), 'compile'), take_snapshot(_program(helpers=10), 'compile')
+    baseline = {'memory': {'numeric': {'compile': small.to_dict()}}}
+    current = {'memory': {'numeric': {'compile': large.to_dict()}}}
+    regressions = compare_memory(current, baseline)
+    assert [(name, stage) for name, stage, _, _ in regressions] == [('numeric', 'compile')]
+    assert regressions[0][3].total == large.total
+    assert compare_memory(baseline, current) == []
+
+
+def test_sampling_is_timed_against_the_same_program_run_as_it_is():
+    timing = measure_sampling(h_benchmark._calls_program, 'thread', repeat=2)
+    assert timing['plain'] > 0.0 and timing['sampled'] > 0.0
+    assert timing['overhead'] == timing['sampled'] / timing['plain'] - 1.0
+
+
+def test_sampling_runs_without_a_benchmark_directory(monkeypatch, capsys):
+    monkeypatch.setattr(h_benchmark, '_programs', {'numeric': _program})
+    assert h_benchmark.main(['-s', '-r', '1']) == 0
+    assert 'sampling numeric.' in capsys.readouterr().out
+    with pytest.raises(SystemExit):
+        h_benchmark.main([])
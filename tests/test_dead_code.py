@@ -0,0 +1,54 @@
+from brah.k_optimizer import eliminate_dead_code, find_entry_points, prune_unreachable
+from tests.builders import *
+
+
+def _program() -> AsmbNode:
+    """class P { usado(); inutil() }, both calling ajuda(), which reads K; Z and morta() are never used;
+    principal() returns p.usado() and calls morta() after returning"""
+    scope = ModuleScopeNode(0)
+    classe = ClassTyclNode(0, 'P')
+    scope.declarations['P'] = classe
+    for name in ('usado', 'inutil'):
+        body = MethodScopeNode(0)
+        body.statements.append(ReturnStmtNode(0, call('ajuda')))
+        classe.declare(MethodDeclNode(0, 0, classe, name, I32, {}, body))
+    scope.declarations['K'] = ConstDeclNode(0, 'K', I32, lit(3))
+    scope.declarations['Z'] = ConstDeclNode(0, 'Z', I32, lit(3))
+    function(scope, 'ajuda', statements=[ReturnStmtNode(0, ConstNameExprNode(0, 'K'))])
+    function(scope, 'morta', statements=[ReturnStmtNode(0, lit(1))])
+    method = MemberExprNode(0, var('p'), FunctionNameExprNode(0, 'usado'))
+    function(scope, 'principal', variables=[('p', classe, DirectCallExprNode(0, ClassNameExprNode(0, 'P'), []))],
+             statements=[ReturnStmtNode(0, DirectCallExprNode(0, method, [])), ExpressionStmtNode(0, call('morta'))])
+    asmb = AsmbNode()
+    asmb['teste'] = ModuleNode('teste', scope)
+    return asmb
+
+
+def test_what_the_entry_points_cannot_reach_is_removed():
+    asmb = _program()
+    scope = asmb['teste'].scope
+    report = eliminate_dead_code(asmb, find_entry_points(asmb))
+    assert [decl.name for decl in report.functions] == ['morta']
+    assert [decl.name for decl in report.constants] == ['Z']
+    assert [decl.name for decl in report.methods] == ['inutil']
+    assert report.statements == 1
+    assert list(scope.declarations) == ['P', 'K', 'ajuda', 'principal']
+    assert list(scope.declarations['P'].members) == ['usado']
+
+
+def test_exported_declarations_are_kept_when_asked():
+    asmb = _program()
+    report = eliminate_dead_code(asmb, find_entry_points(asmb), keep_exports=True)
+    assert report.functions == []
+    assert 'morta' in asmb['teste'].scope.declarations
+
+
+def test_statements_after_jumps_in_both_branches_are_removed():
+    scope = ModuleScopeNode(0)
+    body = FunctionScopeNode(0, scope)
+    thenscope, elsescope = BasicScopeNode(0, body), BasicScopeNode(0, body)
+    thenscope.statements += [ReturnStmtNode(0, lit(1)), increment('x')]
+    elsescope.statements.append(ReturnStmtNode(0, lit(2)))
+    body.statements += [IfElseStmtNode(0, compare(param('n'), lit(0)), thenscope, elsescope), increment('x')]
+    assert prune_unreachable(body) == 2
+    assert len(body.statements) == 1 and len(thenscope.statements) == 1
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from brah.g_profiler import ExecStack
+from brah.j_hostjit import TranslationError
+from brah.n_embed import Program, run_function
+from tests.builders import *
+
+
+def _program(**options) -> Program:
+    scope = ModuleScopeNode(0)
+    function(scope, 'divide', I32, [('a', I32), ('b', I32)], statements=[
+        ReturnStmtNode(0, mul(param('a'), param('b'), '/')),
+    ])
+    asmb = AsmbNode()
+    asmb['principal'] = ModuleNode('principal', scope)
+    return Program(asmb, contexts=1, **options)
+
+
+def test_a_context_given_back_after_an_exception_serves_the_next_call():
+    stack = ExecStack()
+    program = _program(stack=stack)
+    with pytest.raises(ZeroDivisionError):
+        program.call('divide', 1, 0)
+    assert not stack.frames
+    assert program.call('divide', 7, 2) == 3
+    assert len(program._free) == 1
+
+
+def _mixed_program(**options) -> Program:
+    """soma(a, b) translates; muda() assigns a global, which the translator rejects"""
+    scope = ModuleScopeNode(0)
+    function(scope, 'soma', I32, [('a', I32), ('b', I32)], statements=[
+        ReturnStmtNode(0, add(param('a'), param('b'))),
+    ])
+    scope.declarations['g'] = VarDeclNode(0, 0, 'g', I32, lit(0))
+    function(scope, 'muda', None, statements=[AssignmentStmtNode(0, target('g'), lit(1))])
+    asmb = AsmbNode()
+    asmb['principal'] = ModuleNode('principal', scope)
+    return Program(asmb, contexts=1, **options)
+
+
+def test_warming_up_leaves_untranslatable_functions_interpreted():
+    program = _mixed_program(interpret=lambda decl, args: f'interpretado: {decl.name}')
+    assert program.call('soma', 1, 2) == 3
+    assert program.call('muda') == 'interpretado: muda'
+
+
+def test_without_an_interpreter_only_the_untranslatable_function_fails():
+    program = _mixed_program()
+    assert program.call('soma', 1, 2) == 3
+    with pytest.raises(TranslationError):
+        program.call('muda')
+
+
+def test_concurrent_asynchronous_calls_share_the_pooled_contexts():
+    scope = ModuleScopeNode(0)
+    function(scope, 'dobro', I32, [('a', I32)], statements=[ReturnStmtNode(0, add(param('a'), param('a')))])
+    asmb = AsmbNode()
+    asmb['principal'] = ModuleNode('principal', scope)
+    program = Program(asmb, contexts=2, budget=1)
+    built = []
+    new_context = program.new_context
+    program.new_context = lambda: built.append(new_context()) or built[-1]
+
+    async def run() -> list:
+        return await asyncio.gather(*(run_function(program, 'dobro', value) for value in range(20)))
+
+    assert asyncio.run(run()) == [value * 2 for value in range(20)]
+    assert not built
+    assert len(program._free) == 2 and not program._waiters
+    assert sum(context.calls for context in program._free) == 20
@@ -0,0 +1,75 @@
+from brah.j_hostjit import GLOBAL_PREFIX, build_namespace
+from brah.n_embed import Program
+from brah.p_types import BOOLEAN_TYPE
+from tests.builders import *
+
+
+def _colors(scope: ModuleScopeNode, is_flagset: bool = False) -> EnumTypeNode:
+    """enum Cor { A = 10, B = 20, C = 5 }, declared in the module scope only"""
+    cor = EnumTypeNode(0, 'Cor', I32, is_flagset)
+    scope.declarations['Cor'] = cor
+    for name, value in (('A', 10), ('B', 20), ('C', 5)):
+        scope.declarations[name] = EnumDeclNode(0, name, cor, lit(value))
+    return cor
+
+
+def _member(name: str) -> EnumNameExprNode:
+    return EnumNameExprNode(0, name)
+
+
+def test_members_are_laid_out_from_the_module_declarations():
+    scope = ModuleScopeNode(0)
+    cor = _colors(scope)
+    namespace = build_namespace(ModuleNode('teste', scope))
+    assert [namespace[GLOBAL_PREFIX + name] for name in 'ABC'] == [0, 1, 2]
+    assert cor.values == [10, 20, 5]
+
+
+def test_values_used_as_numbers_are_the_declared_ones():
+    scope = ModuleScopeNode(0)
+    cor = _colors(scope)
+    function(scope, 'soma', I32, statements=[ReturnStmtNode(0, add(_member('B'), lit(1)))])
+    function(scope, 'inteiro', I32, [('c', cor)], [('x', I32, None)], [
+        AssignmentStmtNode(0, target('x'), param('c')),
+        ReturnStmtNode(0, var('x')),
+    ])
+    function(scope, 'antes', BOOLEAN_TYPE, [('c', cor)], statements=[
+        ReturnStmtNode(0, compare(param('c'), _member('A'))),
+    ])
+    function(scope, 'igual', BOOLEAN_TYPE, [('c', cor)], statements=[
+        ReturnStmtNode(0, compare(param('c'), _member('C'), '==')),
+    ])
+    functions = compiled(scope)
+    assert functions['soma']() == 21
+    assert functions['inteiro'](cor.code_of('C')) == 5
+    # C = 5 comes before A = 10, although it is declared after it
+    assert functions['antes'](cor.code_of('C'))
+    assert not functions['antes'](cor.code_of('B'))
+    assert functions['igual'](cor.code_of('C'))
+
+
+def test_the_host_passes_and_gets_declared_values():
+    scope = ModuleScopeNode(0)
+    cor = _colors(scope)
+    function(scope, 'mesma', cor, [('c', cor)], statements=[ReturnStmtNode(0, param('c'))])
+    asmb = AsmbNode()
+    asmb['principal'] = ModuleNode('principal', scope)
+    assert Program(asmb, contexts=1).call('mesma', 20) == 20
+
+
+def test_flag_sets_keep_their_masks():
+    scope = ModuleScopeNode(0)
+    _colors(scope, is_flagset=True)
+    function(scope, 'une', I32, statements=[ReturnStmtNode(0, add(_member('A'), _member('C'), '|'))])
+    assert compiled(scope)['une']() == 15
+
+
+def test_members_declared_after_a_lookup_are_laid_out_on_the_next_one():
+    cor = EnumTypeNode(0, 'Cor', I32, False)
+    cor.declare(EnumDeclNode(0, 'A', cor, lit(10)))
+    assert cor.code_of('A') == 0 and cor.value_of(0) == 10
+    cor.declare(EnumDeclNode(0, 'B', cor, None))
+    assert cor.code_of('B') == 1
+    assert cor.code_of_value(11) == 1
+    assert cor.name_of(1) == 'B'
+    assert cor.renumbers()
@@ -0,0 +1,54 @@
+from sys import intern
+
+import pytest
+
+from tests.builders import *
+
+
+def _fresh(text: str) -> str:
+    """A copy of the string that is not the interned instance."""
+    return ''.join(list(text))
+
+
+def test_names_are_the_interned_instances():
+    name = _fresh('contador_de_voltas')
+    assert name is not intern(name)
+    declared = VarDeclNode(0, 0, name, I32)
+    referenced = VarNameExprNode(0, _fresh(name))
+    assert declared.name is intern(name)
+    assert referenced.name is declared.name
+    assert TyclNode(0, _fresh('Ponto')).name is intern('Ponto')
+
+
+def test_string_literals_are_interned_and_numbers_kept():
+    text = _fresh('mensagem repetida')
+    assert lit(text, STR).value is lit(_fresh(text), STR).value
+    assert lit(7).value == 7
+    assert lit(2.5, F64).value == 2.5
+
+
+def _point() -> TyclNode:
+    tycl = TyclNode(0, 'Ponto')
+    assert tycl.declare(FieldDeclNode(0, 0, tycl, 'x', I32))
+    assert tycl.declare(PropertyDeclNode(0, tycl, 'norma', F64))
+    assert tycl.declare(FieldDeclNode(0, 1, tycl, 'y', I32))
+    return tycl
+
+
+def test_members_are_keyed_by_name_in_declaration_order():
+    tycl = _point()
+    assert list(tycl.members) == ['x', 'norma', 'y']
+    assert list(tycl.fields) == ['x', 'y']
+    assert tycl['norma'] is tycl.properties['norma']
+    assert 'y' in tycl and 'z' not in tycl
+    with pytest.raises(KeyError):
+        tycl['z']
+
+
+def test_redeclared_member_is_rejected():
+    tycl = _point()
+    first = tycl['x']
+    assert not tycl.declare(FieldDeclNode(0, 2, tycl, 'x', F64))
+    assert not tycl.declare(PropertyDeclNode(0, tycl, 'y', I32))
+    assert tycl['x'] is first
+    assert len(tycl.members) == 3 and 'y' not in tycl.properties
@@ -0,0 +1,48 @@
+from brah.f_utils import SourceCode
+from tests.builders import *
+
+
+TEXT = 'função f(): i32 {\n    s = "}{";  // }\n    /* { */ se (a) { b++; }\n    retorne 1;\n}\nfunção g'
+
+
+def test_braces_inside_strings_and_comments_are_not_counted():
+    source = SourceCode(TEXT, 'teste.brah')
+    end = source.match_brace(TEXT.index('{'))
+    assert TEXT[end:] == '}\nfunção g'
+
+
+def test_escaped_quotes_do_not_end_a_string():
+    text = '{ s = "\\"}"; }'
+    assert SourceCode(text, 'teste.brah').match_brace(0) == len(text) - 1
+
+
+def test_unclosed_bodies_strings_and_comments_are_not_matched():
+    for text in ('{ { }', '{ s = "} ', '{ /* } '):
+        assert SourceCode(text, 'teste.brah').match_brace(0) == -1
+
+
+def test_deferred_bodies_are_parsed_once_on_first_access():
+    source = SourceCode(TEXT, 'teste.brah')
+    scope = ModuleScopeNode(0)
+    decl = FunctionDeclNode(0, 0, 'f', I32, {}, None)
+    spans = []
+
+    def parse(declnode: FunctionDeclNode) -> FunctionScopeNode:
+        spans.append(declnode.body_span)
+        body = FunctionScopeNode(0, scope)
+        body.statements.append(ReturnStmtNode(0, lit(1)))
+        return body
+
+    resume = defer_body(decl, source, TEXT.index('{'), parse)
+    assert TEXT[resume:] == '\nfunção g'
+    assert not decl.body_parsed and not spans
+    body = decl.scope
+    assert decl.scope is body and decl.body_parsed
+    assert spans == [(TEXT.index('{'), resume)]
+    assert TEXT[slice(*spans[0])].endswith('retorne 1;\n}')
+
+
+def test_bodies_never_closed_are_not_deferred():
+    decl = FunctionDeclNode(0, 0, 'f', I32, {}, None)
+    assert defer_body(decl, SourceCode('{ retorne 1;', 'teste.brah'), 0, lambda declnode: None) == -1
+    assert decl.body_parsed and decl.scope is None
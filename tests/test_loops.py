@@ -0,0 +1,46 @@
+from brah.k_optimizer import optimize_loops
+from tests.builders import *
+
+
+def _sum_of_products(first: str, second: str) -> ModuleScopeNode:
+    """para (first = 0, second = 0; i < n; i++, k++) { s += i * k }"""
+    scope = ModuleScopeNode(0)
+    decl = function(scope, 'produtos', I64, [('n', I32)], [('s', I64, lit(0, I64))])
+    body = loop_scope(decl.scope, accumulate('s', mul(var('i'), var('k'))))
+    decl.scope.statements.append(ForStmtNode(
+        0, [VarDeclNode(0, 1, first, I32, lit(0)), VarDeclNode(0, 2, second, I32, lit(0))],
+        [compare(var('i'), param('n'))], [increment('i'), increment('k')], body
+    ))
+    decl.scope.statements.append(ReturnStmtNode(0, var('s')))
+    return scope
+
+
+def test_second_induction_variable_is_not_invariant():
+    for first, second in (('i', 'k'), ('k', 'i')):
+        scope = _sum_of_products(first, second)
+        optimize_loops(scope.declarations['produtos'])
+        assert compiled(scope)['produtos'](10) == sum(i * i for i in range(10))
+
+
+def test_induction_variable_takes_the_type_of_the_product():
+    scope = ModuleScopeNode(0)
+    decl = function(scope, 'escala', I64, [('n', I32), ('k', I64)], [('s', I64, lit(0, I64))])
+    body = loop_scope(decl.scope, accumulate('s', mul(var('i'), param('k'))))
+    decl.scope.statements.append(ForStmtNode(
+        0, [VarDeclNode(0, 1, 'i', I32, lit(0))], [compare(var('i'), param('n'))], [increment('i')], body
+    ))
+    decl.scope.statements.append(ReturnStmtNode(0, var('s')))
+    assert optimize_loops(decl).reduced == 1
+    assert compiled(scope)['escala'](4, 3_000_000_000) == 6 * 3_000_000_000
+
+
+def test_invariant_product_is_hoisted():
+    scope = ModuleScopeNode(0)
+    decl = function(scope, 'repete', I64, [('n', I32), ('a', I32), ('b', I32)], [('s', I64, lit(0, I64))])
+    body = loop_scope(decl.scope, accumulate('s', mul(param('a'), param('b'))))
+    decl.scope.statements.append(ForStmtNode(
+        0, [VarDeclNode(0, 1, 'i', I32, lit(0))], [compare(var('i'), param('n'))], [increment('i')], body
+    ))
+    decl.scope.statements.append(ReturnStmtNode(0, var('s')))
+    assert optimize_loops(decl).hoisted == 1
+    assert compiled(scope)['repete'](5, 6, 7) == 5 * 42
@@ -0,0 +1,90 @@
+import json
+import sys
+
+from brah.s_memory import Footprint, MemorySnapshot, diff_snapshots, format_diff, measure, take_snapshot
+from tests.builders import *
+
+
+class _Box:
+
+    def __init__(self, *contents: Any):
+        self.contents: list = list(contents)
+
+
+def _module(name: str, *values: int) -> ModuleNode:
+    scope = ModuleScopeNode(0)
+    function(scope, 'f', I64, statements=[ReturnStmtNode(0, lit(value, I64)) for value in values])
+    return ModuleNode(name, scope)
+
+
+def test_an_instance_is_charged_for_its_dict_and_values_but_not_other_instances():
+    inner = _Box()
+    label = 'rotulo' * 10
+    outer = _Box(inner, label)
+    footprints = measure(outer)
+    expected = (sys.getsizeof(outer) + sys.getsizeof(outer.__dict__) + sys.getsizeof(outer.contents)
+                + sys.getsizeof(label) + sys.getsizeof(inner) + sys.getsizeof(inner.__dict__)
+                + sys.getsizeof(inner.contents))
+    assert footprints['_Box'].count == 2
+    assert footprints['_Box'].size == expected
+
+
+def test_shared_objects_are_charged_once():
+    shared = _Box('compartilhado' * 100)
+    footprints = measure([shared, shared, _Box(shared)])
+    assert footprints['_Box'].count == 2
+
+    seen = set()
+    first = measure(_Box(shared), seen)
+    second = measure(_Box(shared), seen)
+    assert first['_Box'].count == 2 and second['_Box'].count == 1
+    assert second['_Box'].size < first['_Box'].size
+
+
+def test_modules_sharing_a_type_charge_it_to_the_first_one():
+    asmb = AsmbNode()
+    asmb['primeiro'] = _module('primeiro', 1)
+    asmb['segundo'] = _module('segundo', 2)
+    snapshot = take_snapshot(asmb, 'teste')
+    assert snapshot.by_module['primeiro']['IntegerTypeNode'].count == 1
+    assert 'IntegerTypeNode' not in snapshot.by_module['segundo']
+    assert snapshot.classes['LiteralExprNode'].count == 2
+    assert snapshot.classes['ModuleNode'].count == 2
+    assert snapshot.total == sum(snapshot.modules.values())
+    assert set(snapshot.modules) == {'primeiro', 'segundo', ''}
+
+
+def test_stop_classes_are_not_followed():
+    module = _module('unico', 1)
+    asmb = AsmbNode()
+    asmb['unico'] = module
+    assert 'LiteralExprNode' not in measure(_Box(asmb))
+    assert 'LiteralExprNode' not in measure(_Box(module), stop=(ModuleNode,))
+    assert measure(module, stop=(ModuleNode,))['LiteralExprNode'].count == 1
+
+
+def test_a_snapshot_round_trips_through_plain_data():
+    asmb = AsmbNode()
+    asmb['primeiro'] = _module('primeiro', 1, 2)
+    snapshot = take_snapshot(asmb, 'compile')
+    loaded = MemorySnapshot.from_dict(json.loads(json.dumps(snapshot.to_dict())))
+    assert loaded == snapshot
+    assert loaded.total == snapshot.total
+    assert diff_snapshots(snapshot, loaded) == []
+
+
+def test_diff_lists_the_classes_that_changed_largest_change_first():
+    before = take_snapshot(_module('m', 1), 'antes')
+    after = take_snapshot(_module('m', 1, 2, 3), 'depois')
+    rows = diff_snapshots(before, after)
+    names = [row[0] for row in rows]
+    assert 'LiteralExprNode' in names and 'ReturnStmtNode' in names
+    literal = rows[names.index('LiteralExprNode')]
+    assert literal[1:3] == (1, 3)
+    changes = [abs(row[4] - row[3]) for row in rows]
+    assert changes == sorted(changes, reverse=True)
+    assert format_diff(before, after).splitlines()[0].startswith('total ')
+
+
+def test_footprints_compare_by_value():
+    assert Footprint(1, 10) == Footprint(1, 10) != Footprint(2, 10)
@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+from brah.c_astnodes import AsmbNode, ModuleNode
+from brah.q_modules import ModuleLocator, PollingWatcher, Watcher, qualified_name
+
+
+def _write(path, text: str = 'modulo') -> str:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def _touch(path: str) -> None:
+    # some file systems keep coarse modification times: move them forward explicitly
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def tree(tmp_path):
+    _write(tmp_path / 'principal.brah')
+    _write(tmp_path / 'util' / 'texto.brah')
+    _write(tmp_path / 'util' / 'leiame.txt')
+    return tmp_path
+
+
+def _locator(root, asmb=None) -> ModuleLocator:
+    locator = ModuleLocator(str(root), asmb=asmb, watch=False)
+    locator.watcher = PollingWatcher(locator)
+    return locator
+
+
+def test_scan_indexes_source_files_by_qualified_name_and_path(tree):
+    locator = _locator(tree)
+    texto = str(tree / 'util' / 'texto.brah')
+    assert locator.modules == {'principal': str(tree / 'principal.brah'), 'util.texto': texto}
+    assert locator.paths[texto] == 'util.texto'
+    assert qualified_name(str(tree), texto) == 'util.texto'
+    assert locator.locate('util.texto') == texto
+    assert locator.locate('util.leiame') is None and 'util.leiame' not in locator
+    assert locator.locate_path('texto.brah', importer='util.texto') == 'util.texto'
+    assert locator.locate_path('util/texto.brah', importer='principal') == 'util.texto'
+
+
+def test_nothing_changed_refreshes_nothing(tree):
+    assert _locator(tree).refresh() == set()
+
+
+def test_refresh_finds_added_modified_and_deleted_files(tree):
+    asmb = AsmbNode()
+    locator = _locator(tree, asmb)
+    locator.load('principal')
+    locator.load('util.texto')
+
+    _write(tree / 'util' / 'numero.brah')
+    _touch(str(tree / 'util'))
+    assert locator.refresh() == {'util.numero'}
+    assert locator.locate('util.numero') == str(tree / 'util' / 'numero.brah')
+
+    _write(tree / 'principal.brah', 'modulo alterado')
+    _touch(str(tree / 'principal.brah'))
+    assert locator.refresh() == {'principal'}
+    assert 'principal' not in asmb.modules and 'util.texto' in asmb.modules
+
+    os.remove(tree / 'util' / 'texto.brah')
+    _touch(str(tree / 'util'))
+    assert locator.refresh() == {'util.texto'}
+    assert 'util.texto' not in locator and 'util.texto' not in asmb.modules
+
+
+def test_refresh_indexes_a_new_subdirectory(tree):
+    locator = _locator(tree)
+    _write(tree / 'util' / 'rede' / 'http.brah')
+    _write(tree / 'util' / 'rede' / 'tcp' / 'socket.brah')
+    _touch(str(tree / 'util'))
+    assert locator.refresh() == {'util.rede.http', 'util.rede.tcp.socket'}
+    assert locator.locate('util.rede.tcp.socket') == str(tree / 'util' / 'rede' / 'tcp' / 'socket.brah')
+
+
+def test_invalidating_a_removed_directory_forgets_its_modules(tree):
+    locator = _locator(tree)
+    for name in os.listdir(tree / 'util'):
+        os.remove(tree / 'util' / name)
+    os.rmdir(tree / 'util')
+    assert locator.invalidate(str(tree / 'util')) == {'util.texto'}
+    assert not any(path.startswith(str(tree / 'util')) for path in locator.stats)
+    assert list(locator.modules) == ['principal']
+
+
+def test_load_keeps_the_module_in_the_assembly(tree):
+    asmb = AsmbNode()
+    locator = _locator(tree, asmb)
+    module = locator.load('util.texto')
+    assert isinstance(module, ModuleNode) and asmb['util.texto'] is module
+    assert locator.load('util.texto') is module
+    with pytest.raises(KeyError):
+        locator.load('nao.existe')
+
+
+def test_watchers_must_report_changes():
+    with pytest.raises(TypeError):
+        Watcher()
@@ -0,0 +1,55 @@
+from brah.j_hostjit import GLOBAL_PREFIX, build_namespace, run_stackless
+from tests.builders import *
+
+
+def _field(base: ExprNode, name: str) -> MemberExprNode:
+    return MemberExprNode(0, base, FieldNameExprNode(0, name))
+
+
+def _new(tycl: TyclNode, *args: ExprNode) -> DirectCallExprNode:
+    return DirectCallExprNode(0, ClassNameExprNode(0, tycl.name), list(args))
+
+
+def _vectors(scope: ModuleScopeNode) -> ClassTyclNode:
+    """class V { x, y: f64; + (o: V); * (o: f64) } and class W: V {}"""
+    vetor = ClassTyclNode(0, 'V')
+    scope.declarations['V'] = vetor
+    vetor.declare(FieldDeclNode(0, 0, vetor, 'x', F64))
+    vetor.declare(FieldDeclNode(0, 1, vetor, 'y', F64))
+    scope.declarations['W'] = ClassTyclNode(0, 'W', baseclass=vetor)
+    other = ParamNameExprNode(0, 'o')
+    overloads = (
+        ('+', vetor, lambda name: add(FieldNameExprNode(0, name), _field(other, name))),
+        ('*', F64, lambda name: mul(FieldNameExprNode(0, name), other)),
+    )
+    for operator, paramtype, combine in overloads:
+        body = MethodScopeNode(0)
+        body.statements.append(ReturnStmtNode(0, _new(vetor, combine('x'), combine('y'))))
+        vetor.declare(MethodDeclNode(0, 0, vetor, operator, vetor, {'o': ParamDeclNode(0, 0, 'o', paramtype)}, body,
+                                     operator=True))
+    return vetor
+
+
+def test_operators_dispatch_on_the_classes_of_their_operands():
+    scope = ModuleScopeNode(0)
+    _vectors(scope)
+    # usa(): a = V(1, 2); b = W(3, 4); c = a + b; d = b * 2; c += d; ret c.x + d.y
+    body = FunctionScopeNode(0, scope)
+    body.declarations['a'] = VarDeclNode(0, 0, 'a', scope.declarations['V'],
+                                         _new(scope.declarations['V'], lit(1.0, F64), lit(2.0, F64)))
+    body.declarations['b'] = VarDeclNode(0, 1, 'b', scope.declarations['W'],
+                                         _new(scope.declarations['W'], lit(3.0, F64), lit(4.0, F64)))
+    body.declarations['c'] = VarDeclNode(0, 2, 'c', scope.declarations['V'], add(var('a'), var('b')))
+    body.declarations['d'] = VarDeclNode(0, 3, 'd', scope.declarations['V'], mul(var('b'), lit(2)))
+    body.statements.append(accumulate('c', var('d')))
+    body.statements.append(ReturnStmtNode(0, add(_field(var('c'), 'x'), _field(var('d'), 'y'))))
+    scope.declarations['usa'] = FunctionDeclNode(0, 0, 'usa', F64, {}, body, exports=True)
+
+    namespace = build_namespace(ModuleNode('teste', scope))
+    assert namespace[GLOBAL_PREFIX + 'usa']() == (1 + 3 + 6) + 8
+    operators = namespace['_operators']
+    assert {(operator, left.__name__, right.__name__) for operator, left, right in operators} == {
+        ('+', 'V', 'W'), ('*', 'W', 'int'), ('+', 'V', 'V'),
+    }
+    stackless = build_namespace(ModuleNode('teste', scope), stackless=True)
+    assert run_stackless(stackless[GLOBAL_PREFIX + 'usa']) == 18
@@ -0,0 +1,59 @@
+import pytest
+
+from brah.m_parallel import PARALLEL_MIN_ITEMS, ParallelCheck, shutdown_executor
+from tests.builders import *
+
+
+ARRAY = ArrayTypeNode(0, I32)
+
+
+@pytest.fixture(autouse=True, scope='module')
+def executor():
+    yield
+    shutdown_executor()
+
+
+def _foreach(parallel: bool, *statements: StmtNode, reductions=None) -> Tuple[ModuleScopeNode, ForEachStmtNode]:
+    """percorre(a: [i32]): para cada (x em a) { ... }; retorne soma"""
+    scope = ModuleScopeNode(0)
+    decl = function(scope, 'percorre', I64, [('a', ARRAY)], [('soma', I64, lit(0, I64))])
+    body = loop_scope(decl.scope, *statements)
+    stmt = ForEachStmtNode(0, VarDeclNode(0, 0, 'x', I32), param('a'), body, None, parallel, reductions or {})
+    decl.scope.statements += [stmt, ReturnStmtNode(0, var('soma'))]
+    return scope, stmt
+
+
+def _first() -> IndexExprNode:
+    return IndexExprNode(0, param('a'), lit(0))
+
+
+def test_storing_elements_while_reading_the_array_is_not_split():
+    size = PARALLEL_MIN_ITEMS + 4000
+    results = []
+    for parallel in (False, True):
+        scope, stmt = _foreach(parallel, AssignmentStmtNode(0, target('x'), add(_first(), lit(1))))
+        values = list(range(size))
+        compiled(scope)['percorre'](values)
+        results.append(values)
+        if parallel:
+            assert "Reads array 'a' while storing elements" in ParallelCheck(stmt, scope.get_name).reasons
+    assert results[0] == results[1] == [1] + [2] * (size - 1)
+
+
+def test_reading_the_array_goes_through_the_shared_block():
+    size = PARALLEL_MIN_ITEMS + 4000
+    scope, stmt = _foreach(True, accumulate('soma', add(var('x'), _first())), reductions={'soma': '+'})
+    source = translated(scope.declarations['percorre'])
+    assert '(v_a, )' not in source
+    assert compiled(scope)['percorre']([5] * size) == 10 * size
+
+
+def test_element_stores_are_the_same_in_parallel_and_not():
+    size = PARALLEL_MIN_ITEMS + 4000
+    results = []
+    for parallel in (False, True):
+        scope, _ = _foreach(parallel, AssignmentStmtNode(0, target('x'), mul(var('x'), lit(2))))
+        values = list(range(size))
+        compiled(scope)['percorre'](values)
+        results.append(values)
+    assert results[0] == results[1] == [value * 2 for value in range(size)]
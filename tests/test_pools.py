@@ -0,0 +1,59 @@
+from brah.g_profiler import Profiler
+from brah.j_hostjit import GLOBAL_PREFIX, build_namespace
+from tests.builders import *
+
+
+def _field(base: ExprNode, name: str) -> MemberExprNode:
+    return MemberExprNode(0, base, FieldNameExprNode(0, name))
+
+
+def _new(tycl: TyclNode, *args: ExprNode) -> DirectCallExprNode:
+    return DirectCallExprNode(0, ClassNameExprNode(0, tycl.name), list(args))
+
+
+def _point(scope: ModuleScopeNode) -> StructureTyclNode:
+    """struct Ponto { x: i32; y: i32 = 7 }, with the fields declared out of order"""
+    ponto = StructureTyclNode(0, 'Ponto')
+    scope.declarations['Ponto'] = ponto
+    ponto.declare(FieldDeclNode(0, 1, ponto, 'y', I32, True, lit(7)))
+    ponto.declare(FieldDeclNode(0, 0, ponto, 'x', I32))
+    return ponto
+
+
+def test_instances_that_do_not_escape_go_back_to_their_pool():
+    scope = ModuleScopeNode(0)
+    ponto = _point(scope)
+    # f(n): para (i = 0; i < n; i++) { p = Ponto(i); total += p.x + p.y }; ret total
+    body = FunctionScopeNode(0, scope)
+    body.declarations['total'] = VarDeclNode(0, 0, 'total', I32, lit(0))
+    body.declarations['p'] = VarDeclNode(0, 1, 'p', ponto)
+    loop = loop_scope(body,
+                      AssignmentStmtNode(0, target('p'), _new(ponto, var('i'))),
+                      accumulate('total', add(_field(var('p'), 'x'), _field(var('p'), 'y'))))
+    body.statements.append(ForStmtNode(0, [VarDeclNode(0, 0, 'i', I32, lit(0))], [compare(var('i'), param('n'))],
+                                       [increment('i')], loop))
+    body.statements.append(ReturnStmtNode(0, var('total')))
+    decl = FunctionDeclNode(0, 0, 'f', I32, {'n': ParamDeclNode(0, 0, 'n', I32)}, body)
+    scope.declarations['f'] = decl
+
+    assert '_arena.close()' in translated(decl)
+    profiler = Profiler()
+    namespace = build_namespace(ModuleNode('teste', scope), profiler=profiler)
+    expected = sum(i + 7 for i in range(10))
+    assert namespace[GLOBAL_PREFIX + 'f'](10) == expected
+    assert namespace[GLOBAL_PREFIX + 'f'](10) == expected
+    stats = namespace[GLOBAL_PREFIX + 'Ponto'].stats
+    assert (stats.allocated, stats.reused, stats.scoped) == (10, 10, 20)
+
+
+def test_pools_lay_fields_out_in_storage_order_below_their_subclasses():
+    scope = ModuleScopeNode(0)
+    ponto = _point(scope)
+    ponto3 = ClassTyclNode(0, 'Ponto3', baseclass=ponto)
+    scope.declarations['Ponto3'] = ponto3
+    ponto3.declare(FieldDeclNode(0, 0, ponto3, 'z', I32))
+    namespace = build_namespace(ModuleNode('teste', scope))
+    assert namespace[GLOBAL_PREFIX + 'Ponto'].cls.__slots__ == ('x', 'y')
+    assert namespace[GLOBAL_PREFIX + 'Ponto3'].cls.__slots__ == ('z',)
+    instance = namespace[GLOBAL_PREFIX + 'Ponto3'](1)
+    assert (instance.x, instance.y, instance.z) == (1, 7, 0)
@@ -0,0 +1,113 @@
+from brah.f_utils import LocationTable, SourceCode
+from brah.g_profiler import ExecStack, Profiler, SamplingProfiler
+from brah.j_hostjit import build_namespace
+from tests.builders import *
+
+
+def _counting(scope: ModuleScopeNode) -> FunctionDeclNode:
+    """conta(n): para (i = 0; i < n; i++) total += i; retorne total"""
+    decl = function(scope, 'conta', I64, [('n', I32)], [('total', I64, lit(0, I64))])
+    body = loop_scope(decl.scope, accumulate('total', var('i')))
+    decl.scope.statements.append(ForStmtNode(
+        0, [VarDeclNode(0, 1, 'i', I32, lit(0))], [compare(var('i'), param('n'))], [increment('i')], body
+    ))
+    decl.scope.statements.append(ReturnStmtNode(0, var('total')))
+    return decl
+
+
+def test_traced_functions_and_loops_report_to_the_profiler():
+    scope = ModuleScopeNode(0)
+    decl = _counting(scope)
+    profiler = Profiler()
+    conta = compiled(scope, profiler=profiler, trace=True)['conta']
+    assert conta(10) == 45
+    assert conta(5) == 10
+    loop = decl.scope.statements[0]
+    assert profiler.stats[decl].count == 2
+    assert profiler.stats[loop].count == 2
+    assert profiler.stats[loop].iterations == 15
+    assert profiler.depth == 0
+
+
+def test_traced_calls_leave_when_an_exception_propagates():
+    scope = ModuleScopeNode(0)
+    function(scope, 'divide', I32, [('a', I32), ('b', I32)], statements=[
+        ReturnStmtNode(0, mul(param('a'), param('b'), '/')),
+    ])
+    profiler = Profiler()
+    divide = compiled(scope, profiler=profiler, trace=True)['divide']
+    try:
+        divide(1, 0)
+    except ZeroDivisionError:
+        pass
+    assert profiler.depth == 0
+    assert profiler.stats[scope.declarations['divide']].count == 1
+
+
+def test_untraced_functions_leave_the_profiler_alone():
+    scope = ModuleScopeNode(0)
+    _counting(scope)
+    profiler = Profiler()
+    assert compiled(scope, profiler=profiler)['conta'](10) == 45
+    assert not profiler.stats
+
+
+def test_sampled_functions_keep_their_frames_on_the_stack():
+    scope = ModuleScopeNode(0)
+    function(scope, 'amostra', None)
+    function(scope, 'interna', None, statements=[ExpressionStmtNode(0, call('amostra'))])
+    function(scope, 'externa', None, statements=[ExpressionStmtNode(0, call('interna'))])
+    stack = ExecStack()
+    sampler = SamplingProfiler(stack)
+    namespace = build_namespace(ModuleNode('teste', scope), stack=stack)
+    # a host function standing in for the timer, sampling from inside the Brah calls
+    namespace['g_amostra'] = sampler.sample
+    namespace['g_externa']()
+    assert sampler.samples == {('externa', 'interna'): 1}
+    assert not stack.frames
+
+
+def test_sampled_frames_are_popped_when_an_exception_propagates():
+    scope = ModuleScopeNode(0)
+    function(scope, 'divide', I32, [('a', I32), ('b', I32)], statements=[
+        ReturnStmtNode(0, mul(param('a'), param('b'), '/')),
+    ])
+    stack = ExecStack()
+    namespace = build_namespace(ModuleNode('teste', scope), stack=stack)
+    try:
+        namespace['g_divide'](1, 0)
+    except ZeroDivisionError:
+        pass
+    assert not stack.frames and stack.top is None
+
+
+def test_report_labels_a_leaf_without_location_by_its_function():
+    scope = ModuleScopeNode(0)
+    externa, interna = function(scope, 'externa', None), function(scope, 'interna', None)
+    stack = ExecStack()
+    stack.push(externa)
+    stack.push(interna)
+    sampler = SamplingProfiler(stack, LocationTable())
+    sampler.sample()
+    assert sampler.report().splitlines()[1].endswith('  interna')
+
+
+def test_collapsed_stacks_name_each_frame_and_the_line_of_the_leaf():
+    text = "função externa() {\n    interna();\n}\nfunção interna() {\n    amostra();\n}\n"
+    source = SourceCode(text, 'teste.brah')
+    scope = ModuleScopeNode(0)
+    function(scope, 'amostra', None)
+    function(scope, 'interna', None, statements=[
+        ExpressionStmtNode(source.location(text.index('amostra')), call('amostra')),
+    ])
+    function(scope, 'externa', None, statements=[
+        ExpressionStmtNode(source.location(text.index('interna()')), call('interna')),
+    ])
+    stack = ExecStack()
+    sampler = SamplingProfiler(stack, LocationTable(source))
+    namespace = build_namespace(ModuleNode('teste', scope), stack=stack)
+    namespace['g_amostra'] = sampler.sample
+    namespace['g_externa']()
+    namespace['g_externa']()
+    assert sampler.collapsed() == ['externa;interna;line 5 2']
+    assert sampler.report().splitlines()[1].split() == ['2', '100.00%', 'interna', 'line', '5']
@@ -0,0 +1,42 @@
+import re
+
+from brah.f_utils import SourceCode
+from brah.h_benchmark import run_sweep
+from brah.i_srcgen import PACKAGE, SourceShape, generate_sources, module_name, parse_size
+
+
+SHAPE = SourceShape(modules=3, depth=3)
+
+
+def test_sizes_are_read_with_their_unit():
+    assert [parse_size(text) for text in ('512', '2B', '1KB', '1.5mb', '1GB')] == [512, 2, 1024, 3 << 19, 1 << 30]
+
+
+def test_the_same_seed_generates_the_same_program():
+    assert generate_sources(8192, SHAPE, seed=7) == generate_sources(8192, SHAPE, seed=7)
+    assert generate_sources(8192, SHAPE, seed=7) != generate_sources(8192, SHAPE, seed=8)
+
+
+def test_modules_are_well_formed_and_import_only_earlier_modules():
+    sources = generate_sources(16384, SHAPE, seed=3)
+    assert list(sources) == [f"{module_name(index)}.brah" for index in range(3)]
+    for index, text in enumerate(sources.values()):
+        source = SourceCode(text, module_name(index))
+        # every declaration opens a brace closed right before the next one
+        for start in (match.start() for match in re.finditer(r'^exporte (?:função|classe) .*\{$', text, re.M)):
+            end = source.match_brace(text.index('{', start))
+            assert end != -1 and text[end + 1:end + 3] == '\n\n'
+        assert text.count('{') == text.count('}')
+        for imported in re.findall(rf'de {PACKAGE}\.modulo_(\d+);', text):
+            assert int(imported) < index
+
+
+def test_modules_add_up_to_about_the_requested_size():
+    size = sum(len(text.encode()) for text in generate_sources(65536, SHAPE, seed=1).values())
+    assert 65536 <= size < 65536 * 1.5
+
+
+def test_the_benchmark_runner_sweeps_generated_programs():
+    sweep = run_sweep([4096, 16384], SHAPE, seed=5, repeat=1)
+    assert list(sweep) == [4096, 16384]
+    assert all(list(totals) == ['load'] and totals['load'] > 0.0 for totals in sweep.values())
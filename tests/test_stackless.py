@@ -0,0 +1,38 @@
+import sys
+
+from brah.j_hostjit import build_namespace, run_stackless
+from tests.builders import *
+
+
+def _sum_to(scope: ModuleScopeNode) -> FunctionDeclNode:
+    """somatorio(n): retorne n == 0 ? 0 : n + somatorio(n - 1), which is not a tail call"""
+    decl = function(scope, 'somatorio', I64, [('n', I64)])
+    decl.scope.statements.append(returns_if(decl.scope, compare(param('n'), lit(0, I64), '=='), lit(0, I64)))
+    decl.scope.statements.append(ReturnStmtNode(0, add(
+        param('n'), call('somatorio', add(param('n'), lit(1, I64), '-'))
+    )))
+    return decl
+
+
+def test_stackless_calls_run_deeper_than_the_recursion_limit():
+    scope = ModuleScopeNode(0)
+    _sum_to(scope)
+    namespace = build_namespace(ModuleNode('teste', scope), stackless=True)
+    depth = sys.getrecursionlimit() * 10
+    assert run_stackless(namespace['g_somatorio'], depth) == depth * (depth + 1) // 2
+
+
+def test_stackless_exceptions_reach_the_caller():
+    scope = ModuleScopeNode(0)
+    function(scope, 'divide', I32, [('a', I32), ('b', I32)], statements=[
+        ReturnStmtNode(0, mul(param('a'), param('b'), '/')),
+    ])
+    function(scope, 'usa', I32, [('b', I32)], statements=[ReturnStmtNode(0, call('divide', lit(1), param('b')))])
+    namespace = build_namespace(ModuleNode('teste', scope), stackless=True)
+    try:
+        run_stackless(namespace['g_usa'], 0)
+    except ZeroDivisionError:
+        pass
+    else:
+        raise AssertionError("ZeroDivisionError not raised")
+    assert run_stackless(namespace['g_usa'], 1) == 1
@@ -0,0 +1,23 @@
+from tests.builders import *
+
+
+def _joining(scope: ModuleScopeNode, *statements: StmtNode) -> FunctionDeclNode:
+    """junta(n, parte): s = '>'; repita (n) { statements }; retorne s"""
+    decl = function(scope, 'junta', STR, [('n', I32), ('parte', STR)], [('s', STR, lit('>', STR))])
+    decl.scope.statements.append(RepeatStmtNode(0, None, param('n'), None, loop_scope(decl.scope, *statements)))
+    decl.scope.statements.append(ReturnStmtNode(0, var('s')))
+    return decl
+
+
+def test_strings_appended_to_in_a_loop_are_built_in_a_list():
+    scope = ModuleScopeNode(0)
+    decl = _joining(scope, accumulate('s', param('parte')), accumulate('s', lit('|', STR)))
+    assert '.append' in translated(decl)
+    assert compiled(scope)['junta'](3, 'ab') == '>ab|ab|ab|'
+
+
+def test_strings_read_in_the_loop_are_appended_to_directly():
+    scope = ModuleScopeNode(0)
+    decl = _joining(scope, accumulate('s', var('s')))
+    assert '.append' not in translated(decl)
+    assert compiled(scope)['junta'](3, '') == '>' * 8
@@ -0,0 +1,33 @@
+from tests.builders import *
+
+
+def _switch(scope: ModuleScopeNode, cases: list) -> FunctionDeclNode:
+    """escolha(x): escolha (x) { caso values: r = result ... senão: r = -1 }; retorne r"""
+    decl = function(scope, 'escolha', I32, [('x', I32)], [('r', I32, lit(0))])
+    stmts = []
+    for values, result in cases:
+        body = CaseScopeNode(0, decl.scope)
+        body.statements.append(AssignmentStmtNode(0, target('r'), lit(result)))
+        stmts.append(CaseStmtNode(0, [lit(value) for value in values], body))
+    default = CaseScopeNode(0, decl.scope)
+    default.statements.append(AssignmentStmtNode(0, target('r'), lit(-1)))
+    stmts.append(CaseStmtNode(0, [], default, True))
+    decl.scope.statements.append(SwitchStmtNode(0, param('x'), stmts))
+    decl.scope.statements.append(ReturnStmtNode(0, var('r')))
+    return decl
+
+
+def test_dense_switch_dispatches_through_a_table():
+    scope = ModuleScopeNode(0)
+    decl = _switch(scope, [([3], 30), ([4, 6], 40), ([5], 50), ([8], 80)])
+    assert '] if 3 <= ' in translated(decl)
+    escolha = compiled(scope)['escolha']
+    assert [escolha(x) for x in range(1, 10)] == [-1, -1, 30, 40, 50, 40, -1, 80, -1]
+
+
+def test_sparse_switch_tests_each_case():
+    scope = ModuleScopeNode(0)
+    decl = _switch(scope, [([1], 10), ([1000], 20), ([-5], 30), ([77], 40)])
+    assert '] if ' not in translated(decl)
+    escolha = compiled(scope)['escolha']
+    assert [escolha(x) for x in (1, 1000, -5, 77, 2)] == [10, 20, 30, 40, -1]
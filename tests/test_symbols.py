@@ -0,0 +1,160 @@
+from brah.f_utils import SourceCode
+from brah.r_symbols import SymbolIndex
+from tests.builders import *
+
+
+GEOMETRIA = """classe Vetor { x: i32; y: i32; }
+funcao norma(v: Vetor): i32 { retorne v.x; }
+"""
+
+APP = """funcao principal(w: Vetor): i32 {
+    total: i32 = w.x;
+    retorne total + w.y;
+}
+"""
+
+
+class _Source:
+    """Places nodes at the occurrences of their text in a source."""
+
+    def __init__(self, text: str, filepath: str):
+        self.text: str = text
+        self.source = SourceCode(text, filepath)
+
+    def at(self, needle: str, occurrence: int = 0) -> int:
+        index: int = -1
+        for _ in range(occurrence + 1):
+            index = self.text.index(needle, index + 1)
+        return self.source.location(index)
+
+
+def _geometria() -> ModuleNode:
+    text = _Source(GEOMETRIA, 'geometria.brah')
+    scope = ModuleScopeNode(0)
+    vetor = ClassTyclNode(text.at('Vetor'), 'Vetor')
+    vetor.declare(FieldDeclNode(text.at('x:'), 0, vetor, 'x', I32))
+    vetor.declare(FieldDeclNode(text.at('y:'), 1, vetor, 'y', I32))
+    scope.declarations['Vetor'] = vetor
+    body = FunctionScopeNode(text.at('{', 1), scope)
+    body.statements.append(ReturnStmtNode(text.at('retorne'), MemberExprNode(
+        text.at('v.x'), ParamNameExprNode(text.at('v.x'), 'v'), FieldNameExprNode(text.at('v.x') + 2, 'x')
+    )))
+    params = {'v': ParamDeclNode(text.at('v:'), 0, 'v', vetor)}
+    scope.declarations['norma'] = FunctionDeclNode(text.at('norma'), 0, 'norma', I32, params, body)
+    return ModuleNode('geometria', scope, text.source)
+
+
+def _app(vetor: TyclNode, members: Sequence[str] = ('x', 'y')) -> ModuleNode:
+    """principal reads the members of a Vetor declared in another module"""
+    text = _Source(APP, 'app.brah')
+    scope = ModuleScopeNode(0)
+    body = FunctionScopeNode(text.at('{'), scope)
+
+    def member(name: str) -> MemberExprNode:
+        return MemberExprNode(text.at(f'w.{name}'), ParamNameExprNode(text.at(f'w.{name}'), 'w'),
+                              FieldNameExprNode(text.at(f'w.{name}') + 2, name))
+
+    body.declarations['total'] = VarDeclNode(text.at('total'), 0, 'total', I32, member(members[0]))
+    result: ExprNode = VarNameExprNode(text.at('total', 1), 'total')
+    for name in members[1:]:
+        result = add(result, member(name))
+    body.statements.append(ReturnStmtNode(text.at('retorne'), result))
+    params = {'w': ParamDeclNode(text.at('w:'), 0, 'w', vetor)}
+    scope.declarations['principal'] = FunctionDeclNode(text.at('principal'), 0, 'principal', I32, params, body)
+    return ModuleNode('app', scope, text.source)
+
+
+def _assembly() -> AsmbNode:
+    asmb = AsmbNode()
+    asmb['geometria'] = _geometria()
+    asmb['app'] = _app(asmb['geometria'].scope.declarations['Vetor'])
+    return asmb
+
+
+def _indexed() -> Tuple[SymbolIndex, AsmbNode]:
+    asmb = _assembly()
+    index = SymbolIndex()
+    index.build(asmb)
+    return index, asmb
+
+
+def _places(references) -> List[Tuple[str, Tuple[int, int]]]:
+    return sorted((reference.module, reference.position) for reference in references)
+
+
+def test_declarations_are_indexed_under_their_path():
+    index, asmb = _indexed()
+    assert set(index.symbols) == {
+        'geometria:Vetor', 'geometria:Vetor.x', 'geometria:Vetor.y', 'geometria:norma', 'geometria:norma.v',
+        'app:principal', 'app:principal.w', 'app:principal.total',
+    }
+    field = index.definition('geometria:Vetor.x')
+    assert (field.kind, field.module, field.position, field.container) == ('FieldDecl', 'geometria', (1, 16),
+                                                                           'geometria:Vetor')
+    assert field.node is asmb['geometria'].scope.declarations['Vetor'].fields['x']
+    assert index.definition('geometria:nada') is None
+
+
+def test_references_are_found_across_modules():
+    index, _ = _indexed()
+    assert _places(index.references('geometria:Vetor.x')) == [('app', (2, 20)), ('geometria', (2, 41))]
+    assert _places(index.references('app:principal.total')) == [('app', (3, 13))]
+    assert _places(index.references('app:principal.w')) == [('app', (2, 18)), ('app', (3, 21))]
+    assert index.reference_count() == 7
+
+
+def test_prefix_search_ignores_case_and_keeps_name_order():
+    index, _ = _indexed()
+    assert [symbol.key for symbol in index.search('VE')] == ['geometria:Vetor']
+    assert [symbol.name for symbol in index.search('')] == ['norma', 'principal', 'total', 'v', 'Vetor', 'w', 'x',
+                                                             'y']
+    assert [symbol.name for symbol in index.search('', limit=2)] == ['norma', 'principal']
+    assert index.search('z') == []
+
+
+def test_at_returns_the_symbol_named_at_a_position():
+    index, _ = _indexed()
+    assert index.at('app', 2, 20).key == 'geometria:Vetor.x'
+    assert index.at('app', 3, 23).key == 'geometria:Vetor.y'
+    assert index.at('app', 3, 13).key == 'app:principal.total'
+    assert index.at('app', 3, 17).key == 'app:principal.total'
+    # past the end of the name, before the first reference, in an unknown module
+    assert index.at('app', 3, 18) is None
+    assert index.at('app', 1, 1) is None
+    assert index.at('nada', 1, 1) is None
+
+
+def test_update_replaces_the_entries_of_one_module():
+    index, asmb = _indexed()
+    vetor = asmb['geometria'].scope.declarations['Vetor']
+    index.update('app', _app(vetor, members=('y',)))
+    assert _places(index.references('geometria:Vetor.x')) == [('geometria', (2, 41))]
+    assert _places(index.references('geometria:Vetor.y')) == [('app', (3, 23))]
+    assert index.definition('geometria:norma.v') is not None
+
+
+def test_references_from_other_modules_survive_an_update_of_the_referenced_one():
+    index, asmb = _indexed()
+    rebuilt = _geometria()
+    index.update('geometria', rebuilt)
+    assert _places(index.references('geometria:Vetor.x')) == [('app', (2, 20)), ('geometria', (2, 41))]
+    assert index.definition('geometria:Vetor.x').node is rebuilt.scope.declarations['Vetor'].fields['x']
+    assert index.at('app', 2, 20).key == 'geometria:Vetor.x'
+
+
+def test_a_saved_index_is_loaded_and_attached_to_a_new_assembly(tmp_path):
+    index, _ = _indexed()
+    filepath = str(tmp_path / 'indice.json')
+    index.save(filepath)
+    loaded = SymbolIndex.load(filepath)
+    assert loaded.symbols == index.symbols
+    assert _places(loaded.references('geometria:Vetor.x')) == _places(index.references('geometria:Vetor.x'))
+    assert all(symbol.node is None for symbol in loaded.symbols.values())
+
+    asmb = _assembly()
+    loaded.attach(asmb)
+    vetor = asmb['geometria'].scope.declarations['Vetor']
+    assert loaded.definition('geometria:Vetor').node is vetor
+    # the declarations of the other modules are known again, so an updated module refers to them
+    loaded.update('app', _app(vetor, members=('y',)))
+    assert _places(loaded.references('geometria:Vetor.y')) == [('app', (3, 23))]
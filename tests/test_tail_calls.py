@@ -0,0 +1,29 @@
+import sys
+
+from tests.builders import *
+
+
+def test_tail_recursion_runs_deeper_than_the_recursion_limit():
+    scope = ModuleScopeNode(0)
+    # conta(n, total): se (n == 0) retorne total; retorne conta(n - 1, total + n)
+    decl = function(scope, 'conta', I64, [('n', I64), ('total', I64)])
+    decl.scope.statements.append(returns_if(decl.scope, compare(param('n'), lit(0, I64), '=='), param('total')))
+    decl.scope.statements.append(ReturnStmtNode(0, call(
+        'conta', add(param('n'), lit(1, I64), '-'), add(param('total'), param('n'))
+    )))
+    depth = sys.getrecursionlimit() * 10
+    assert compiled(scope)['conta'](depth, 0) == depth * (depth + 1) // 2
+
+
+def test_functions_tail_calling_each_other_share_one_loop():
+    scope = ModuleScopeNode(0)
+    # par(n): se (n == 0) retorne 1; retorne impar(n - 1), and impar the other way round
+    for name, other, zero in (('par', 'impar', 1), ('impar', 'par', 0)):
+        decl = function(scope, name, I64, [('n', I64)])
+        decl.scope.statements.append(returns_if(decl.scope, compare(param('n'), lit(0, I64), '=='), lit(zero, I64)))
+        decl.scope.statements.append(ReturnStmtNode(0, call(other, add(param('n'), lit(1, I64), '-'))))
+    functions = compiled(scope)
+    depth = sys.getrecursionlimit() * 10
+    assert functions['par'](depth) == 1
+    assert functions['impar'](depth) == 0
+    assert 't_' in translated(scope.declarations['par'])
@@ -0,0 +1,31 @@
+from brah.j_hostjit import TieredFunction, build_namespace
+from tests.builders import *
+
+
+def test_functions_start_interpreted_and_are_translated_once_hot():
+    scope = ModuleScopeNode(0)
+    function(scope, 'soma', I32, [('a', I32), ('b', I32)], statements=[
+        ReturnStmtNode(0, add(param('a'), param('b'))),
+    ])
+    calls = []
+
+    def interpret(decl: DeclNode, args: tuple) -> str:
+        calls.append(args)
+        return 'interpretado'
+
+    namespace = build_namespace(ModuleNode('teste', scope), interpret, threshold=3)
+    tiered = namespace['g_soma']
+    assert isinstance(tiered, TieredFunction)
+    assert [tiered(1, 2) for _ in range(3)] == ['interpretado', 'interpretado', 3]
+    assert calls == [(1, 2), (1, 2)]
+    assert namespace['g_soma'] is tiered.compiled
+
+
+def test_functions_the_translator_rejects_stay_interpreted():
+    scope = ModuleScopeNode(0)
+    # assigning a global is not supported by the translator
+    scope.declarations['g'] = VarDeclNode(0, 0, 'g', I32, lit(0))
+    function(scope, 'muda', None, statements=[AssignmentStmtNode(0, target('g'), lit(1))])
+    namespace = build_namespace(ModuleNode('teste', scope), lambda decl, args: 'interpretado', threshold=1)
+    assert namespace['g_muda']() == 'interpretado'
+    assert not namespace['g_muda'].translatable
@@ -0,0 +1,43 @@
+from brah.j_hostjit import FunctionTranslator, translate
+from brah.k_optimizer import optimize_loops
+from tests.builders import *
+
+
+def _countdown(scope: ModuleScopeNode) -> FunctionDeclNode:
+    """conta(n, total): retorne n == 0 ? total : conta(n - 1, total + n), as an if and a tail call"""
+    decl = function(scope, 'conta', I64, [('n', I64), ('total', I64)])
+    then = BasicScopeNode(0, decl.scope)
+    then.statements.append(ReturnStmtNode(0, param('total')))
+    decl.scope.statements.append(IfThenStmtNode(0, compare(param('n'), lit(0, I64), '=='), then))
+    decl.scope.statements.append(ReturnStmtNode(0, call(
+        'conta', add(param('n'), lit(1, I64), '-'), add(param('total'), param('n'))
+    )))
+    return decl
+
+
+def test_code_is_translated_again_after_a_pass_rewrites_the_body():
+    scope = ModuleScopeNode(0)
+    decl = function(scope, 'repete', I64, [('n', I32), ('a', I32), ('b', I32)], [('s', I64, lit(0, I64))])
+    body = loop_scope(decl.scope, accumulate('s', mul(param('a'), param('b'))))
+    decl.scope.statements.append(ForStmtNode(
+        0, [VarDeclNode(0, 1, 'i', I32, lit(0))], [compare(var('i'), param('n'))], [increment('i')], body
+    ))
+    decl.scope.statements.append(ReturnStmtNode(0, var('s')))
+    before = translate(decl)
+    assert translate(decl) is before
+    optimize_loops(decl)
+    after = translate(decl)
+    assert after is not before
+    assert '_inv' in ' '.join(after.co_consts[0].co_varnames)
+
+
+def test_code_is_translated_again_when_an_option_changes():
+    decl = _countdown(ModuleScopeNode(0))
+    jumps = translate(decl)
+    FunctionTranslator.tail_calls = False
+    try:
+        calls = translate(decl)
+    finally:
+        FunctionTranslator.tail_calls = True
+    assert calls is not jumps
+    assert translate(decl) is not calls
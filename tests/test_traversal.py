@@ -0,0 +1,111 @@
+from brah.o_traversal import PRUNE, REMOVE, Visitor, walk, walk_declarations
+from tests.builders import *
+
+
+def _values(nodes) -> list:
+    """The literal values and binary operators of the nodes, in order."""
+    return [node.value if isinstance(node, LiteralExprNode) else node.operator
+            for node in nodes if isinstance(node, (LiteralExprNode, BinaryExprNode))]
+
+
+def _expression() -> AddBinaryExprNode:
+    """(1 * 2) + (3 * 4)"""
+    return add(mul(lit(1), lit(2)), mul(lit(3), lit(4)))
+
+
+def test_walks_in_pre_and_post_order():
+    expr = _expression()
+    assert _values(walk(expr)) == ['+', '*', 1, 2, '*', 3, 4]
+    assert _values(walk(expr, postorder=True)) == [1, 2, '*', 3, 4, '*', '+']
+
+
+def test_pruned_nodes_are_yielded_without_their_children():
+    expr = _expression()
+    products = lambda node: isinstance(node, MultBinaryExprNode)
+    assert _values(walk(expr, prune=products)) == ['+', '*', '*']
+    assert _values(walk(expr, postorder=True, prune=products)) == ['*', '*', '+']
+
+
+def test_the_walk_goes_through_declarations_into_bodies():
+    scope = ModuleScopeNode(0)
+    tycl = ClassTyclNode(0, 'Conta')
+    tycl.declare(FieldDeclNode(0, 0, tycl, 'saldo', I32, True, lit(5)))
+    scope.declarations['Conta'] = tycl
+    function(scope, 'f', I32, [('n', I32)], [('t', I32, lit(6))], [ReturnStmtNode(0, lit(7))])
+    scope.declarations['f'].params['n'].default_value = lit(8)
+    asmb = AsmbNode()
+    asmb['principal'] = ModuleNode('principal', scope)
+    assert _values(walk(asmb)) == [5, 8, 6, 7]
+
+
+class _Rewriter(Visitor):
+    """Turns products into differences on the way in, removes the statements of a literal 0 on the way out."""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = []
+
+    def enter_MultBinaryExprNode(self, expr: MultBinaryExprNode) -> ExprNode:
+        return add(expr.left, expr.right, '-')
+
+    def enter_LiteralExprNode(self, expr: LiteralExprNode) -> None:
+        self.entered.append(expr.value)
+
+    def leave_ExpressionStmtNode(self, stmt: ExpressionStmtNode) -> Any:
+        if isinstance(stmt.expr, LiteralExprNode) and stmt.expr.value == 0:
+            return REMOVE
+
+
+def test_visitor_replaces_nodes_in_place():
+    root = ReturnStmtNode(0, _expression())
+    visitor = _Rewriter()
+    assert visitor.visit(root) is root
+    assert _values(walk(root)) == ['+', '-', 1, 2, '-', 3, 4]
+    # the children of the replacement are walked instead
+    assert visitor.entered == [1, 2, 3, 4]
+
+
+def test_visitor_removes_nodes_from_lists_and_fields():
+    scope = BasicScopeNode(0)
+    scope.statements.extend(ExpressionStmtNode(0, lit(value)) for value in (0, 1, 0, 2))
+    _Rewriter().visit(scope)
+    assert [stmt.expr.value for stmt in scope.statements] == [1, 2]
+
+    class RemoveLiterals(Visitor):
+        def leave_LiteralExprNode(self, expr: LiteralExprNode) -> Any:
+            return REMOVE
+
+    stmt = ReturnStmtNode(0, lit(1))
+    RemoveLiterals().visit(stmt)
+    assert stmt.valueexpr is None
+
+
+def test_visitor_prune_skips_the_children_but_still_leaves():
+    order = []
+
+    class Pruner(Visitor):
+        def enter_BinaryExprNode(self, expr: BinaryExprNode) -> Any:
+            order.append(('enter', expr.operator))
+            return PRUNE if isinstance(expr, MultBinaryExprNode) else None
+
+        def leave_BinaryExprNode(self, expr: BinaryExprNode) -> None:
+            order.append(('leave', expr.operator))
+
+        def enter_LiteralExprNode(self, expr: LiteralExprNode) -> None:
+            order.append(('enter', expr.value))
+
+    Pruner().visit(_expression())
+    assert order == [('enter', '+'), ('enter', '*'), ('leave', '*'), ('enter', '*'), ('leave', '*'), ('leave', '+')]
+
+
+def test_declarations_are_walked_with_their_container():
+    scope = ModuleScopeNode(0)
+    tycl = ClassTyclNode(0, 'Conta')
+    tycl.declare(FieldDeclNode(0, 0, tycl, 'saldo', I32))
+    scope.declarations['Conta'] = tycl
+    decl = function(scope, 'f', I32, [('n', I32)], [('t', I32, lit(0))])
+    inner = loop_scope(decl.scope)
+    inner.declarations['u'] = VarDeclNode(0, 1, 'u', I32)
+    decl.scope.statements.append(WhileStmtNode(0, lit(1), inner))
+    found = [(node.name, container.name if container else None) for node, container in walk_declarations(scope)]
+    assert found == [('Conta', None), ('saldo', 'Conta'), ('f', None), ('n', 'f'), ('t', 'f'), ('u', 'f')]
@@ -0,0 +1,38 @@
+from brah.j_hostjit import run_stackless, build_namespace
+from tests.builders import *
+
+
+def _aggregate(*items: ExprNode) -> AggregateExprNode:
+    return AggregateExprNode(0, list(items))
+
+
+def test_unpacking_an_aggregate_reads_every_element_first():
+    scope = ModuleScopeNode(0)
+    decl = function(scope, 'fibonacci', I32, [('n', I32)], [('a', I32, lit(0)), ('b', I32, lit(1))])
+    step = UnpackStmtNode(0, [target('a'), target('b')], _aggregate(var('b'), add(var('a'), var('b'))))
+    decl.scope.statements.append(RepeatStmtNode(0, None, param('n'), None, loop_scope(decl.scope, step)))
+    decl.scope.statements.append(ReturnStmtNode(0, var('a')))
+    fibonacci = compiled(scope)['fibonacci']
+    assert [fibonacci(n) for n in range(8)] == [0, 1, 1, 2, 3, 5, 8, 13]
+    # no tuple is built to swap the values
+    assert '(v_b, ' not in translated(decl)
+
+
+def test_results_unpack_into_variables_skipping_the_middle():
+    scope = ModuleScopeNode(0)
+    function(scope, 'divide', None, [('n', I32), ('d', I32)], statements=[
+        ReturnStmtNode(0, _aggregate(mul(param('n'), param('d'), '/'), mul(param('n'), param('d'), '%'))),
+    ])
+    function(scope, 'tres', None, statements=[ReturnStmtNode(0, _aggregate(lit(1), lit(2), lit(3)))])
+    digits = [('q', 1000), ('r', 100), ('p', 10), ('u', 1)]
+    total: ExprNode = lit(0)
+    for name, weight in digits:
+        total = add(total, mul(var(name), lit(weight)))
+    function(scope, 'usa', I32, variables=[(name, I32, lit(0)) for name, _ in digits], statements=[
+        UnpackStmtNode(0, [target('q'), target('r')], call('divide', lit(17), lit(5))),
+        UnpackStmtNode(0, [target('p'), None, target('u')], call('tres')),
+        ReturnStmtNode(0, total),
+    ])
+    assert compiled(scope)['usa']() == 3213
+    namespace = build_namespace(ModuleNode('teste', scope), stackless=True)
+    assert run_stackless(namespace['g_usa']) == 3213
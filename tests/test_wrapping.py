@@ -0,0 +1,49 @@
+from tests.builders import *
+
+
+def _stores(typenode: TypeNode, returns: TypeNode, operands: TypeNode = I32) -> ModuleScopeNode:
+    """produto(a, b): x = a * b in a variable of the given type, returned with another"""
+    scope = ModuleScopeNode(0)
+    function(scope, 'produto', returns, [('a', operands), ('b', operands)], [('x', typenode, None)], [
+        AssignmentStmtNode(0, target('x'), mul(param('a'), param('b'))),
+        ReturnStmtNode(0, var('x')),
+    ])
+    return scope
+
+
+def test_i32_product_is_wrapped_before_widening_to_i64():
+    produto = compiled(_stores(I64, I64))['produto']
+    assert produto(100000, 100000) == 1410065408
+    assert produto(-100000, 100000) == -1410065408
+
+
+def test_i32_product_is_wrapped_before_converting_to_f64():
+    produto = compiled(_stores(F64, F64))['produto']
+    assert produto(100000, 100000) == 1410065408.0
+
+
+def test_i32_product_is_wrapped_in_initial_value_and_return():
+    scope = ModuleScopeNode(0)
+    function(scope, 'inicial', I64, [('a', I32), ('b', I32)], [('x', I64, mul(param('a'), param('b')))], [
+        ReturnStmtNode(0, var('x')),
+    ])
+    function(scope, 'retorno', I64, [('a', I32), ('b', I32)], statements=[
+        ReturnStmtNode(0, mul(param('a'), param('b'))),
+    ])
+    functions = compiled(scope)
+    assert functions['inicial'](100000, 100000) == 1410065408
+    assert functions['retorno'](100000, 100000) == 1410065408
+
+
+def test_i64_product_keeps_its_width():
+    produto = compiled(_stores(I64, I64, I64))['produto']
+    assert produto(46341, 46341) == 2147488281
+
+
+def test_i32_product_is_wrapped_before_passing_to_an_i64_parameter():
+    scope = ModuleScopeNode(0)
+    function(scope, 'identidade', I64, [('x', I64)], statements=[ReturnStmtNode(0, param('x'))])
+    function(scope, 'produto', I64, [('a', I32), ('b', I32)], statements=[
+        ReturnStmtNode(0, call('identidade', mul(param('a'), param('b')))),
+    ])
+    assert compiled(scope)['produto'](100000, 100000) == 1410065408